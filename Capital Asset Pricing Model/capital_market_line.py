@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+
+from capm import RISK_FREE_RATE
+
+
+# Tangency portfolio and Capital Market Line of one set of moments. The
+# covariance matrix is Cholesky factored once, on first use, and Σ⁻¹(μ - rf)
+# comes out of two triangular solves against the cached factor; nothing ever
+# forms an explicit inverse. Everything after that is a dot product, so the
+# risk, the risky share and the weights of a whole vector of target returns on
+# the CML come out of one vectorized call.
+#
+#   cml = CapitalMarketLine.from_returns(returns, risk_free_rate)
+#   w_star, mu_star, sigma_star = cml.tangency()
+#   weights = cml.weights(np.linspace(risk_free_rate, 0.02, 100))
+
+
+class CapitalMarketLine:
+    def __init__(self, mean, cov, risk_free_rate=RISK_FREE_RATE, tickers=None):
+        self.mean = np.asarray(mean, dtype=float)
+        self.cov = np.asarray(cov, dtype=float)
+        self.risk_free_rate = risk_free_rate
+        self.tickers = list(tickers) if tickers is not None else list(range(len(self.mean)))
+        self._factor = None
+        self._direction = None
+        self._tangency = None
+
+    @classmethod
+    def from_returns(cls, returns, risk_free_rate=RISK_FREE_RATE):
+        return cls(returns.mean().to_numpy(), returns.cov().to_numpy(), risk_free_rate, returns.columns)
+
+    @property
+    def factor(self):
+        # Lower Cholesky factor of the covariance, computed once; a singular covariance raises LinAlgError
+        if self._factor is None:
+            self._factor = cho_factor(self.cov, lower=True)
+        return self._factor
+
+    def solve(self, vectors):
+        # Σ⁻¹ vectors (one vector or the columns of a matrix) by forward and back substitution
+        return cho_solve(self.factor, vectors)
+
+    @property
+    def excess(self):
+        return self.mean - self.risk_free_rate
+
+    @property
+    def direction(self):
+        # Σ⁻¹(μ - rf): every efficient risky portfolio with a risk free asset is a multiple of it
+        if self._direction is None:
+            self._direction = self.solve(self.excess)
+        return self._direction
+
+    @property
+    def slope(self):
+        # Sharpe ratio of the CML, sqrt((μ - rf)' Σ⁻¹ (μ - rf))
+        return np.sqrt(max(self.excess @ self.direction, 0.0))
+
+    def tangency(self):
+        # (weights, return, risk) of the tangency portfolio
+        if self._tangency is None:
+            weights = self.direction / self.direction.sum()
+            self._tangency = weights, weights @ self.mean, np.sqrt(weights @ self.cov @ weights)
+        return self._tangency
+
+    def tangency_weights(self):
+        return pd.Series(self.tangency()[0], index=self.tickers)
+
+    def risk(self, target_return):
+        # Risk of the CML portfolio earning target_return; scalars or arrays
+        return (np.asarray(target_return, dtype=float) - self.risk_free_rate) / self.slope
+
+    def w_risky(self, target_return):
+        # Share of wealth in the tangency portfolio needed for target_return, the rest at rf
+        mu_star = self.tangency()[1]
+        return (np.asarray(target_return, dtype=float) - self.risk_free_rate) / (mu_star - self.risk_free_rate)
+
+    def weights(self, target_return):
+        # Risky asset weights of the CML portfolios: one row per target return
+        return np.multiply.outer(self.w_risky(target_return), self.tangency()[0])
+
+    def sharpe_ratio(self, mu, sigma):
+        return (np.asarray(mu, dtype=float) - self.risk_free_rate) / sigma
+
+    def line(self, target_returns):
+        # (risks, weights, w_risky) of a whole vector of target returns on the CML
+        target_returns = np.asarray(target_returns, dtype=float)
+        return self.risk(target_returns), self.weights(target_returns), self.w_risky(target_returns)
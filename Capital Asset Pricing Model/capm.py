@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+
+# CAPM statistics of a whole universe at once. The market proxy's returns and
+# the sums of every asset come out of one pass over the return rows, the
+# covariances of every asset with the market out of a second one as a single
+# matrix-vector product per block of rows, so betas, alphas, residual variances
+# and CAPM expected returns of thousands of assets cost two sweeps over the
+# panel instead of a pandas covariance per column.
+#
+# The returns may be a DataFrame, a (days, assets) ndarray or np.memmap (e.g.
+# np.load(path, mmap_mode='r')) or anything with .values and .tickers such as
+# the Markowitz app's ReturnsPanel. Rows are read a block at a time and
+# converted to float64 one block at a time, so a memory-mapped panel larger
+# than memory is never loaded whole. The rows must be complete: drop or fill
+# missing returns first, as prices.pct_change().dropna() does.
+#
+#   estimates = capm(returns, market='SPY')
+#   estimates.frame()
+
+# Risk free asset: PPF with a return rate of 7.1% a year, as a daily rate
+RISK_FREE_RATE = (1 + 0.071) ** (1 / 365) - 1
+# Rows per float64 block are chosen so a block stays around this size
+BLOCK_BYTES = 8 << 20
+
+
+class CapmEstimates:
+    def __init__(self, tickers, betas, alphas, residual_variances, r_squared, expected_returns, market_return,
+                 market_variance, risk_free_rate):
+        self.tickers = list(tickers)
+        self.betas = betas
+        # Jensen's alpha: mean return above the CAPM expected return
+        self.alphas = alphas
+        # Variance of r - alpha - beta * market, so var(r) = beta² var(market) + residual variance
+        self.residual_variances = residual_variances
+        self.r_squared = r_squared
+        self.expected_returns = expected_returns
+        self.market_return = market_return
+        self.market_variance = market_variance
+        self.risk_free_rate = risk_free_rate
+
+    def security_market_line(self, betas):
+        return self.risk_free_rate + np.asarray(betas, dtype=float) * (self.market_return - self.risk_free_rate)
+
+    def frame(self):
+        return pd.DataFrame({
+            'beta': self.betas,
+            'alpha': self.alphas,
+            'residual_variance': self.residual_variances,
+            'r_squared': self.r_squared,
+            'expected_return': self.expected_returns,
+        }, index=pd.Index(self.tickers, name='Asset'))
+
+
+def _panel(returns):
+    # (values, tickers, dates) of any supported returns container
+    if isinstance(returns, pd.DataFrame):
+        return returns.to_numpy(), list(returns.columns), returns.index
+    if hasattr(returns, 'tickers'):
+        return returns.values, list(returns.tickers), getattr(returns, 'dates', None)
+    values = returns if isinstance(returns, np.ndarray) else np.asarray(returns, dtype=float)
+    if values.ndim != 2:
+        raise ValueError(f"Expected (days, assets) returns, got shape {values.shape}")
+    return values, list(range(values.shape[1])), None
+
+
+def _blocks(values):
+    rows = max(1, BLOCK_BYTES // (8 * max(values.shape[1], 1)))
+    for first in range(0, values.shape[0], rows):
+        yield first, np.array(values[first:first + rows], dtype=float)
+
+
+def _market_weights(market_weights, tickers):
+    # Proxy weights over the panel's assets, e.g. market capitalisations, normalised to sum to one
+    if isinstance(market_weights, pd.Series):
+        unknown = market_weights.index.difference(pd.Index(tickers))
+        if len(unknown):
+            raise ValueError(f"Market weights for unknown assets: {', '.join(map(str, unknown))}")
+        market_weights = market_weights.reindex(tickers).fillna(0.0)
+    weights = np.asarray(market_weights, dtype=float)
+    if weights.shape != (len(tickers),):
+        raise ValueError(f"Expected {len(tickers)} market weights, got shape {weights.shape}")
+    if weights.sum() == 0:
+        raise ValueError("Market weights sum to zero")
+    return weights / weights.sum()
+
+
+def _market_series(market, num_days, dates):
+    # Returns of an outside market index, aligned on the panel's dates when both have them
+    if isinstance(market, pd.Series) and dates is not None:
+        market = market.reindex(dates)
+    series = np.asarray(market, dtype=float)
+    if series.shape != (num_days,):
+        raise ValueError(f"Expected {num_days} market returns, got shape {series.shape}")
+    if not np.all(np.isfinite(series)):
+        raise ValueError("Market returns are missing on some of the panel's dates")
+    return series
+
+
+def _market_proxy(market, market_weights, tickers, num_days, dates):
+    # (column, weights, series): the proxy as a column of the panel, as weights over its
+    # assets or as given returns; all None for the equal-weight average
+    if market is not None and market_weights is not None:
+        raise ValueError("Give either a market or market weights, not both")
+    if isinstance(market, str):
+        if market not in tickers:
+            raise ValueError(f"Market proxy {market!r} is not in the returns")
+        return tickers.index(market), None, None
+    if market is not None:
+        return None, None, _market_series(market, num_days, dates)
+    if market_weights is not None:
+        return None, _market_weights(market_weights, tickers), None
+    return None, None, None
+
+
+def _market_block(proxy, block, first):
+    # The proxy's returns on the rows of a block starting at row first
+    column, weights, series = proxy
+    if series is not None:
+        return series[first:first + len(block)]
+    if column is not None:
+        return block[:, column]
+    if weights is not None:
+        return block @ weights
+    return block.mean(axis=1)
+
+
+def capm(returns, market=None, market_weights=None, risk_free_rate=RISK_FREE_RATE):
+    # market: None for the equal-weight average of the panel, a ticker of the panel (an index
+    # downloaded with the stocks) or the index's own returns as a Series or array;
+    # market_weights: a weight per asset for a weighted proxy such as capitalisation weights
+    values, tickers, dates = _panel(returns)
+    num_days, num_assets = values.shape
+    if num_days < 3:
+        raise ValueError(f"Need at least 3 return rows, got {num_days}")
+    proxy = _market_proxy(market, market_weights, tickers, num_days, dates)
+
+    # Pass 1: asset sums and, unless it was given, the proxy's return on every day
+    total = np.zeros(num_assets)
+    series = proxy[2] if proxy[2] is not None else np.empty(num_days)
+    for first, block in _blocks(values):
+        total += block.sum(axis=0)
+        if proxy[2] is None:
+            series[first:first + len(block)] = _market_block(proxy, block, first)
+    mean = total / num_days
+    market_return = series.mean()
+    market_centred = series - market_return
+    market_comoment = market_centred @ market_centred
+    if market_comoment <= 0:
+        raise ValueError("The market proxy has no variance")
+
+    # Pass 2: centred co-moments of every asset with the market and with itself
+    cross = np.zeros(num_assets)
+    squares = np.zeros(num_assets)
+    for first, block in _blocks(values):
+        block -= mean
+        cross += market_centred[first:first + len(block)] @ block
+        squares += np.einsum('ij,ij->j', block, block)
+
+    betas = cross / market_comoment
+    # Σ (r - mean - beta (m - market_return))² = Σ (r - mean)² - beta Σ (r - mean)(m - market_return)
+    residual_comoment = np.maximum(squares - betas * cross, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_squared = np.where(squares > 0, 1 - residual_comoment / squares, 0.0)
+    expected_returns = risk_free_rate + betas * (market_return - risk_free_rate)
+    return CapmEstimates(tickers, betas, mean - expected_returns, residual_comoment / (num_days - 1), r_squared,
+                         expected_returns, market_return, market_comoment / (num_days - 1), risk_free_rate)
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from capm import _blocks, _market_block, _market_proxy, _panel
+
+
+# Time-varying betas of a whole universe against a market proxy. The engine
+# keeps running sums per asset, so every new bar updates all betas with a few
+# vector operations over the assets instead of re-estimating each window:
+#
+#   - a rolling window of the last `window` bars adds the new bar to the sums of
+#     returns and market cross-products and takes the bar leaving the window out
+#     of them again; the sums are rebuilt from the window once per `window` bars
+#     so rounding cannot build up over years of data;
+#   - an exponentially weighted beta (halflife in bars) updates an exponentially
+#     weighted mean and covariance per asset, like
+#     DataFrame.ewm(halflife=..., adjust=False).
+#
+# rolling_betas() runs the engine over a returns panel (anything capm() takes,
+# read in blocks of rows) and stores the betas as one (days, assets) float32
+# array by default.
+#
+#   betas = rolling_betas(returns, window=60)
+#   betas.frame()
+
+
+class BetaSeries:
+    def __init__(self, values, dates, tickers, window=None, halflife=None):
+        # (days, tickers) betas as of the close of each day, NaN until enough bars were seen
+        self.values = values
+        self.dates = pd.RangeIndex(len(values)) if dates is None else pd.Index(dates)
+        self.tickers = list(tickers)
+        self.window = window
+        self.halflife = halflife
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def __len__(self):
+        return len(self.values)
+
+    def asset(self, ticker):
+        return pd.Series(self.values[:, self.tickers.index(ticker)], index=self.dates, name=ticker)
+
+    def latest(self):
+        return pd.Series(self.values[-1], index=self.tickers, name=self.dates[-1])
+
+    def frame(self):
+        # Full DataFrame in the stored dtype, for small panels and callers that need one
+        return pd.DataFrame(self.values, index=self.dates, columns=self.tickers)
+
+
+class RollingBeta:
+    def __init__(self, num_assets, window=None, halflife=None, min_periods=None):
+        if (window is None) == (halflife is None):
+            raise ValueError("Give either a window or a halflife")
+        if window is not None and window < 2:
+            raise ValueError(f"Window must cover at least 2 bars, got {window}")
+        if halflife is not None and halflife <= 0:
+            raise ValueError(f"Halflife must be positive, got {halflife}")
+        self.num_assets = num_assets
+        self.window = window
+        self.halflife = halflife
+        # Bars needed before a beta is reported: a full window, or 2 bars for the weighted beta
+        self.min_periods = min_periods if min_periods is not None else (window if window is not None else 2)
+        self.count = 0
+        if window is not None:
+            # Ring buffer of the bars inside the window
+            self._assets = np.zeros((window, num_assets))
+            self._market = np.zeros(window)
+            self._position = 0
+            self._clear_sums()
+        else:
+            # Weight kept by the past on every new bar
+            self.decay = 0.5 ** (1 / halflife)
+            self._asset_mean = np.zeros(num_assets)
+            self._market_mean = 0.0
+            self._covariance = np.zeros(num_assets)
+            self._market_variance = 0.0
+
+    def _clear_sums(self):
+        self._asset_sum = np.zeros(self.num_assets)
+        self._cross_sum = np.zeros(self.num_assets)
+        self._market_sum = 0.0
+        self._market_squares = 0.0
+
+    def _rebuild_sums(self):
+        # Exact sums of the bars in the window
+        self._asset_sum = self._assets.sum(axis=0)
+        self._cross_sum = self._market @ self._assets
+        self._market_sum = self._market.sum()
+        self._market_squares = self._market @ self._market
+
+    def update(self, returns, market_return):
+        # Fold one bar (the assets' returns and the market's) in and return the betas after it
+        returns = np.asarray(returns, dtype=float)
+        self.count += 1
+        if self.window is not None:
+            self._roll(returns, market_return)
+        else:
+            self._weigh(returns, market_return)
+        return self.betas
+
+    def _roll(self, returns, market_return):
+        position = self._position
+        if self.count > self.window:
+            leaving, leaving_market = self._assets[position], self._market[position]
+            self._asset_sum -= leaving
+            self._cross_sum -= leaving_market * leaving
+            self._market_sum -= leaving_market
+            self._market_squares -= leaving_market * leaving_market
+        self._assets[position] = returns
+        self._market[position] = market_return
+        self._position = (position + 1) % self.window
+        if self.count > self.window and self._position == 0:
+            self._rebuild_sums()
+        else:
+            self._asset_sum += returns
+            self._cross_sum += market_return * returns
+            self._market_sum += market_return
+            self._market_squares += market_return * market_return
+
+    def _weigh(self, returns, market_return):
+        if self.count == 1:
+            self._asset_mean[:] = returns
+            self._market_mean = market_return
+            return
+        weight = 1 - self.decay
+        asset_step = returns - self._asset_mean
+        market_step = market_return - self._market_mean
+        self._asset_mean += weight * asset_step
+        self._market_mean += weight * market_step
+        self._covariance = self.decay * (self._covariance + weight * market_step * asset_step)
+        self._market_variance = self.decay * (self._market_variance + weight * market_step * market_step)
+
+    @property
+    def betas(self):
+        if self.count < self.min_periods:
+            return np.full(self.num_assets, np.nan)
+        if self.window is not None:
+            bars = min(self.count, self.window)
+            covariance = self._cross_sum - self._market_sum * self._asset_sum / bars
+            variance = self._market_squares - self._market_sum * self._market_sum / bars
+        else:
+            covariance, variance = self._covariance, self._market_variance
+        if variance <= 0:
+            return np.full(self.num_assets, np.nan)
+        return covariance / variance
+
+
+def rolling_betas(returns, market=None, market_weights=None, window=60, halflife=None, min_periods=None,
+                  dtype=np.float32):
+    # Betas of every asset on every day; a halflife gives exponentially weighted betas instead
+    # of a rolling window. The market proxy is chosen as in capm.capm()
+    values, tickers, dates = _panel(returns)
+    num_days, num_assets = values.shape
+    proxy = _market_proxy(market, market_weights, tickers, num_days, dates)
+    if halflife is not None:
+        window = None
+    engine = RollingBeta(num_assets, window, halflife, min_periods)
+    betas = np.empty((num_days, num_assets), dtype=dtype)
+    for first, block in _blocks(values):
+        market_returns = _market_block(proxy, block, first)
+        for row in range(len(block)):
+            betas[first + row] = engine.update(block[row], market_returns[row])
+    return BetaSeries(betas, dates, tickers, window, halflife)
@@ -1,20 +1,16 @@
 import streamlit as st
-import pandas as pd
-import yfinance as yf
-import shortselling
-import no_short_selling
+from diagnostics import Metrics
+from frontier_figure import payload_size
+import precompute
+from ticker_directory import shared_directory
 def main():
 
     # Take input for the number of companies
     num_companies = st.number_input("Enter the number of companies", min_value=2, step=1)
 
-    # Load your DataFrame from an Excel file (Replace 'path/to/your/file.xlsx' with the actual path)
-    df = pd.read_csv('yahootickers2.csv')
-    df.dropna(inplace=True)  # Drop any NaN values
-    df['Name'] = df['Name'].astype(str)  # Ensure 'Name' column is treated as string
-    df = df[df['Name'].str[0].str.isalpha()]
-    df = df.sort_values(by='Name')  # Sort DataFrame by company names
-    sorted_companies = ["Select Company" ] + list(df["Name"])
+    # Company names and tickers, loaded once per process and shared by every page
+    directory = shared_directory()
+    sorted_companies = ["Select Company" ] + directory.names
 
     # Generate dropdowns for selecting companies
     selected_companies = []
@@ -23,7 +19,7 @@ def main():
         company = st.selectbox(f"Select Company {i+1}", options=sorted_companies) # Add more options as needed
         if(company != "Select Company"):
             selected_companies.append(company)
-            selected_tickers.append(df.loc[df['Name'] == company, 'Ticker'].iloc[0])  # Retrieve ticker for selected company
+            selected_tickers.append(directory.ticker(company))  # Retrieve ticker for selected company
 
     # Organize selected companies and their tickers in two columns
     
@@ -31,7 +27,15 @@ def main():
     allow_short_selling = st.radio("Allow Short Selling?", ("Yes", "No"))
 
     stocks = selected_tickers
+    # Download and solve in the background as soon as the basket is complete; Submit picks it up
+    if len(stocks) == num_companies:
+        precompute.request(st.session_state, stocks, allow_short_selling == "Yes", 75)
+    else:
+        precompute.discard(st.session_state)
     if st.button("Submit"):
+        # Stage timings and solver counters of this run, shown by the diagnostics sidebar
+        metrics = Metrics()
+        st.session_state['diagnostics'] = metrics
         try:
             col1, col2 = st.columns(2)
             with col1:
@@ -44,21 +48,16 @@ def main():
                 for ticker in selected_tickers:
                     st.write(ticker)
             
-            start_date = pd.Timestamp.now() - pd.DateOffset(months=3)
-            end_date = pd.Timestamp.now()
-
-            prices = yf.download(stocks, start=start_date, end=end_date)['Adj Close']
-            prices.fillna(prices.mean(), inplace=True)
-            
+            basket = precompute.collect(st.session_state, stocks, allow_short_selling == "Yes", 75, metrics)
+            # Tickers without any price data are left out instead of failing the whole basket
+            missing = basket.missing
+            if missing:
+                st.warning(f"No price data for {', '.join(missing)}; left out of the portfolio")
+                selected_companies = [company for company, ticker in zip(selected_companies, stocks) if ticker not in missing]
+                stocks = [ticker for ticker in stocks if ticker not in missing]
             st.title("Markowitz Optimization Results ") 
-            portfolio_optimizer = None 
-            if( allow_short_selling == "Yes"):
-                portfolio_optimizer = shortselling.PortfolioOptimizer(prices)
-            else : 
-                portfolio_optimizer = no_short_selling.PortfolioOptimizer(prices)
-
-            
-            optimal_weights, optimal_risk, optimal_return = portfolio_optimizer.markowitz_optimization()
+            portfolio_optimizer = basket.optimizer
+            optimal_weights, optimal_risk, optimal_return = basket.min_variance
 
             
             st.markdown(f"<h4>Optimal Risk - {round(optimal_risk * 100 , 3 )  } % </h4>" , unsafe_allow_html= True)
@@ -76,15 +75,18 @@ def main():
                     w = round(w * 100 , 2 )  
                     st.write(str(w) + "%")
             
-            returns = portfolio_optimizer.returns
-            min_return = returns.mean().min()
-            max_return = returns.mean().max()
+            statistics = portfolio_optimizer.statistics
+            min_return = statistics.mean.min()
+            max_return = statistics.mean.max()
             max_return = round(max_return  * 100 , 3 )  
 
            
             fig = portfolio_optimizer.plot_efficient_frontier()
-            st.plotly_chart(fig)
-        except:
+            metrics.count('figure_bytes', payload_size(fig))
+            with metrics.span('chart'):
+                st.plotly_chart(fig)
+        except Exception as error:
+            metrics.record_error(error)
             st.error("An error occurred while processing the data. Please ensure that the data is available and try again.")
 
             
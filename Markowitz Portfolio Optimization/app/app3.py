@@ -1,20 +1,17 @@
 import streamlit as st
-import pandas as pd
-import yfinance as yf
-import shortselling , no_short_selling
+from diagnostics import Metrics
+from frontier_figure import payload_size
+import precompute
+from ticker_directory import shared_directory
 
 def main():
 
     # Take input for the number of companies
     num_companies = st.number_input("Enter the number of companies", min_value=2, step=1)
 
-    # Load your DataFrame from an Excel file (Replace 'path/to/your/file.xlsx' with the actual path)
-    df = pd.read_csv('yahootickers2.csv')
-    df.dropna(inplace=True)  # Drop any NaN values
-    df['Name'] = df['Name'].astype(str)  # Ensure 'Name' column is treated as string
-    df = df[df['Name'].str[0].str.isalpha()]
-    df = df.sort_values(by='Name')  # Sort DataFrame by company names
-    sorted_companies = ["Select Company" ] + list(df["Name"])
+    # Company names and tickers, loaded once per process and shared by every page
+    directory = shared_directory()
+    sorted_companies = ["Select Company" ] + directory.names
     
     # Generate dropdowns for selecting companies
     selected_companies = []
@@ -23,7 +20,7 @@ def main():
         company = st.selectbox(f"Select Company {i+1}", options=sorted_companies) # Add more options as needed
         if(company != "Select Company"):
             selected_companies.append(company)
-            selected_tickers.append(df.loc[df['Name'] == company, 'Ticker'].iloc[0])  # Retrieve ticker for selected company
+            selected_tickers.append(directory.ticker(company))  # Retrieve ticker for selected company
 
     # Organize selected companies and their tickers in two columns
     
@@ -32,7 +29,15 @@ def main():
     risk_tolerance =  target_return = st.number_input("Enter the Risk Tolerance Level ", value=0.0 )
 
     stocks = selected_tickers
+    # Download and solve in the background as soon as the basket is complete; Submit picks it up
+    if len(stocks) == num_companies:
+        precompute.request(st.session_state, stocks, allow_short_selling == "Yes", 60)
+    else:
+        precompute.discard(st.session_state)
     if st.button("Submit"):
+        # Stage timings and solver counters of this run, shown by the diagnostics sidebar
+        metrics = Metrics()
+        st.session_state['diagnostics'] = metrics
         
         try:
             col1, col2 = st.columns(2)
@@ -46,21 +51,25 @@ def main():
                 for ticker in selected_tickers:
                     st.write(ticker)
             
-            start_date = pd.Timestamp.now() - pd.DateOffset(months=3)
-            end_date = pd.Timestamp.now()
-    
-            prices = prices = yf.download(stocks, start=start_date, end=end_date)['Adj Close']
-            prices.fillna(prices.mean(), inplace=True)
+            basket = precompute.collect(st.session_state, stocks, allow_short_selling == "Yes", 60, metrics)
+            # Tickers without any price data are left out instead of failing the whole basket
+            missing = basket.missing
+            if missing:
+                st.warning(f"No price data for {', '.join(missing)}; left out of the portfolio")
+                selected_companies = [company for company, ticker in zip(selected_companies, stocks) if ticker not in missing]
+                stocks = [ticker for ticker in stocks if ticker not in missing]
             # st.title("Markowitz Optimization Results ") 
-            portfolio_optimizer = None 
-            if( allow_short_selling == "Yes"):
-                portfolio_optimizer = shortselling.PortfolioOptimizer(prices)
-            else : 
-                portfolio_optimizer = no_short_selling.PortfolioOptimizer(prices)
-    
-            
-            portfolio_optimizer.markowitz_optimization()
-            weights , expected_return = portfolio_optimizer.markowitz_optimization_max_return( risk_tolerance/100 ) 
+            portfolio_optimizer = basket.optimizer
+            try:
+                weights , optimal_risk , expected_return = portfolio_optimizer.markowitz_optimization_for_target_risk( risk_tolerance/100 ) 
+            except ValueError:
+                statistics = portfolio_optimizer.statistics
+                min_risk = statistics.std.min() * 100 
+                max_risk = statistics.std.max() * 100 
+                st.write("Selected Risk Tolerance Level can't be achieved ") 
+                st.write(f"Minimum Risk : {min_risk}") 
+                st.write(f"Maximum Risk : {max_risk}")
+                return
             exp = round(expected_return , 4) * 100 
             st.markdown(f"<h5>Expected Return is {exp} %</h5>" , unsafe_allow_html=True)
             # st.write(weights)
@@ -77,15 +86,19 @@ def main():
                     st.write(f"{w}%")
             try:
                 fig = portfolio_optimizer.plot_efficient_frontier_for_given_risk_tolerance(target_return/100) 
-                st.plotly_chart(fig)
-            except:
-                returns = portfolio_optimizer.returns
-                min_risk = returns.std().min() * 100 
-                max_risk = returns.std().max() * 100 
+                metrics.count('figure_bytes', payload_size(fig))
+                with metrics.span('chart'):
+                    st.plotly_chart(fig)
+            except Exception as error:
+                metrics.record_error(error)
+                statistics = portfolio_optimizer.statistics
+                min_risk = statistics.std.min() * 100 
+                max_risk = statistics.std.max() * 100 
                 st.write("Selected Risk Tolerance Level can't be achieved ") 
                 st.write(f"Minimum Risk : {min_risk}") 
                 st.write(f"Maximum Risk : {max_risk}")
-        except:
+        except Exception as error:
+            metrics.record_error(error)
             st.error("An error occurred while processing the data. Please ensure that the data is available and try again.")
 
         
@@ -0,0 +1,193 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import no_short_selling
+import shortselling
+from diagnostics import Metrics
+
+
+# Rolling-window backtest of the optimizers over a long price panel. One
+# optimizer walks the panel: at every rebalance date the price bars since the
+# previous rebalance are appended to it, so the sample moments are updated one
+# return row at a time (and the oldest rows dropped for a rolling window)
+# instead of re-estimated, and the solve is warm started from the previous
+# weights and active set. Between rebalances the holdings drift with the
+# prices; the realized daily returns, the turnover of every rebalance and the
+# drawdowns of the resulting equity curve are reported.
+#
+#   python backtest.py prices.csv --window 252 --rebalance 21 --long-only
+#
+# Weights chosen at the close of a rebalance date earn the returns from the next
+# day on. A rebalance whose solve fails keeps the drifted holdings.
+
+STRATEGIES = ('min_variance', 'target_return', 'risk_tolerance')
+TRADING_DAYS = 252
+
+
+class BacktestResult:
+    def __init__(self, weights, returns, turnover, failures, seconds):
+        # Target weights per rebalance date
+        self.weights = weights
+        # Realized daily portfolio returns, net of costs
+        self.returns = returns
+        self.turnover = turnover
+        # Rebalance dates whose solve failed (the drifted holdings were kept)
+        self.failures = failures
+        self.seconds = seconds
+
+    @property
+    def equity(self):
+        return (1 + self.returns).cumprod()
+
+    @property
+    def drawdown(self):
+        equity = self.equity
+        return equity / equity.cummax() - 1
+
+    def summary(self):
+        returns = self.returns
+        years = len(returns) / TRADING_DAYS
+        total = float(self.equity.iloc[-1] - 1) if len(returns) else 0.0
+        volatility = float(returns.std() * np.sqrt(TRADING_DAYS)) if len(returns) > 1 else np.nan
+        return {
+            'total_return': total,
+            'annual_return': (1 + total) ** (1 / years) - 1 if years > 0 and total > -1 else np.nan,
+            'annual_volatility': volatility,
+            'sharpe': float(returns.mean() * TRADING_DAYS / volatility) if volatility else np.nan,
+            'max_drawdown': float(self.drawdown.min()) if len(returns) else 0.0,
+            'average_turnover': float(self.turnover.mean()) if len(self.turnover) else 0.0,
+            'rebalances': len(self.weights),
+            'failures': len(self.failures),
+            'seconds': self.seconds,
+        }
+
+
+class Backtest:
+    def __init__(self, prices, optimizer_class=no_short_selling.PortfolioOptimizer, window=252, rebalance_every=21,
+                 expanding=False, strategy='min_variance', target=None, cost=0.0, metrics=None, **options):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {', '.join(STRATEGIES)}")
+        if strategy != 'min_variance' and target is None:
+            raise ValueError(f"Strategy {strategy} needs a target")
+        # Bars missing inside the history carry the last price forward; leading gaps are dropped
+        self.prices = prices.sort_index().ffill().dropna()
+        if len(self.prices) <= window:
+            raise ValueError(f"Need more than {window} price bars, got {len(self.prices)}")
+        self.optimizer_class = optimizer_class
+        # Returns per estimation window; an expanding window starts with this many and keeps them all
+        self.window = window
+        self.rebalance_every = rebalance_every
+        self.expanding = expanding
+        self.strategy = strategy
+        self.target = target
+        # Proportional trading cost charged on the turnover, e.g. 0.001 for 10 bp
+        self.cost = cost
+        self.metrics = Metrics() if metrics is None else metrics
+        # The warm-started QP by default; optimizer options otherwise pass through unchanged
+        options.setdefault('solver', 'qp')
+        self.options = options
+
+    def rebalance_rows(self):
+        # Price rows at whose close the portfolio is rebalanced
+        return list(range(self.window, len(self.prices) - 1, self.rebalance_every))
+
+    def _optimize(self, optimizer, previous):
+        # (weights, success) for the current window
+        optimizer.last_result = None
+        try:
+            if self.strategy == 'min_variance':
+                weights, _, _ = optimizer.markowitz_optimization()
+            elif self.strategy == 'target_return':
+                weights, _, _ = optimizer.markowitz_optimization_for_target_return(self.target, previous)
+            else:
+                optimizer.markowitz_optimization()
+                weights, _, _ = optimizer.markowitz_optimization_for_target_risk(self.target)
+        except ValueError:
+            # Target out of reach in this window
+            return None, False
+        weights = np.asarray(weights, dtype=float)
+        success = (optimizer.last_result is None or bool(optimizer.last_result.success)) and np.all(np.isfinite(weights))
+        return weights, success
+
+    def run(self):
+        began = time.perf_counter()
+        prices = self.prices
+        values = prices.to_numpy(dtype=float)
+        # Row i holds the return from bar i - 1 to bar i
+        returns = np.vstack((np.full((1, values.shape[1]), np.nan), values[1:] / values[:-1] - 1))
+        rows = self.rebalance_rows()
+
+        with self.metrics.span('backtest'):
+            optimizer = self.optimizer_class(prices.iloc[:self.window + 1], metrics=self.metrics, **self.options)
+            if not self.expanding:
+                optimizer.roll(self.window)
+
+            holdings = np.zeros(values.shape[1])
+            previous = None
+            targets, turnover, daily, failures = [], [], [], []
+            for k, row in enumerate(rows):
+                if k > 0:
+                    # Fold the bars since the last rebalance into the moments
+                    optimizer.append(prices.iloc[rows[k - 1] + 1:row + 1])
+                weights, success = self._optimize(optimizer, previous)
+                if not success:
+                    failures.append(prices.index[row])
+                    weights = holdings
+                else:
+                    previous = weights
+                turnover.append(np.abs(weights - holdings).sum())
+                targets.append(weights)
+
+                # Buy and hold until the next rebalance: the value of every position grows with its asset
+                end = rows[k + 1] if k + 1 < len(rows) else len(prices) - 1
+                growth = np.cumprod(1 + returns[row + 1:end + 1], axis=0)
+                value = np.concatenate(([weights.sum()], growth @ weights))
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    period = value[1:] / value[:-1] - 1
+                if len(period):
+                    period[0] -= self.cost * turnover[-1]
+                daily.append(period)
+                holdings = weights * growth[-1] / value[-1] if value[-1] != 0 else weights
+
+        dates = prices.index[rows]
+        result_returns = pd.Series(np.concatenate(daily), index=prices.index[rows[0] + 1:], name='return')
+        return BacktestResult(pd.DataFrame(np.array(targets), index=dates, columns=prices.columns),
+                              result_returns.fillna(0.0), pd.Series(turnover, index=dates, name='turnover'),
+                              failures, time.perf_counter() - began)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backtest rolling Markowitz portfolios on a price panel')
+    parser.add_argument('prices', help='wide CSV price panel, dates in the first column')
+    parser.add_argument('--window', type=int, default=252, help='returns per estimation window')
+    parser.add_argument('--rebalance', type=int, default=21, help='trading days between rebalances')
+    parser.add_argument('--expanding', action='store_true', help='keep every return instead of a rolling window')
+    parser.add_argument('--long-only', action='store_true')
+    parser.add_argument('--strategy', default='min_variance', choices=STRATEGIES)
+    parser.add_argument('--target', type=float, help='daily target return or risk, as a fraction')
+    parser.add_argument('--cost', type=float, default=0.0, help='trading cost per unit of turnover')
+    parser.add_argument('--cov-estimator', default='sample', choices=('sample', 'ledoit_wolf', 'factor'))
+    parser.add_argument('--weights', help='write the rebalance weights to this CSV')
+    args = parser.parse_args(argv)
+
+    prices = pd.read_csv(args.prices, index_col=0, parse_dates=True)
+    optimizer_class = no_short_selling.PortfolioOptimizer if args.long_only else shortselling.PortfolioOptimizer
+    try:
+        backtest = Backtest(prices, optimizer_class, args.window, args.rebalance, args.expanding, args.strategy,
+                            args.target, args.cost, cov_estimator=args.cov_estimator)
+    except ValueError as error:
+        parser.error(str(error))
+    result = backtest.run()
+    if args.weights:
+        result.weights.to_csv(args.weights)
+    for key, value in result.summary().items():
+        print(f'{key:>18}: {value:.6g}' if isinstance(value, float) else f'{key:>18}: {value}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
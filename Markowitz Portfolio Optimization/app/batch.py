@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import no_short_selling
+import shortselling
+from moments import MomentStatistics
+
+
+# Many small optimization jobs over one shared price panel. The universe
+# moments are estimated once and every job slices its sub-covariance from
+# them. Short-selling jobs of the same basket size are solved together with
+# one stacked closed-form solve; long-only jobs (and short-selling jobs whose
+# closed form breaks the (-1, 1) bounds) go through the regular optimizers,
+# optionally on a thread pool.
+#
+# A job is a dict with 'tickers', optional 'short_selling' (default True) and
+# optional 'target_return' (None gives the minimum variance portfolio).
+
+RESULT_COLUMNS = ['job', 'tickers', 'short_selling', 'target_return', 'risk', 'return', 'weights', 'success', 'method']
+
+
+def _normalize_job(job):
+    return {
+        'tickers': list(job['tickers']),
+        'short_selling': bool(job.get('short_selling', True)),
+        'target_return': job.get('target_return'),
+    }
+
+
+def _result(job_id, job, weights, risk, return_, success, method):
+    return {
+        'job': job_id, 'tickers': job['tickers'], 'short_selling': job['short_selling'],
+        'target_return': job['target_return'], 'risk': risk, 'return': return_,
+        'weights': weights, 'success': success, 'method': method,
+    }
+
+
+def _solve_closed_form(universe, job_ids, jobs):
+    # Stack the sub-covariances of equally sized baskets and solve them in one call
+    subsets = [universe.subset(jobs[i]['tickers']) for i in job_ids]
+    covs = np.stack([subset.covariance.to_dense() for subset in subsets])
+    means = np.stack([subset.mean for subset in subsets])
+    ones = np.ones_like(means)
+    try:
+        solved = np.linalg.solve(covs, np.stack((ones, means), axis=-1))
+    except np.linalg.LinAlgError:
+        return {}
+    inv_ones, inv_mean = solved[..., 0], solved[..., 1]
+    a = np.einsum('ij,ij->i', ones, inv_ones)
+    b = np.einsum('ij,ij->i', ones, inv_mean)
+    c = np.einsum('ij,ij->i', means, inv_mean)
+    d = a * c - b * b
+
+    results = {}
+    for k, i in enumerate(job_ids):
+        target_return = jobs[i]['target_return']
+        if target_return is None:
+            if not a[k] > 0:
+                continue
+            weights = inv_ones[k] / a[k]
+            risk, return_ = np.sqrt(1 / a[k]), b[k] / a[k]
+        else:
+            if not (np.isfinite(d[k]) and a[k] > 0 and d[k] > 1e-12 * a[k] * c[k]):
+                continue
+            weights = ((c[k] - b[k] * target_return) * inv_ones[k] + (a[k] * target_return - b[k]) * inv_mean[k]) / d[k]
+            risk = np.sqrt(max((a[k] * target_return ** 2 - 2 * b[k] * target_return + c[k]) / d[k], 0))
+            return_ = target_return
+        if np.all(np.abs(weights) <= 1 + shortselling.PortfolioOptimizer.bound_tolerance):
+            results[i] = (weights, risk, return_, True, 'analytic')
+    return results
+
+
+def _solve_numeric(universe, job):
+    statistics = universe.subset(job['tickers'])
+    if job['short_selling']:
+        optimizer = shortselling.PortfolioOptimizer.from_statistics(statistics, frontier_mode='numeric')
+    else:
+        optimizer = no_short_selling.PortfolioOptimizer.from_statistics(statistics)
+    if job['target_return'] is None:
+        weights, risk, return_ = optimizer.markowitz_optimization()
+    else:
+        weights, risk, return_ = optimizer.markowitz_optimization_for_target_return(job['target_return'])
+    result = optimizer.last_result
+    method = optimizer.solver
+    return weights, risk, return_, bool(result.success), method
+
+
+def optimize_batch(prices, jobs, workers=None, cov_estimator='sample', num_factors=None):
+    jobs = [_normalize_job(job) for job in jobs]
+    universe_tickers = list(dict.fromkeys(ticker for job in jobs for ticker in job['tickers']))
+    universe, _ = MomentStatistics.from_prices(prices[universe_tickers], cov_estimator, num_factors)
+
+    # Closed-form pass over the short-selling jobs, grouped by basket size
+    solved = {}
+    by_size = {}
+    for i, job in enumerate(jobs):
+        if job['short_selling']:
+            by_size.setdefault(len(job['tickers']), []).append(i)
+    for job_ids in by_size.values():
+        solved.update(_solve_closed_form(universe, job_ids, jobs))
+
+    # Everything else through the optimizers
+    remaining = [i for i in range(len(jobs)) if i not in solved]
+    if workers and workers > 1 and len(remaining) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            numeric = pool.map(lambda i: _solve_numeric(universe, jobs[i]), remaining)
+            solved.update(zip(remaining, numeric))
+    else:
+        for i in remaining:
+            solved[i] = _solve_numeric(universe, jobs[i])
+
+    rows = [_result(i, jobs[i], *solved[i]) for i in range(len(jobs))]
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
@@ -0,0 +1,318 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import no_short_selling
+import shortselling
+from price_store import DEFAULT_DIRECTORY, PriceStore
+
+
+# Headless batch runner: every basket of a CSV or JSON file goes through the same
+# optimizer calls as the app pages, on a process pool, and each result row is
+# written to the output as soon as its basket finishes. Rerunning the same
+# command resumes: baskets with a successful row in the output are skipped, and
+# failed ones are solved again (their new row follows the failed one, so the
+# last row of an id is its current result).
+#
+#   python batch_cli.py baskets.csv --output results.csv --workers 8
+#   python batch_cli.py baskets.json --output results.parquet --prices panel.csv
+#
+# A basket has an 'id', 'tickers' (a list, or one string separated by spaces,
+# commas or semicolons), optional 'short_selling' (default yes), 'mode'
+# ('min_variance', 'target_return' or 'risk_tolerance'), 'target' (a fraction,
+# e.g. 0.001 for a 0.1% daily return or risk) and 'start'/'end' dates.
+#
+# Prices come from a wide CSV panel (--prices, dates in the first column) or
+# from the local price store, which the parent fills once for every basket
+# before the workers start reading it.
+
+MODES = ('min_variance', 'target_return', 'risk_tolerance')
+RESULT_COLUMNS = ['id', 'tickers', 'short_selling', 'mode', 'target', 'risk', 'return', 'success', 'weights', 'error', 'seconds']
+
+_worker = {}
+
+
+def _flag(value, default=True):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value == '':
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def _basket(record, position):
+    tickers = record.get('tickers')
+    if isinstance(tickers, str):
+        tickers = [ticker for ticker in re.split(r'[\s,;]+', tickers) if ticker]
+    mode = record.get('mode') or 'min_variance'
+    if mode not in MODES:
+        raise ValueError(f"Basket {position}: unknown mode {mode!r}, expected one of {', '.join(MODES)}")
+    target = record.get('target')
+    target = None if target is None or target == '' or (isinstance(target, float) and np.isnan(target)) else float(target)
+    if mode != 'min_variance' and target is None:
+        raise ValueError(f"Basket {position}: mode {mode} needs a target")
+    basket_id = record.get('id')
+    return {
+        'id': str(position if basket_id is None or basket_id == '' else basket_id),
+        'tickers': list(tickers or []),
+        'short_selling': _flag(record.get('short_selling')),
+        'mode': mode,
+        'target': target,
+        'start': record.get('start') or None,
+        'end': record.get('end') or None,
+    }
+
+
+def load_baskets(path):
+    if path.endswith('.json'):
+        with open(path) as file:
+            records = json.load(file)
+        if isinstance(records, dict):
+            records = records['baskets']
+    else:
+        records = pd.read_csv(path, dtype=str, keep_default_na=False).to_dict('records')
+    baskets = [_basket(record, i) for i, record in enumerate(records)]
+    ids = [basket['id'] for basket in baskets]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Basket ids must be unique")
+    return baskets
+
+
+class CsvSink:
+    # One CSV row per finished basket, flushed immediately
+    def __init__(self, path, resume=True):
+        self.path = path
+        exists = resume and os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            self._drop_partial_line()
+        self._file = open(path, 'a' if exists else 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=RESULT_COLUMNS)
+        if not exists:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def _drop_partial_line(self):
+        # An interrupted write can leave half a row at the end of the file
+        with open(self.path, 'rb+') as file:
+            data = file.read()
+            if not data.endswith(b'\n'):
+                file.truncate(data.rfind(b'\n') + 1)
+
+    def completed(self):
+        # Ids with a successful row; failed baskets are retried
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return set()
+        rows = pd.read_csv(self.path, usecols=['id', 'success'], dtype=str)
+        return set(rows['id'][rows['success'] == 'True'])
+
+    def write(self, row):
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    # A directory of part files, each written atomically every flush_rows rows
+    def __init__(self, path, resume=True, flush_rows=500):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow); use a .csv output instead")
+        self._pyarrow = pyarrow
+        self._parquet = pyarrow.parquet
+        self.path = path
+        self.flush_rows = flush_rows
+        self._rows = []
+        if not resume and os.path.isdir(path):
+            for name in os.listdir(path):
+                if name.startswith('part-'):
+                    os.remove(os.path.join(path, name))
+        os.makedirs(path, exist_ok=True)
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith('part-') and name.endswith('.parquet'))
+
+    def completed(self):
+        # Ids with a successful row; failed baskets are retried
+        ids = set()
+        for name in self._parts():
+            table = self._parquet.read_table(os.path.join(self.path, name), columns=['id', 'success'])
+            ids.update(id_ for id_, success in zip(table.column('id').to_pylist(), table.column('success').to_pylist()) if success)
+        return ids
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        table = self._pyarrow.Table.from_pandas(pd.DataFrame(self._rows, columns=RESULT_COLUMNS), preserve_index=False)
+        parts = self._parts()
+        number = int(parts[-1][5:10]) + 1 if parts else 0
+        final = os.path.join(self.path, f'part-{number:05d}.parquet')
+        temporary = final + '.tmp'
+        self._parquet.write_table(table, temporary)
+        os.replace(temporary, final)
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def open_sink(path, resume=True):
+    if path.endswith('.parquet'):
+        return ParquetSink(path, resume)
+    return CsvSink(path, resume)
+
+
+def _window(basket, start, end):
+    return pd.Timestamp(basket['start'] or start).normalize(), pd.Timestamp(basket['end'] or end)
+
+
+def _init_worker(panel, store_directory, start, end, cov_estimator):
+    _worker['panel'] = panel
+    _worker['store'] = PriceStore(store_directory) if panel is None else None
+    _worker['window'] = (start, end)
+    _worker['cov_estimator'] = cov_estimator
+
+
+def _basket_prices(basket):
+    start, end = _window(basket, *_worker['window'])
+    panel = _worker['panel']
+    if panel is None:
+        prices = _worker['store'].read(basket['tickers'], start, end)
+    else:
+        missing = [ticker for ticker in basket['tickers'] if ticker not in panel.columns]
+        if missing:
+            raise KeyError(f"No prices for {', '.join(missing)}")
+        prices = panel.loc[(panel.index >= start) & (panel.index < end), basket['tickers']]
+    # Same gap filling as the app pages
+    return prices.fillna(prices.mean())
+
+
+def solve_basket(basket):
+    started = time.perf_counter()
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(id=basket['id'], tickers=' '.join(basket['tickers']), short_selling=basket['short_selling'],
+               mode=basket['mode'], target=basket['target'], success=False, error='')
+    try:
+        prices = _basket_prices(basket)
+        optimizer_class = shortselling.PortfolioOptimizer if basket['short_selling'] else no_short_selling.PortfolioOptimizer
+        optimizer = optimizer_class(prices, cov_estimator=_worker['cov_estimator'])
+        if basket['mode'] == 'min_variance':
+            weights, risk, return_ = optimizer.markowitz_optimization()
+            success = optimizer.last_result is None or bool(optimizer.last_result.success)
+        elif basket['mode'] == 'target_return':
+            weights, risk, return_ = optimizer.markowitz_optimization_for_target_return(basket['target'])
+            success = optimizer.last_result is None or bool(optimizer.last_result.success)
+        else:
+            # Raises ValueError when the risk can't be reached; last_result is None for a closed-form point
+            optimizer.markowitz_optimization()
+            weights, risk, return_ = optimizer.markowitz_optimization_for_target_risk(basket['target'])
+            success = optimizer.last_result is None or bool(optimizer.last_result.success)
+        row.update(risk=float(risk), success=success,
+                   weights=json.dumps(dict(zip(basket['tickers'], np.round(np.asarray(weights, dtype=float), 10).tolist()))))
+        row['return'] = float(return_)
+    except Exception as error:
+        row['error'] = f'{type(error).__name__}: {error}'
+    row['seconds'] = round(time.perf_counter() - started, 6)
+    return row
+
+
+def _prefetch(store_directory, baskets, start, end):
+    # Fill the store once per distinct window so workers only read it
+    store = PriceStore(store_directory)
+    windows = {}
+    for basket in baskets:
+        windows.setdefault(_window(basket, start, end), set()).update(basket['tickers'])
+    for (window_start, window_end), tickers in windows.items():
+        store.update(sorted(tickers), window_start, window_end)
+
+
+def run_batch(baskets, sink, panel=None, store_directory=DEFAULT_DIRECTORY, start=None, end=None, workers=None,
+              cov_estimator='sample', log=None):
+    # Solve every basket without a successful row in the sink and stream the rows into it;
+    # returns (solved, skipped, failed)
+    end = pd.Timestamp.now() if end is None else end
+    start = pd.Timestamp(end) - pd.DateOffset(months=3) if start is None else start
+    done = sink.completed()
+    pending = [basket for basket in baskets if basket['id'] not in done]
+    if panel is None and pending:
+        _prefetch(store_directory, pending, start, end)
+
+    initargs = (panel, store_directory, start, end, cov_estimator)
+    solved = failed = 0
+    began = time.perf_counter()
+
+    def finished(row):
+        nonlocal solved, failed
+        sink.write(row)
+        solved += 1
+        failed += int(not row['success'])
+        if log is not None and (solved % 100 == 0 or solved == len(pending)):
+            log(f'{solved}/{len(pending)} baskets, {failed} failed, {time.perf_counter() - began:.1f}s')
+
+    if not workers or workers == 1:
+        _init_worker(*initargs)
+        for basket in pending:
+            finished(solve_basket(basket))
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+        try:
+            futures = [pool.submit(solve_basket, basket) for basket in pending]
+            for future in as_completed(futures):
+                finished(future.result())
+        finally:
+            # On an interrupt, drop the queued baskets; the next run picks them up
+            pool.shutdown(wait=True, cancel_futures=True)
+    return solved, len(baskets) - len(pending), failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Optimize many baskets without the Streamlit UI')
+    parser.add_argument('baskets', help='basket definitions, .csv or .json')
+    parser.add_argument('--output', required=True, help='results file, .csv or .parquet (a directory of part files)')
+    parser.add_argument('--prices', help='wide CSV price panel; the local price store is used when omitted')
+    parser.add_argument('--store', default=DEFAULT_DIRECTORY, help='price store directory')
+    parser.add_argument('--start', help='default window start (3 months before --end)')
+    parser.add_argument('--end', help='default window end (now)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--cov-estimator', default='sample', choices=('sample', 'ledoit_wolf', 'factor'))
+    parser.add_argument('--no-resume', action='store_true', help='start the output over instead of skipping successfully solved baskets')
+    args = parser.parse_args(argv)
+
+    baskets = load_baskets(args.baskets)
+    panel = None
+    if args.prices:
+        panel = pd.read_csv(args.prices, index_col=0, parse_dates=True).sort_index()
+    try:
+        sink = open_sink(args.output, resume=not args.no_resume)
+    except RuntimeError as error:
+        parser.error(str(error))
+    try:
+        solved, skipped, failed = run_batch(baskets, sink, panel, args.store, args.start, args.end, args.workers,
+                                            args.cov_estimator, log=lambda line: print(line, file=sys.stderr))
+    except KeyboardInterrupt:
+        print(f'Interrupted; rerun the same command to resume from {args.output}', file=sys.stderr)
+        return 130
+    finally:
+        sink.close()
+    print(f'{solved} solved ({failed} failed), {skipped} already solved in {args.output}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import no_short_selling
+import shortselling
+from frontier_figure import payload_size
+from moments import MomentStatistics
+
+
+# Benchmark suite for the optimizers on synthetic correlated prices (no network).
+# Every (variant, asset count, history length) case times the minimum variance,
+# target-return, max-return and plotting calls once, and the frontier once per
+# resolution. Each call runs twice on a fresh optimizer over the same moments:
+# once for wall time and once under tracemalloc for peak memory. Quality is the
+# budget and constraint violation of the weights and, where the closed-form
+# optimum lies inside the variant's bounds (so it is the true optimum), the gap
+# to it. Results are saved as JSON and two runs can be compared for regressions.
+#
+#   python benchmark.py run --assets 2,10,50,200 --output bench.json
+#   python benchmark.py compare baseline.json bench.json
+
+VARIANTS = {
+    # Closed-form frontier, the QP only for points where the bounds bind
+    'short': (shortselling.PortfolioOptimizer, {}),
+    'short-numeric': (shortselling.PortfolioOptimizer, {'frontier_mode': 'numeric'}),
+    'long': (no_short_selling.PortfolioOptimizer, {}),
+    'long-slsqp': (no_short_selling.PortfolioOptimizer, {'solver': 'slsqp'}),
+}
+
+ASSET_COUNTS = (2, 10, 50, 200, 500, 1000, 2000)
+HISTORY_LENGTHS = (252, 1260)
+RESOLUTIONS = (20, 60)
+
+# SLSQP works on dense (n x n) systems; larger baskets skip max-return (always SLSQP) and
+# run the variants whose solver is SLSQP with the constrained QP instead, which the
+# solver column of their rows records
+MAX_SLSQP_ASSETS = 300
+
+RECORD_COLUMNS = ['variant', 'assets', 'days', 'resolution', 'operation', 'cov_estimator', 'solver', 'seconds', 'peak_mb',
+                  'success', 'budget_violation', 'constraint_violation', 'analytic_gap', 'payload_bytes']
+CASE_COLUMNS = ['variant', 'assets', 'days', 'resolution', 'operation']
+
+
+def synthetic_prices(num_assets, num_days, num_factors=3, seed=0, start='2020-01-01'):
+    # Daily prices driven by a few common factors (the first one a market factor)
+    # plus idiosyncratic noise, so the assets are correlated like real equities
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(0.0, 0.5, size=(num_assets, num_factors))
+    loadings[:, 0] = rng.uniform(0.5, 1.5, size=num_assets)
+    factors = rng.normal(0.0, 0.01, size=(num_days, num_factors))
+    drift = rng.normal(0.0004, 0.0003, size=num_assets)
+    noise = rng.normal(0.0, 1.0, size=(num_days, num_assets)) * rng.uniform(0.01, 0.03, size=num_assets)
+    returns = drift + factors @ loadings.T + noise
+    tickers = [f'SYN{i:04d}' for i in range(num_assets)]
+    index = pd.bdate_range(start, periods=num_days)
+    return pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=index, columns=tickers)
+
+
+class AnalyticReference:
+    # Closed-form frontier of min w'Σw subject to 1'w = 1 and μ'w = t, bounds ignored
+    def __init__(self, statistics):
+        ones = np.ones(statistics.num_assets)
+        solved = statistics.covariance.solve(np.column_stack((ones, statistics.mean)))
+        self.inv_ones, self.inv_mean = solved[:, 0], solved[:, 1]
+        self.a = ones @ self.inv_ones
+        self.b = ones @ self.inv_mean
+        self.c = statistics.mean @ self.inv_mean
+        self.d = self.a * self.c - self.b * self.b
+
+    def min_variance(self):
+        return self.inv_ones / self.a, np.sqrt(1 / self.a)
+
+    def target_return(self, target):
+        g = (self.c * self.inv_ones - self.b * self.inv_mean) / self.d
+        h = (self.a * self.inv_mean - self.b * self.inv_ones) / self.d
+        variance = (self.a * target ** 2 - 2 * self.b * target + self.c) / self.d
+        return g + h * target, np.sqrt(max(variance, 0.0))
+
+    def max_return(self, target_risk):
+        # Upper root of σ²(t) = target_risk²
+        discriminant = self.b ** 2 - self.a * (self.c - self.d * target_risk ** 2)
+        target = (self.b + np.sqrt(max(discriminant, 0.0))) / self.a
+        return self.target_return(target)[0], target
+
+
+def _measure(operation, memory=True):
+    # Wall time of one call, then peak traced memory of a second call
+    start = time.perf_counter()
+    result = operation()
+    seconds = time.perf_counter() - start
+    peak_mb = np.nan
+    if memory:
+        tracemalloc.start()
+        try:
+            operation()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def _call(make, method, *args):
+    # One call on a fresh optimizer; success is that of the last solver run (closed form counts as success)
+    optimizer = make()
+    result = getattr(optimizer, method)(*args)
+    succeeded = optimizer.last_result is None or bool(optimizer.last_result.success)
+    if method == 'frontier_grid' and optimizer.sweep_stats is not None:
+        succeeded = optimizer.sweep_stats['failures'] == 0
+    return result, succeeded
+
+
+def _quality(optimizer, weights):
+    compiled = optimizer.compiled_constraints()
+    return abs(np.sum(weights) - 1), max(compiled.violation(weights), 0.0)
+
+
+def _gap(optimizer, reference_weights, value):
+    # Distance from the closed form, only where the closed form respects the bounds
+    compiled = optimizer.compiled_constraints()
+    if np.all((reference_weights >= compiled.lower - 1e-9) & (reference_weights <= compiled.upper + 1e-9)):
+        return value
+    return np.nan
+
+
+def benchmark_case(variant, statistics, days, resolutions=RESOLUTIONS, memory=True, max_slsqp_assets=MAX_SLSQP_ASSETS):
+    optimizer_class, options = VARIANTS[variant]
+    num_assets = statistics.num_assets
+    slsqp_allowed = num_assets <= max_slsqp_assets
+
+    def fresh():
+        return optimizer_class.from_statistics(statistics, **options)
+
+    probe = fresh()
+    if not slsqp_allowed and probe.solver == 'slsqp':
+        options = dict(options, solver='qp')
+        probe = fresh()
+
+    reference = AnalyticReference(statistics)
+    base = {'variant': variant, 'assets': num_assets, 'days': days, 'resolution': None, 'cov_estimator': statistics.estimator,
+            'solver': probe.solver}
+    records = []
+
+    def record(operation, seconds, peak_mb, success, weights=None, analytic_gap=np.nan, **extra):
+        row = dict(base, operation=operation, seconds=seconds, peak_mb=peak_mb, success=success, analytic_gap=analytic_gap,
+                   budget_violation=np.nan, constraint_violation=np.nan, payload_bytes=np.nan)
+        if weights is not None:
+            row['budget_violation'], row['constraint_violation'] = _quality(probe, weights)
+        row.update(extra)
+        records.append(row)
+
+    # Targets shared by every call: halfway between the minimum variance return and the best asset
+    ((weights, risk, min_return), success), seconds, peak_mb = _measure(lambda: _call(fresh, 'markowitz_optimization'), memory)
+    reference_weights, reference_risk = reference.min_variance()
+    record('min_variance', seconds, peak_mb, success, weights, _gap(probe, reference_weights, risk - reference_risk))
+
+    target = (min_return + statistics.mean.max()) / 2
+    ((weights, risk, _), success), seconds, peak_mb = _measure(lambda: _call(fresh, 'markowitz_optimization_for_target_return', target), memory)
+    reference_weights, reference_risk = reference.target_return(target)
+    record('target_return', seconds, peak_mb, success, weights, _gap(probe, reference_weights, risk - reference_risk))
+    target_risk = risk
+
+    if slsqp_allowed:
+        ((weights, return_), success), seconds, peak_mb = _measure(lambda: _call(fresh, 'markowitz_optimization_max_return', target_risk), memory)
+        reference_weights, reference_return = reference.max_return(target_risk)
+        record('max_return', seconds, peak_mb, success, weights, _gap(probe, reference_weights, reference_return - return_), solver='slsqp')
+
+    for resolution in resolutions:
+        ((targets, weights, risks, return_), success), seconds, peak_mb = _measure(lambda: _call(fresh, 'frontier_grid', resolution), memory)
+        # Worst point of the frontier against the closed form at the same return
+        gaps = []
+        for point_risk, point_return in zip(risks, return_):
+            reference_weights, reference_risk = reference.target_return(point_return)
+            gaps.append(_gap(probe, reference_weights, point_risk - reference_risk))
+        gaps = np.array(gaps)
+        worst_gap = np.nanmax(gaps) if np.any(~np.isnan(gaps)) else np.nan
+        budget_violation, constraint_violation = np.max([_quality(probe, w) for w in weights], axis=0)
+        record('frontier', seconds, peak_mb, success, None, worst_gap, resolution=resolution,
+               budget_violation=budget_violation, constraint_violation=constraint_violation)
+
+    figure, seconds, peak_mb = _measure(lambda: fresh().plot_efficient_frontier(), memory)
+    record('plot', seconds, peak_mb, True, payload_bytes=payload_size(figure))
+    return records
+
+
+def run_benchmarks(variants=('short', 'long'), asset_counts=ASSET_COUNTS, history_lengths=HISTORY_LENGTHS, resolutions=RESOLUTIONS,
+                   seed=0, memory=True, max_slsqp_assets=MAX_SLSQP_ASSETS, log=None):
+    records = []
+    for days in history_lengths:
+        for num_assets in asset_counts:
+            prices = synthetic_prices(num_assets, days + 1, seed=seed)
+            # The sample covariance is singular with fewer observations than assets
+            estimator = 'sample' if days > num_assets else 'ledoit_wolf'
+            statistics, _ = MomentStatistics.from_prices(prices, estimator)
+            for variant in variants:
+                case = benchmark_case(variant, statistics, days, resolutions, memory, max_slsqp_assets)
+                records.extend(case)
+                if log is not None:
+                    status = f"{sum(row['seconds'] for row in case):8.3f}s" if case else 'skipped'
+                    log(f'{variant:>14} assets={num_assets:<5} days={days:<5} {status}')
+    return pd.DataFrame(records, columns=RECORD_COLUMNS)
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'platform': platform.platform(), 'machine': platform.machine(), 'commit': commit, 'created': pd.Timestamp.now().isoformat()}
+
+
+def save_results(results, path):
+    payload = {'environment': _environment(), 'records': json.loads(results.to_json(orient='records'))}
+    with open(path, 'w') as file:
+        json.dump(payload, file, indent=1)
+
+
+def load_results(path):
+    with open(path) as file:
+        payload = json.load(file)
+    return pd.DataFrame(payload['records'], columns=RECORD_COLUMNS), payload.get('environment', {})
+
+
+def compare_results(baseline, current, time_ratio=1.25, min_seconds=0.005, memory_ratio=1.25, gap_tolerance=1e-8):
+    # Cases present in both runs, flagged when time or memory grow beyond the ratios
+    # (ignoring sub-min_seconds noise), when the analytic gap worsens or when a solve starts failing
+    keys = list(CASE_COLUMNS)
+    baseline = baseline.assign(resolution=baseline['resolution'].fillna(-1))
+    current = current.assign(resolution=current['resolution'].fillna(-1))
+    merged = baseline.merge(current, on=keys, suffixes=('_baseline', '_current'))
+    merged['time_ratio'] = merged['seconds_current'] / merged['seconds_baseline']
+    merged['memory_ratio'] = merged['peak_mb_current'] / merged['peak_mb_baseline']
+    slower = (merged['time_ratio'] > time_ratio) & (merged['seconds_current'] - merged['seconds_baseline'] > min_seconds)
+    heavier = merged['memory_ratio'] > memory_ratio
+    worse = merged['analytic_gap_current'].fillna(0) > merged['analytic_gap_baseline'].fillna(0) + gap_tolerance
+    failing = merged['success_baseline'].astype(bool) & ~merged['success_current'].astype(bool)
+    merged['regression'] = slower | heavier | worse | failing
+    merged['resolution'] = merged['resolution'].replace(-1, np.nan)
+    return merged[keys + ['seconds_baseline', 'seconds_current', 'time_ratio', 'peak_mb_baseline', 'peak_mb_current', 'memory_ratio',
+                          'analytic_gap_baseline', 'analytic_gap_current', 'regression']]
+
+
+def _integers(text):
+    return tuple(int(value) for value in text.split(','))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the portfolio optimizers on synthetic prices')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run the benchmark sweep')
+    run.add_argument('--variants', default='short,long', help=f'comma separated, from {", ".join(VARIANTS)}')
+    run.add_argument('--assets', type=_integers, default=ASSET_COUNTS)
+    run.add_argument('--days', type=_integers, default=HISTORY_LENGTHS)
+    run.add_argument('--resolutions', type=_integers, default=RESOLUTIONS)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    run.add_argument('--max-slsqp-assets', type=int, default=MAX_SLSQP_ASSETS, help='above this many assets skip max-return and solve the SLSQP variants with the QP')
+    run.add_argument('--output', default='benchmark.json')
+    compare = commands.add_parser('compare', help='compare two saved runs')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--time-ratio', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        variants = args.variants.split(',')
+        for variant in variants:
+            if variant not in VARIANTS:
+                parser.error(f'unknown variant {variant}')
+        results = run_benchmarks(variants, args.assets, args.days, args.resolutions, args.seed, not args.no_memory,
+                                 args.max_slsqp_assets, log=lambda line: print(line, file=sys.stderr))
+        save_results(results, args.output)
+        with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.max_rows', None):
+            print(results.drop(columns=['cov_estimator']).to_string(index=False))
+        return 0
+
+    baseline, _ = load_results(args.baseline)
+    current, _ = load_results(args.current)
+    comparison = compare_results(baseline, current, args.time_ratio)
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.max_rows', None):
+        print(comparison.to_string(index=False))
+    regressions = int(comparison['regression'].sum())
+    print(f'{regressions} regression(s) in {len(comparison)} comparable case(s)')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import hashlib
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+
+
+# Portfolio constraint specs and their compiled form. Specs refer to tickers
+# and sectors; compile_constraints turns them, once per basket, into per-asset
+# bound vectors, a matrix of linear rows with lower/upper limits and l1 balls
+# (gross leverage, turnover), which every solve along a frontier then reuses.
+
+class PositionLimits:
+    # Per-asset bounds: a scalar applies to every asset, a dict maps tickers to limits
+    def __init__(self, lower=None, upper=None):
+        self.lower = lower
+        self.upper = upper
+
+
+class SectorLimits:
+    # Bounds on the total weight of each sector; sectors maps tickers to sector names
+    # and lower/upper are scalars or dicts keyed by sector
+    def __init__(self, sectors, lower=None, upper=None):
+        self.sectors = sectors
+        self.lower = lower
+        self.upper = upper
+
+
+class LinearLimit:
+    # lower <= sum(coefficients[ticker] * w[ticker]) <= upper
+    def __init__(self, coefficients, lower=-np.inf, upper=np.inf):
+        self.coefficients = coefficients
+        self.lower = lower
+        self.upper = upper
+
+
+class GrossLeverage:
+    # sum |w| <= limit
+    def __init__(self, limit):
+        self.limit = limit
+
+
+class Turnover:
+    # sum |w - holdings| <= limit, holdings maps tickers to current weights (missing ones are 0)
+    def __init__(self, holdings, limit):
+        self.holdings = holdings
+        self.limit = limit
+
+
+class MinimumPosition:
+    # Every asset is either left out or held with |w| >= size
+    def __init__(self, size):
+        self.size = size
+
+
+def _per_asset(value, tickers, default):
+    values = np.full(len(tickers), float(default))
+    if isinstance(value, dict):
+        for i, ticker in enumerate(tickers):
+            if ticker in value:
+                values[i] = value[ticker]
+    elif value is not None:
+        values[:] = value
+    return values
+
+
+def _per_sector(value, sector, default):
+    if isinstance(value, dict):
+        return value.get(sector, default)
+    return default if value is None else value
+
+
+def project_l1_ball(point, center, radius):
+    # Euclidean projection onto {x : sum |x - center| <= radius} (Duchi et al., 2008)
+    offset = point - center
+    magnitude = np.abs(offset)
+    if magnitude.sum() <= radius:
+        return point
+    ordered = np.sort(magnitude)[::-1]
+    cumulative = np.cumsum(ordered) - radius
+    count = np.arange(1, len(ordered) + 1)
+    last = np.flatnonzero(ordered > cumulative / count)[-1]
+    threshold = cumulative[last] / (last + 1)
+    return center + np.sign(offset) * np.maximum(magnitude - threshold, 0.0)
+
+
+class CompiledConstraints:
+    def __init__(self, tickers, lower, upper, rows=None, row_lower=None, row_upper=None, balls=(), min_position=0.0):
+        num_assets = len(tickers)
+        self.tickers = list(tickers)
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.rows = np.zeros((0, num_assets)) if rows is None else np.asarray(rows, dtype=float)
+        self.row_lower = np.zeros(0) if row_lower is None else np.asarray(row_lower, dtype=float)
+        self.row_upper = np.zeros(0) if row_upper is None else np.asarray(row_upper, dtype=float)
+        # (center, radius) of every l1 ball
+        self.balls = [(np.asarray(center, dtype=float), float(radius)) for center, radius in balls]
+        self.min_position = float(min_position)
+        self._slsqp = None
+
+    @classmethod
+    def box(cls, num_assets, lower, upper):
+        return cls(range(num_assets), np.full(num_assets, float(lower)), np.full(num_assets, float(upper)))
+
+    @property
+    def box_only(self):
+        # Only per-asset bounds, so the budget-constrained problem has no other coupling
+        return len(self.rows) == 0 and not self.balls and self.min_position == 0
+
+    @property
+    def digest(self):
+        digest = hashlib.sha256()
+        for array in (self.lower, self.upper, self.rows, self.row_lower, self.row_upper):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        for center, radius in self.balls:
+            digest.update(center.tobytes())
+            digest.update(repr(radius).encode())
+        digest.update(repr(self.min_position).encode())
+        return digest.hexdigest()
+
+    def violation(self, weights):
+        # Largest violation of any constraint (budget excluded)
+        worst = max(np.max(self.lower - weights, initial=0.0), np.max(weights - self.upper, initial=0.0))
+        if len(self.rows):
+            values = self.rows @ weights
+            worst = max(worst, np.max(self.row_lower - values), np.max(values - self.row_upper))
+        for center, radius in self.balls:
+            worst = max(worst, np.abs(weights - center).sum() - radius)
+        return worst
+
+    def slsqp(self):
+        # SLSQP constraint dicts for the rows and balls, with their Jacobians, built once
+        if self._slsqp is None:
+            constraints = []
+            finite_upper = np.isfinite(self.row_upper)
+            finite_lower = np.isfinite(self.row_lower)
+            if finite_upper.any():
+                upper_rows, upper_values = self.rows[finite_upper], self.row_upper[finite_upper]
+                constraints.append({'type': 'ineq', 'fun': lambda x: upper_values - upper_rows @ x, 'jac': lambda x: -upper_rows})
+            if finite_lower.any():
+                lower_rows, lower_values = self.rows[finite_lower], self.row_lower[finite_lower]
+                constraints.append({'type': 'ineq', 'fun': lambda x: lower_rows @ x - lower_values, 'jac': lambda x: lower_rows})
+            for center, radius in self.balls:
+                constraints.append({'type': 'ineq', 'fun': lambda x, c=center, r=radius: r - np.abs(x - c).sum(),
+                                    'jac': lambda x, c=center: -np.sign(x - c)})
+            self._slsqp = constraints
+        return self._slsqp
+
+    def return_range(self, returns_mean, lower=None, upper=None):
+        # Lowest and highest return a fully invested portfolio can reach, None when infeasible
+        extremes = self.extreme_portfolios(returns_mean, lower, upper)
+        if extremes is None:
+            return None
+        return float(extremes[0] @ returns_mean), float(extremes[1] @ returns_mean)
+
+    def extreme_portfolios(self, returns_mean, lower=None, upper=None):
+        # Fully invested portfolios with the lowest and the highest return, None when infeasible
+        lower = self.lower if lower is None else lower
+        upper = self.upper if upper is None else upper
+        if len(self.rows) == 0 and not self.balls:
+            order = np.argsort(returns_mean)
+            lowest = self._greedy(order, lower, upper)
+            return None if lowest is None else (lowest, self._greedy(order[::-1], lower, upper))
+        lowest = self._linear_program(returns_mean, lower, upper)
+        highest = self._linear_program(-returns_mean, lower, upper)
+        return None if lowest is None or highest is None else (lowest, highest)
+
+    def _greedy(self, order, lower, upper):
+        # Fill the budget in the given asset order, starting from the lower bounds
+        weights = lower.copy()
+        remaining = 1.0 - weights.sum()
+        if remaining < -1e-9:
+            return None
+        for i in order:
+            step = min(upper[i] - lower[i], remaining)
+            weights[i] += step
+            remaining -= step
+            if remaining <= 0:
+                break
+        if remaining > 1e-9:
+            return None
+        return weights
+
+    def _linear_program(self, objective, lower, upper):
+        # min objective'w over the constraints; each ball adds variables u >= |w - center|
+        num_assets = len(objective)
+        num_balls = len(self.balls)
+        identity = sparse.identity(num_assets, format='csr')
+        cost = np.concatenate((objective, np.zeros(num_balls * num_assets)))
+        blocks, limits = [], []
+        finite_upper = np.isfinite(self.row_upper)
+        finite_lower = np.isfinite(self.row_lower)
+        if finite_upper.any():
+            blocks.append(sparse.hstack((sparse.csr_matrix(self.rows[finite_upper]), sparse.csr_matrix((finite_upper.sum(), num_balls * num_assets)))))
+            limits.append(self.row_upper[finite_upper])
+        if finite_lower.any():
+            blocks.append(sparse.hstack((sparse.csr_matrix(-self.rows[finite_lower]), sparse.csr_matrix((finite_lower.sum(), num_balls * num_assets)))))
+            limits.append(-self.row_lower[finite_lower])
+        for k, (center, radius) in enumerate(self.balls):
+            selector = [sparse.csr_matrix((num_assets, num_assets))] * num_balls
+            selector[k] = -identity
+            # w - u <= c,  -w - u <= -c,  sum u <= r
+            blocks.append(sparse.hstack([identity] + selector))
+            limits.append(center)
+            blocks.append(sparse.hstack([-identity] + selector))
+            limits.append(-center)
+            total = np.zeros((1, num_assets * (num_balls + 1)))
+            total[0, num_assets * (k + 1):num_assets * (k + 2)] = 1.0
+            blocks.append(sparse.csr_matrix(total))
+            limits.append([radius])
+        a_ub = sparse.vstack(blocks, format='csr') if blocks else None
+        b_ub = np.concatenate(limits) if limits else None
+        a_eq = sparse.hstack((sparse.csr_matrix(np.ones((1, num_assets))), sparse.csr_matrix((1, num_balls * num_assets))))
+        bounds = list(zip(lower, upper)) + [(0, None)] * (num_balls * num_assets)
+        result = linprog(cost, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=[1.0], bounds=bounds, method='highs')
+        if result.status != 0:
+            return None
+        return result.x[:num_assets]
+
+
+def compile_constraints(tickers, constraints=(), lower=-np.inf, upper=np.inf):
+    # Compile constraint specs for the given basket on top of uniform default bounds
+    tickers = list(tickers)
+    num_assets = len(tickers)
+    position = {ticker: i for i, ticker in enumerate(tickers)}
+    lower_bounds = np.full(num_assets, float(lower))
+    upper_bounds = np.full(num_assets, float(upper))
+    rows, row_lower, row_upper, balls = [], [], [], []
+    min_position = 0.0
+
+    for spec in constraints:
+        if isinstance(spec, PositionLimits):
+            lower_bounds = np.maximum(lower_bounds, _per_asset(spec.lower, tickers, -np.inf))
+            upper_bounds = np.minimum(upper_bounds, _per_asset(spec.upper, tickers, np.inf))
+        elif isinstance(spec, SectorLimits):
+            for sector in sorted(set(spec.sectors[ticker] for ticker in tickers if ticker in spec.sectors)):
+                row = np.array([1.0 if spec.sectors.get(ticker) == sector else 0.0 for ticker in tickers])
+                rows.append(row)
+                row_lower.append(_per_sector(spec.lower, sector, -np.inf))
+                row_upper.append(_per_sector(spec.upper, sector, np.inf))
+        elif isinstance(spec, LinearLimit):
+            row = np.zeros(num_assets)
+            for ticker, coefficient in spec.coefficients.items():
+                if ticker in position:
+                    row[position[ticker]] = coefficient
+            rows.append(row)
+            row_lower.append(spec.lower)
+            row_upper.append(spec.upper)
+        elif isinstance(spec, GrossLeverage):
+            balls.append((np.zeros(num_assets), spec.limit))
+        elif isinstance(spec, Turnover):
+            balls.append((_per_asset(spec.holdings, tickers, 0.0), spec.limit))
+        elif isinstance(spec, MinimumPosition):
+            min_position = max(min_position, spec.size)
+        else:
+            raise TypeError(f"Unknown constraint spec {type(spec).__name__}")
+
+    if np.any(lower_bounds > upper_bounds):
+        raise ValueError("Position limits leave no feasible weight for some assets")
+    if rows:
+        return CompiledConstraints(tickers, lower_bounds, upper_bounds, np.vstack(rows), row_lower, row_upper, balls, min_position)
+    return CompiledConstraints(tickers, lower_bounds, upper_bounds, balls=balls, min_position=min_position)
@@ -0,0 +1,178 @@
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+
+
+# Covariance estimators for PortfolioOptimizer. Each estimator returns an
+# operator with the same small interface (matvec, solve, diagonal, ...), so
+# the optimizers never need the dense N x N matrix of a factor model.
+
+ESTIMATORS = ('sample', 'ledoit_wolf', 'factor')
+
+
+class DenseCovariance:
+    def __init__(self, matrix):
+        self.matrix = np.ascontiguousarray(matrix, dtype=float)
+        self.num_assets = self.matrix.shape[0]
+        self._cholesky = None
+
+    def matvec(self, weights):
+        return self.matrix @ weights
+
+    def diagonal(self):
+        return np.diag(self.matrix).copy()
+
+    def restrict(self, index):
+        return DenseCovariance(self.matrix[np.ix_(index, index)])
+
+    def to_dense(self):
+        return self.matrix
+
+    def scaled(self, factor):
+        return DenseCovariance(self.matrix * factor)
+
+    def components(self):
+        return (self.matrix,)
+
+    @property
+    def cholesky(self):
+        # Lower triangular factor, None when the matrix is not positive definite
+        if self._cholesky is None:
+            try:
+                self._cholesky = np.linalg.cholesky(self.matrix)
+            except np.linalg.LinAlgError:
+                self._cholesky = False
+        return self._cholesky if self._cholesky is not False else None
+
+    def solve(self, rhs):
+        if self.cholesky is None:
+            raise np.linalg.LinAlgError('Covariance matrix is not positive definite')
+        return cho_solve((self.cholesky, True), rhs)
+
+    def solver(self, shift, extra):
+        # Factor (Σ + shift I + extra'extra) once and return its solve function
+        system = extra.T @ extra
+        system += self.matrix
+        system[np.diag_indices(self.num_assets)] += shift
+        factor = cho_factor(system, overwrite_a=True)
+        # Called once per ADMM iteration on finite data, skip the finiteness scan
+        return lambda rhs: cho_solve(factor, rhs, check_finite=False)
+
+
+class FactorCovariance:
+    # Σ = B B' + diag(specific) with N x k loadings B, stored in O(N k) memory
+
+    def __init__(self, loadings, specific):
+        self.loadings = np.ascontiguousarray(loadings, dtype=float)
+        self.specific = np.ascontiguousarray(specific, dtype=float)
+        self.num_assets = len(self.specific)
+        self._solver = None
+
+    def matvec(self, weights):
+        return self.loadings @ (self.loadings.T @ weights) + self.specific * weights
+
+    def diagonal(self):
+        return np.einsum('ij,ij->i', self.loadings, self.loadings) + self.specific
+
+    def restrict(self, index):
+        return FactorCovariance(self.loadings[index], self.specific[index])
+
+    def to_dense(self):
+        return self.loadings @ self.loadings.T + np.diag(self.specific)
+
+    def scaled(self, factor):
+        return FactorCovariance(self.loadings * np.sqrt(factor), self.specific * factor)
+
+    def components(self):
+        return (self.loadings, self.specific)
+
+    def solve(self, rhs):
+        if self._solver is None:
+            self._solver = _woodbury_solver(self.specific, self.loadings)
+        return self._solver(rhs)
+
+    def solver(self, shift, extra):
+        return _woodbury_solver(self.specific + shift, np.hstack((self.loadings, extra.T)))
+
+
+def _woodbury_solver(diagonal, low_rank):
+    # (D + U U')⁻¹ r = D⁻¹ r - D⁻¹ U (I + U' D⁻¹ U)⁻¹ U' D⁻¹ r, in O(N k) per solve
+    inv_diagonal = 1.0 / diagonal
+    scaled = low_rank * inv_diagonal[:, None]
+    capacitance = cho_factor(np.eye(low_rank.shape[1]) + low_rank.T @ scaled)
+
+    def solve(rhs):
+        base = inv_diagonal * rhs if rhs.ndim == 1 else inv_diagonal[:, None] * rhs
+        return base - scaled @ cho_solve(capacitance, low_rank.T @ base)
+    return solve
+
+
+def sample_covariance(values):
+    num_assets = values.shape[1]
+    return DenseCovariance(np.cov(values, rowvar=False).reshape(num_assets, num_assets))
+
+
+def ledoit_wolf_covariance(values):
+    # Ledoit & Wolf (2004) shrinkage of the sample covariance towards a scaled identity
+    num_observations = values.shape[0]
+    centred = values - values.mean(axis=0)
+    return shrunk_covariance(centred.T @ centred, np.sum(np.einsum('ij,ij->i', centred, centred) ** 2), num_observations)
+
+
+def shrunk_covariance(comoment, fourth_moment, num_observations):
+    # Ledoit-Wolf estimate from the centred co-moment Σ x x' and Σ |x|⁴ of the returns,
+    # so it can be accumulated over blocks of rows (see returns_panel.py)
+    num_assets = len(comoment)
+    sample = comoment / num_observations
+    mu = np.trace(sample) / num_assets
+    delta = np.sum((sample - mu * np.eye(num_assets)) ** 2) / num_assets
+    beta = (fourth_moment / num_observations - np.sum(sample ** 2)) / (num_observations * num_assets)
+    beta = min(beta, delta)
+    shrinkage = 0.0 if delta == 0 else beta / delta
+    shrunk = (1 - shrinkage) * sample
+    shrunk[np.diag_indices(num_assets)] += shrinkage * mu
+    covariance = DenseCovariance(shrunk)
+    covariance.shrinkage = shrinkage
+    return covariance
+
+
+def factor_model_covariance(values, num_factors=None):
+    # Statistical factor model: the top principal components of the returns plus a
+    # diagonal of specific variances, estimated without forming the sample matrix
+    num_observations, num_assets = values.shape
+    if num_factors is None:
+        num_factors = min(5, num_assets - 1, num_observations - 1)
+    centred = values - values.mean(axis=0)
+    _, singular_values, components = np.linalg.svd(centred, full_matrices=False)
+    num_factors = max(0, min(num_factors, len(singular_values)))
+    loadings = components[:num_factors].T * (singular_values[:num_factors] / np.sqrt(num_observations - 1))
+    total = np.einsum('ij,ij->j', centred, centred) / (num_observations - 1)
+    specific = total - np.einsum('ij,ij->i', loadings, loadings)
+    # Keep the specific variances strictly positive so Σ stays invertible
+    floor = 1e-6 * max(np.mean(total), np.finfo(float).tiny)
+    return FactorCovariance(loadings, np.maximum(specific, floor))
+
+
+def factor_model_from_covariance(sample, num_observations, num_factors=None):
+    # The same statistical factor model from a sample covariance: its top eigenvectors
+    # scaled by the square roots of their eigenvalues are the principal component loadings
+    num_assets = len(sample)
+    if num_factors is None:
+        num_factors = min(5, num_assets - 1, num_observations - 1)
+    num_factors = max(0, min(num_factors, num_assets))
+    eigenvalues, eigenvectors = np.linalg.eigh(sample)
+    top = np.argsort(eigenvalues)[::-1][:num_factors]
+    loadings = eigenvectors[:, top] * np.sqrt(np.maximum(eigenvalues[top], 0))
+    total = np.diag(sample).copy()
+    specific = total - np.einsum('ij,ij->i', loadings, loadings)
+    floor = 1e-6 * max(np.mean(total), np.finfo(float).tiny)
+    return FactorCovariance(loadings, np.maximum(specific, floor))
+
+
+def estimate_covariance(values, estimator='sample', num_factors=None):
+    if estimator == 'sample':
+        return sample_covariance(values)
+    if estimator == 'ledoit_wolf':
+        return ledoit_wolf_covariance(values)
+    if estimator == 'factor':
+        return factor_model_covariance(values, num_factors)
+    raise ValueError(f"Unknown covariance estimator {estimator!r}, expected one of {ESTIMATORS}")
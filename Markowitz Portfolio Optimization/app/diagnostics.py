@@ -0,0 +1,117 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# Timing spans and solver counters collected while an optimizer (or a whole
+# page run) works, so a slow or failing request can be traced to data download,
+# covariance estimation, the solver or figure building without a profiler.
+# Spans are inclusive wall times keyed by stage name; nested stages are timed
+# separately. Every solve adds its iteration and evaluation counts, its
+# convergence status and its constraint residuals.
+
+COUNTER_KEYS = ('solves', 'iterations', 'function_evaluations', 'gradient_evaluations', 'failures', 'closed_form_points',
+                'cache_hits', 'cache_misses')
+RESIDUAL_KEYS = ('budget', 'target', 'risk', 'constraints')
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # name -> [count, total seconds, max seconds]
+            self.spans = {}
+            self.counters = dict.fromkeys(COUNTER_KEYS, 0)
+            # Largest residual seen per kind
+            self.residuals = dict.fromkeys(RESIDUAL_KEYS, 0.0)
+            # Solver message -> count
+            self.statuses = {}
+            self.last_solve = None
+            self.errors = []
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            span = self.spans.setdefault(name, [0, 0.0, 0.0])
+            span[0] += 1
+            span[1] += seconds
+            span[2] = max(span[2], seconds)
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add_counts(self, stats):
+        # Counters gathered elsewhere, e.g. the sweep_stats of frontier workers
+        with self._lock:
+            for key, value in stats.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def merge(self, other):
+        # Fold in what another Metrics collected, e.g. a background job picked up by a page
+        report = other.as_dict()
+        with self._lock:
+            for name, span in report['spans'].items():
+                mine = self.spans.setdefault(name, [0, 0.0, 0.0])
+                mine[0] += span['count']
+                mine[1] += span['seconds']
+                mine[2] = max(mine[2], span['max_seconds'])
+            for key, value in report['counters'].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, value in report['residuals'].items():
+                self.residuals[key] = max(self.residuals.get(key, 0.0), value)
+            for message, count in report['statuses'].items():
+                self.statuses[message] = self.statuses.get(message, 0) + count
+            if report['last_solve'] is not None:
+                self.last_solve = report['last_solve']
+            self.errors.extend(report['errors'])
+
+    def record_solve(self, kind, result, **residuals):
+        # One solver run: its counts, convergence flag and residuals (budget, target, risk, constraints)
+        with self._lock:
+            self.counters['solves'] += 1
+            self.counters['iterations'] += int(getattr(result, 'nit', 0) or 0)
+            self.counters['function_evaluations'] += int(getattr(result, 'nfev', 0) or 0)
+            self.counters['gradient_evaluations'] += int(getattr(result, 'njev', 0) or 0)
+            self.counters['failures'] += int(not result.success)
+            message = str(getattr(result, 'message', ''))
+            self.statuses[message] = self.statuses.get(message, 0) + 1
+            for key, value in residuals.items():
+                self.residuals[key] = max(self.residuals.get(key, 0.0), abs(float(value)))
+            self.last_solve = {'kind': kind, 'success': bool(result.success), 'status': getattr(result, 'status', None),
+                               'message': message, 'iterations': int(getattr(result, 'nit', 0) or 0)}
+            self.last_solve.update({key: float(value) for key, value in residuals.items()})
+
+    def record_error(self, error):
+        with self._lock:
+            self.errors.append(f'{type(error).__name__}: {error}')
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'spans': {name: {'count': count, 'seconds': total, 'max_seconds': longest} for name, (count, total, longest) in self.spans.items()},
+                'counters': dict(self.counters),
+                'residuals': dict(self.residuals),
+                'statuses': dict(self.statuses),
+                'last_solve': None if self.last_solve is None else dict(self.last_solve),
+                'errors': list(self.errors),
+            }
+
+    def span_frame(self):
+        # Spans as a table, slowest stage first
+        spans = self.as_dict()['spans']
+        frame = pd.DataFrame.from_dict(spans, orient='index', columns=['count', 'seconds', 'max_seconds'])
+        frame.index.name = 'stage'
+        return frame.sort_values('seconds', ascending=False)
@@ -0,0 +1,95 @@
+import numpy as np
+import plotly.graph_objs as go
+
+
+# Figure builder for the efficient frontier plots. In compact mode the frontier
+# is a single WebGL trace (line and markers together), dense stretches of the
+# curve are thinned out, and each point carries its weights as a customdata row
+# that one shared hovertemplate formats, instead of a preformatted NumPy repr
+# per point. For large baskets only the largest holdings of each point are kept
+# in the hover data.
+
+# Largest basket whose full weights are shown on hover
+HOVER_HOLDINGS = 12
+
+
+def decimate(risks, return_, min_spacing=0.01):
+    # Indices of the points worth drawing: a point is dropped while it lies within
+    # min_spacing (as a fraction of the plotted range) of the last kept one; both
+    # ends of the curve are always kept
+    x = np.asarray(risks, dtype=float)
+    y = np.asarray(return_, dtype=float)
+    if len(x) <= 2:
+        return np.arange(len(x))
+    x = (x - x.min()) / max(np.ptp(x), 1e-300)
+    y = (y - y.min()) / max(np.ptp(y), 1e-300)
+    keep = [0]
+    for i in range(1, len(x) - 1):
+        if np.hypot(x[i] - x[keep[-1]], y[i] - y[keep[-1]]) >= min_spacing:
+            keep.append(i)
+    keep.append(len(x) - 1)
+    return np.array(keep)
+
+
+def _hover(weights, tickers, holdings):
+    # customdata rows and the hovertemplate that formats them
+    lines = ['Risk: %{x:.4f}', 'Return: %{y:.4f}']
+    num_assets = weights.shape[1]
+    if num_assets <= holdings:
+        customdata = weights.astype(np.float32)
+        lines += [f'{ticker}: %{{customdata[{j}]:.2%}}' for j, ticker in enumerate(tickers)]
+    else:
+        # Largest holdings by absolute weight, as (ticker, weight) pairs
+        order = np.argsort(-np.abs(weights), axis=1)[:, :holdings]
+        names = np.asarray(tickers, dtype=object)[order]
+        top = np.round(np.take_along_axis(weights, order, axis=1), 4)
+        customdata = [[item for pair in zip(row_names, row_weights.tolist()) for item in pair] for row_names, row_weights in zip(names, top)]
+        lines += [f'%{{customdata[{2 * j}]}}: %{{customdata[{2 * j + 1}]:.2%}}' for j in range(holdings)]
+        lines.append(f'(largest {holdings} of {num_assets} holdings)')
+    return customdata, '<br>'.join(lines) + '<extra></extra>'
+
+
+def frontier_figure(weights, risks, return_, tickers, highlights=(), compact=True, min_spacing=0.01, hover_holdings=HOVER_HOLDINGS, title='Efficient Frontier'):
+    # highlights are (risk, return, name, color) stars drawn over the frontier
+    if compact:
+        keep = decimate(risks, return_, min_spacing)
+        customdata, template = _hover(np.asarray(weights, dtype=float)[keep], tickers, hover_holdings)
+        data = [go.Scattergl(
+            x=np.asarray(risks, dtype=float)[keep],
+            y=np.asarray(return_, dtype=float)[keep],
+            mode='lines+markers',
+            name='Efficient Frontier',
+            customdata=customdata,
+            hovertemplate=template
+        )]
+        marker_trace = go.Scattergl
+    else:
+        # Original layout: a line trace plus a marker trace with a text label per point
+        hover_text = []
+        for i in range(len(risks)):
+            hover_text.append(
+                f'Risks: {risks[i]:.4f}<br>Weights: {weights[i]}<br>Return: {return_[i]:.4f}')
+        data = [go.Scatter(x=risks, y=return_, mode='lines', name='Efficient Frontier'),
+                go.Scatter(x=risks, y=return_, mode='markers', name='Efficient Frontier Points', text=hover_text, hoverinfo='text')]
+        marker_trace = go.Scatter
+
+    for risk, point_return, name, color in highlights:
+        data.append(marker_trace(
+            x=[risk],
+            y=[point_return],
+            mode='markers',
+            marker=dict(symbol='star', color=color, size=15),
+            name=name
+        ))
+
+    layout = go.Layout(
+        title=title,
+        xaxis=dict(title='Volatility'),
+        yaxis=dict(title='Return')
+    )
+    return go.Figure(data=data, layout=layout)
+
+
+def payload_size(fig):
+    # Bytes of Plotly JSON that st.plotly_chart sends to the browser for this figure
+    return len(fig.to_json().encode())
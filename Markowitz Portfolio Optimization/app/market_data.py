@@ -0,0 +1,217 @@
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+
+# Concurrent price fetcher for the price store. Tickers are split into chunks
+# that a bounded, long-lived thread pool fetches in parallel; every worker
+# thread keeps one keep-alive connection per host, so a refresh reuses a
+# handful of connections instead of opening one per request. Each ticker is
+# retried on its own (connection errors, timeouts, 429 and 5xx, with capped
+# exponential backoff and jitter, honouring Retry-After), so one bad ticker
+# only costs its own request. Whatever could not be fetched is reported next
+# to the prices instead of failing the whole download.
+#
+# Prices are the adjusted closes of Yahoo's chart endpoint (the same series
+# yf.download(..., auto_adjust=False)['Adj Close'] returns); base_url points it
+# at any server speaking that JSON, such as the local stub of tests/chart_stub.py.
+
+YAHOO_CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/'
+HEADERS = {'User-Agent': 'Mozilla/5.0 (portfolio-optimizer)', 'Accept': 'application/json', 'Connection': 'keep-alive'}
+
+
+class FetchError(Exception):
+    def __init__(self, message, retryable, status=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.retry_after = None
+
+
+class FetchReport:
+    # Outcome of one fetch: the prices plus what failed and how many requests each ticker took
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        self.prices = None
+        # ticker -> error message
+        self.failed = {}
+        # Failed tickers worth asking for again later (timeouts, throttling, server errors)
+        self.retryable = set()
+        self.attempts = {}
+        self.seconds = 0.0
+
+    @property
+    def succeeded(self):
+        return [ticker for ticker in self.tickers if ticker not in self.failed]
+
+    def summary(self):
+        return f'{len(self.succeeded)}/{len(self.tickers)} tickers in {self.seconds:.2f}s, {sum(self.attempts.values())} requests'
+
+
+class ConnectionPool:
+    # Keep-alive HTTP(S) connections, one per thread and host
+    def __init__(self, timeout=10.0):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = []
+
+    def get(self, url, headers=HEADERS):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        connections = self._local.__dict__.setdefault('connections', {})
+        connection = connections.get(key)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+            connection = connection_class(parts.netloc, timeout=self.timeout)
+            connections[key] = connection
+            with self._lock:
+                self._all.append(connection)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            # Drop the broken connection; the next request opens a fresh one
+            connection.close()
+            connections.pop(key, None)
+            raise
+        if (response.getheader('Connection') or '').lower() == 'close':
+            connection.close()
+            connections.pop(key, None)
+        return response.status, response.headers, body
+
+    def close(self):
+        with self._lock:
+            for connection in self._all:
+                connection.close()
+            self._all = []
+
+
+def parse_chart(body):
+    # Adjusted closes of one chart response, indexed by exchange-local trading day
+    payload = json.loads(body)
+    chart = payload.get('chart') or {}
+    if chart.get('error'):
+        error = chart['error']
+        raise FetchError(f"{error.get('code')}: {error.get('description')}", retryable=False)
+    result = (chart.get('result') or [None])[0]
+    if not result or not result.get('timestamp'):
+        return pd.Series(dtype=float)
+    offset = (result.get('meta') or {}).get('gmtoffset') or 0
+    indicators = result.get('indicators') or {}
+    adjusted = indicators.get('adjclose') or [{}]
+    closes = adjusted[0].get('adjclose')
+    if closes is None:
+        closes = (indicators.get('quote') or [{}])[0].get('close')
+    if closes is None:
+        raise FetchError('No close prices in response', retryable=False)
+    days = pd.to_datetime(np.asarray(result['timestamp'], dtype=np.int64) + offset, unit='s').normalize()
+    prices = pd.Series(np.array([np.nan if close is None else close for close in closes], dtype=float), index=days)
+    # Keep the last bar of each day (intraday updates of today's bar)
+    return prices[~prices.index.duplicated(keep='last')]
+
+
+class ChunkedFetcher:
+    def __init__(self, base_url=YAHOO_CHART_URL, chunk_size=25, max_workers=8, retries=3, backoff=0.5, max_backoff=8.0,
+                 timeout=10.0, sleep=time.sleep):
+        self.base_url = base_url
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.connections = ConnectionPool(timeout)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.last_report = None
+
+    def _executor(self):
+        # Long-lived workers, so their keep-alive connections survive between fetches
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='price-fetch')
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+        self.connections.close()
+
+    def url(self, ticker, start, end):
+        query = urlencode({'period1': int(pd.Timestamp(start).timestamp()), 'period2': int(pd.Timestamp(end).timestamp()),
+                           'interval': '1d', 'events': 'div,split', 'includeAdjustedClose': 'true'})
+        # One path segment whatever the ticker holds, e.g. BRK/B from the ticker directory
+        return f'{self.base_url}{quote(ticker, safe="")}?{query}'
+
+    def fetch_ticker(self, ticker, start, end):
+        # (prices, attempts); raises FetchError once the retries are used up
+        url = self.url(ticker, start, end)
+        for attempt in range(self.retries + 1):
+            try:
+                status, headers, body = self.connections.get(url)
+                if status == 200:
+                    return parse_chart(body), attempt + 1
+                failure = FetchError(f'HTTP {status}', retryable=status == 429 or status >= 500, status=status)
+                retry_after = headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    failure.retry_after = float(retry_after)
+            except FetchError as error:
+                failure = error
+            except (OSError, http.client.HTTPException, ValueError) as error:
+                # Connection errors and timeouts are worth another try; ValueError is a garbled body
+                failure = FetchError(f'{type(error).__name__}: {error}', retryable=not isinstance(error, ValueError))
+            if not failure.retryable or attempt == self.retries:
+                failure.attempts = attempt + 1
+                raise failure
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if failure.retry_after is not None:
+                delay = min(self.max_backoff, max(delay, failure.retry_after))
+            self.sleep(delay)
+
+    def _fetch_chunk(self, chunk, start, end):
+        outcomes = []
+        for ticker in chunk:
+            try:
+                prices, attempts = self.fetch_ticker(ticker, start, end)
+                outcomes.append((ticker, prices, None, attempts))
+            except FetchError as error:
+                outcomes.append((ticker, None, error, getattr(error, 'attempts', 1)))
+        return outcomes
+
+    def fetch_report(self, tickers, start, end):
+        tickers = list(dict.fromkeys(tickers))
+        report = FetchReport(tickers)
+        began = time.perf_counter()
+        chunks = [tickers[i:i + self.chunk_size] for i in range(0, len(tickers), self.chunk_size)]
+        columns = {}
+        for outcomes in self._executor().map(lambda chunk: self._fetch_chunk(chunk, start, end), chunks):
+            for ticker, prices, error, attempts in outcomes:
+                report.attempts[ticker] = attempts
+                if error is None:
+                    columns[ticker] = prices
+                else:
+                    report.failed[ticker] = str(error)
+                    if error.retryable:
+                        report.retryable.add(ticker)
+        prices = pd.DataFrame(columns, columns=[ticker for ticker in tickers if ticker in columns]).sort_index()
+        prices.index.name = 'Date'
+        report.prices = prices
+        report.seconds = time.perf_counter() - began
+        self.last_report = report
+        return report
+
+    def fetch(self, tickers, start, end):
+        # Same interface as the other price sources; failed tickers are left out of the frame
+        return self.fetch_report(tickers, start, end).prices
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from covariance import ESTIMATORS, DenseCovariance, estimate_covariance, factor_model_from_covariance, shrunk_covariance
+
+
+# Mean vector, covariance and Cholesky factor of a returns panel, computed once
+# as contiguous NumPy arrays and shared by every optimizer method.
+
+class MomentStatistics:
+    def __init__(self, returns, estimator='sample', num_factors=None):
+        self.tickers = list(returns.columns)
+        values = np.ascontiguousarray(returns.to_numpy(dtype=float))
+        self.num_observations, self.num_assets = values.shape
+        self.estimator = estimator
+        self.num_factors = num_factors
+        self.mean = values.mean(axis=0)
+        # Sample (ddof=1, same as DataFrame.cov()), shrunk or factor model covariance operator
+        covariance = estimate_covariance(values, estimator, num_factors)
+        # Sum of centred outer products, kept for the incremental updates below
+        self.comoment = covariance.matrix * (self.num_observations - 1) if estimator == 'sample' else None
+        self._set_covariance(covariance)
+
+    @classmethod
+    def from_prices(cls, prices, estimator='sample', num_factors=None):
+        returns = prices.pct_change().dropna()
+        return cls(returns, estimator, num_factors), returns
+
+    @classmethod
+    def from_arrays(cls, mean, cov, tickers=None, num_observations=None):
+        # Wrap precomputed moments (e.g. views onto shared memory) without copying them;
+        # cov is either a dense matrix or a covariance operator
+        statistics = cls.__new__(cls)
+        statistics.mean = mean
+        statistics.num_assets = len(mean)
+        statistics.num_observations = num_observations
+        statistics.tickers = list(tickers) if tickers is not None else list(range(len(mean)))
+        statistics.estimator = 'sample' if isinstance(cov, np.ndarray) else None
+        statistics.num_factors = None
+        covariance = DenseCovariance(cov) if isinstance(cov, np.ndarray) else cov
+        statistics.comoment = covariance.matrix * (num_observations - 1) if num_observations and statistics.estimator else None
+        statistics._set_covariance(covariance)
+        return statistics
+
+    @classmethod
+    def from_panel(cls, panel, estimator='sample', num_factors=None):
+        # Moments of a ReturnsPanel, accumulated in float64 over blocks of its rows. The
+        # covariance is the only N x N array kept; these statistics are not incremental.
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"Unknown covariance estimator {estimator!r}, expected one of {ESTIMATORS}")
+        mean, comoment, fourth_moment = panel.moments(fourth=estimator == 'ledoit_wolf')
+        num_observations = panel.num_days
+        if estimator == 'sample':
+            comoment /= num_observations - 1
+            covariance = DenseCovariance(comoment)
+        elif estimator == 'ledoit_wolf':
+            covariance = shrunk_covariance(comoment, fourth_moment, num_observations)
+        else:
+            comoment /= num_observations - 1
+            covariance = factor_model_from_covariance(comoment, num_observations, num_factors)
+        statistics = cls.__new__(cls)
+        statistics.tickers = list(panel.tickers)
+        statistics.num_observations, statistics.num_assets = num_observations, panel.num_assets
+        statistics.estimator = estimator
+        statistics.num_factors = num_factors
+        statistics.mean = mean
+        statistics.comoment = None
+        statistics._set_covariance(covariance)
+        return statistics
+
+    def subset(self, tickers):
+        # Moments of a sub-basket, sliced from these statistics without re-estimating
+        if getattr(self, '_positions', None) is None:
+            self._positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        index = np.array([self._positions[ticker] for ticker in tickers], dtype=int)
+        return MomentStatistics.from_arrays(self.mean[index], self.covariance.restrict(index), tickers, self.num_observations)
+
+    def refit(self, returns):
+        # Re-estimate from a returns panel with the same estimator settings
+        return MomentStatistics(returns, self.estimator, self.num_factors)
+
+    @property
+    def incremental(self):
+        # Only the sample covariance can be updated one row at a time
+        return self.comoment is not None
+
+    def add(self, values):
+        # Welford update: fold new return rows into the mean and co-moment, O(N²) per row
+        for row in np.atleast_2d(np.asarray(values, dtype=float)):
+            self.num_observations += 1
+            delta = row - self.mean
+            self.mean = self.mean + delta / self.num_observations
+            self.comoment += np.outer(delta, row - self.mean)
+        self._refresh()
+
+    def remove(self, values):
+        # Inverse Welford update: drop the oldest return rows from a rolling window
+        for row in np.atleast_2d(np.asarray(values, dtype=float)):
+            self.num_observations -= 1
+            previous_mean = self.mean
+            self.mean = previous_mean - (row - previous_mean) / self.num_observations
+            self.comoment -= np.outer(row - self.mean, row - previous_mean)
+        self._refresh()
+
+    def _refresh(self):
+        cov = self.comoment / (self.num_observations - 1)
+        # Keep the covariance exactly symmetric despite rounding in the rank-one updates
+        self._set_covariance(DenseCovariance((cov + cov.T) / 2))
+
+    def _set_covariance(self, covariance):
+        self.covariance = covariance
+        self.std = np.sqrt(covariance.diagonal())
+        self._cov = None
+
+    @property
+    def cov(self):
+        # Dense covariance matrix, only materialized on request for factor models
+        if self._cov is None:
+            self._cov = self.covariance.to_dense()
+        return self._cov
+
+    @property
+    def cholesky(self):
+        # Lower triangular factor of a dense covariance, None when it is not positive definite
+        return getattr(self.covariance, 'cholesky', None)
+
+    def mean_series(self):
+        return pd.Series(self.mean, index=self.tickers)
+
+    def std_series(self):
+        return pd.Series(self.std, index=self.tickers)
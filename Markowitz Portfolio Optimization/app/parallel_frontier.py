@@ -0,0 +1,112 @@
+import math
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from moments import MomentStatistics
+
+
+# Frontier targets are independent, so they are split into contiguous chunks
+# (each chunk is still swept with warm starts) and spread over a pool.
+# Process workers attach to the mean and covariance arrays through shared memory
+# once, when the worker starts, instead of receiving a pickled copy per task.
+
+_local = threading.local()
+
+STAT_KEYS = ('solves', 'iterations', 'function_evaluations', 'gradient_evaluations', 'failures')
+
+
+def _optimizer_options(optimizer):
+    # Solver settings that the worker copies of the optimizer should share
+    return {name: getattr(optimizer, name) for name in ('frontier_mode', 'solver', 'constraints', 'cov_estimator', 'num_factors') if hasattr(optimizer, name)}
+
+
+def _share(array):
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+    view[...] = array
+    return segment, (segment.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    # Workers share the parent's resource tracker, and the parent unlinks the segment
+    segment = shared_memory.SharedMemory(name=name)
+    return segment, np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+
+
+def _init_process_worker(optimizer_class, options, mean_spec, covariance_class, component_specs, tickers):
+    mean_segment, mean = _attach(mean_spec)
+    attached = [_attach(spec) for spec in component_specs]
+    # Keep the segments open for as long as the worker lives
+    _local.segments = [mean_segment] + [segment for segment, _ in attached]
+    covariance = covariance_class(*[array for _, array in attached])
+    statistics = MomentStatistics.from_arrays(mean, covariance, tickers)
+    _local.optimizer = optimizer_class.from_statistics(statistics, **options)
+
+
+def _init_thread_worker(optimizer_class, options, statistics):
+    # Threads share the parent's arrays directly; each gets its own solver state
+    _local.optimizer = optimizer_class.from_statistics(statistics, **options)
+
+
+def _solve_chunk(task):
+    start, targets = task
+    optimizer = _local.optimizer
+    weights, risks, return_ = optimizer.frontier_sweep(targets)
+    return start, weights, risks, return_, optimizer.sweep_stats
+
+
+def parallel_frontier(optimizer, targets, workers=None, executor='process', chunks_per_worker=2):
+    targets = np.atleast_1d(np.asarray(targets, dtype=float))
+    if executor not in ('process', 'thread'):
+        raise ValueError("executor must be 'process' or 'thread'")
+    if len(targets) == 0:
+        return [], [], []
+
+    statistics = optimizer.statistics
+    optimizer_class = type(optimizer)
+    options = _optimizer_options(optimizer)
+    workers = workers or 1
+    chunk_size = max(1, math.ceil(len(targets) / (workers * chunks_per_worker)))
+    tasks = [(start, targets[start:start + chunk_size]) for start in range(0, len(targets), chunk_size)]
+
+    segments = []
+    try:
+        if executor == 'process':
+            mean_segment, mean_spec = _share(np.ascontiguousarray(statistics.mean))
+            segments.append(mean_segment)
+            # Share the covariance operator's own arrays (the N x k loadings of a factor model)
+            component_specs = []
+            for component in statistics.covariance.components():
+                segment, spec = _share(np.ascontiguousarray(component))
+                segments.append(segment)
+                component_specs.append(spec)
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker,
+                                       initargs=(optimizer_class, options, mean_spec, type(statistics.covariance),
+                                                 component_specs, statistics.tickers))
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers, initializer=_init_thread_worker,
+                                      initargs=(optimizer_class, options, statistics))
+        with pool:
+            chunks = list(pool.map(_solve_chunk, tasks))
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    # Reassemble in target order and add up the solver counters of every chunk
+    weights = [None] * len(targets)
+    risks = [None] * len(targets)
+    return_ = [None] * len(targets)
+    stats = dict.fromkeys(STAT_KEYS, 0)
+    for start, chunk_weights, chunk_risks, chunk_returns, chunk_stats in chunks:
+        weights[start:start + len(chunk_weights)] = chunk_weights
+        risks[start:start + len(chunk_risks)] = chunk_risks
+        return_[start:start + len(chunk_returns)] = chunk_returns
+        for key in STAT_KEYS:
+            stats[key] += chunk_stats[key]
+    optimizer.sweep_stats = stats
+    return weights, risks, return_
@@ -0,0 +1,546 @@
+import numpy as np
+import pandas as pd
+from scipy.optimize import brentq, minimize
+from constraints import compile_constraints
+from diagnostics import Metrics
+from frontier_figure import frontier_figure
+from moments import MomentStatistics
+from parallel_frontier import parallel_frontier
+from qp_solver import ConstrainedQP
+from resampled_frontier import resampled_frontier
+from result_cache import basket_fingerprint, cached_call, make_key
+
+
+# Mean-variance optimizer over a compiled set of constraints. The short-selling
+# and long-only optimizers are this class with (-1, 1) and (0, 1) default
+# bounds; further constraint specs (position caps, sector limits, gross
+# leverage, turnover, minimum positions, see constraints.py) are compiled once
+# per basket and shared, together with the QP factorization, by every solve of
+# a frontier.
+
+class PortfolioOptimizer:
+    # Default bounds on every weight, narrowed by PositionLimits specs
+    lower_bound = -1.0
+    upper_bound = 1.0
+    short_selling = True
+    # Weights below this magnitude count as no position, see MinimumPosition
+    zero_weight = 1e-8
+
+    def __init__(self , prices , solver='qp', constraints=(), frontier_workers=None, frontier_executor='process', cov_estimator='sample', num_factors=None, result_cache=None, metrics=None):
+        # Timing spans and solver counters, see diagnostics.py (pass one Metrics to collect a whole page run)
+        self.metrics = Metrics() if metrics is None else metrics
+        # 'sample', 'ledoit_wolf' or 'factor' (statistical factor model with num_factors factors)
+        self.cov_estimator = cov_estimator
+        self.num_factors = num_factors
+        # Constraint specs on top of the default bounds
+        self.constraints = list(constraints)
+        self.prices = prices
+        self.optimal_return = None
+        self.last_weights = None
+        # 'qp' uses the constrained QP solver, 'slsqp' the general purpose scipy solver
+        self.solver = solver
+        # Frontier points are spread over this many pool workers when set
+        self.frontier_workers = frontier_workers
+        self.frontier_executor = frontier_executor
+        # Solver diagnostics from the most recent solve and frontier sweep
+        self.last_result = None
+        self.sweep_stats = None
+        # Number of most recent returns kept by append/roll (None keeps the whole history)
+        self.window = None
+        # Optional ResultCache consulted before every minimum variance solve and frontier
+        self.result_cache = result_cache
+
+    @property
+    def prices(self):
+        return self._prices
+
+    @prices.setter
+    def prices(self, prices):
+        # New prices rebuild the returns and replace every cached statistic
+        self._prices = prices
+        if prices is None:
+            # Built from precomputed moments, see from_statistics
+            self.statistics, self.returns, self.risks = None, None, None
+        else:
+            with self.metrics.span('moments'):
+                self.statistics, self.returns = MomentStatistics.from_prices(prices, self.cov_estimator, self.num_factors)
+            self.risks = self.statistics.std_series()
+        # Starting point for the next minimum variance solve, see append
+        self.warm_weights = None
+        self._fingerprint = None
+        # Frontier grids and risk-targeted points, see frontier_grid
+        self._frontier_memo = {}
+        self._compiled = None
+        self._qp = None
+
+    def append(self, prices_new):
+        # Extend the history with new price bars, updating the moments one return row at a time
+        self._check_updatable('append')
+        prices_new = prices_new[self._prices.columns]
+        new_returns = pd.concat([self._prices.iloc[-1:], prices_new]).pct_change().iloc[1:].dropna()
+        self._prices = pd.concat([self._prices, prices_new])
+        self.returns = pd.concat([self.returns, new_returns])
+        if self.statistics.incremental:
+            self.statistics.add(new_returns.to_numpy(dtype=float))
+        self._trim_window()
+        self._moments_updated()
+
+    def roll(self, window):
+        # Keep only the most recent `window` returns from now on
+        self._check_updatable('roll')
+        self.window = window
+        self._trim_window()
+        self._moments_updated()
+
+    def _check_updatable(self, operation):
+        # Updates need the price history; optimizers from a ReturnsPanel or precomputed moments are read-only
+        if self._prices is None:
+            source = 'a ReturnsPanel' if self.returns is not None else 'precomputed moments'
+            raise RuntimeError(f"Optimizers built from {source} are read-only and can't {operation}; "
+                               f"build a new one from the updated data instead")
+
+    def _trim_window(self):
+        if self.window is None or len(self.returns) <= self.window:
+            return
+        excess = len(self.returns) - self.window
+        if self.statistics.incremental:
+            self.statistics.remove(self.returns.iloc[:excess].to_numpy(dtype=float))
+        self.returns = self.returns.iloc[excess:]
+        # Keep the price bar preceding the first return of the window
+        first = self._prices.index.get_loc(self.returns.index[0])
+        self._prices = self._prices.iloc[max(first - 1, 0):]
+
+    def _moments_updated(self):
+        if not self.statistics.incremental:
+            # Shrinkage and factor models are re-estimated over the current window
+            with self.metrics.span('moments'):
+                self.statistics = self.statistics.refit(self.returns)
+        self.risks = self.statistics.std_series()
+        self._fingerprint = None
+        self._frontier_memo = {}
+        if self._qp is not None:
+            self._qp.update_moments(self.statistics.covariance, self.statistics.mean)
+        # Re-solve warm from the previous minimum variance portfolio
+        if self.last_weights is not None:
+            self.warm_weights = self.last_weights
+
+    @classmethod
+    def from_statistics(cls, statistics, **kwargs):
+        # Optimizer over precomputed moments, without a price history
+        optimizer = cls(None, **kwargs)
+        optimizer.statistics = statistics
+        optimizer.risks = statistics.std_series()
+        return optimizer
+
+    @classmethod
+    def from_panel(cls, panel, **kwargs):
+        # Optimizer over a compact ReturnsPanel (float32, possibly memory-mapped, see
+        # returns_panel.py), read block by block without a DataFrame copy; read-only,
+        # append and roll need a price history
+        optimizer = cls(None, **kwargs)
+        with optimizer.metrics.span('moments'):
+            optimizer.statistics = MomentStatistics.from_panel(panel, optimizer.cov_estimator, optimizer.num_factors)
+        optimizer.returns = panel
+        optimizer.risks = optimizer.statistics.std_series()
+        return optimizer
+
+    def compiled_constraints(self):
+        # Bounds, constraint rows and balls of the current basket, built once
+        if self._compiled is None:
+            self._compiled = compile_constraints(self.statistics.tickers, self.constraints, self.lower_bound, self.upper_bound)
+        return self._compiled
+
+    def qp(self):
+        # The QP keeps its KKT factorization and last active set between solves
+        if self._qp is None:
+            self._qp = ConstrainedQP(self.statistics.covariance, self.statistics.mean, self.compiled_constraints())
+        return self._qp
+
+    def _cache_settings(self):
+        return (self.solver,)
+
+    def _cache_key(self, kind, *parts):
+        # None when there is no cache or no price history to describe the basket
+        if self.result_cache is None or self._prices is None:
+            return None
+        if self._fingerprint is None:
+            self._fingerprint = basket_fingerprint(self._prices)
+        return make_key(self._fingerprint, kind, self.short_selling, self._cache_settings(), self.cov_estimator,
+                        self.num_factors, self.compiled_constraints().digest, *parts)
+
+    def portfolio_risk(self, weights):
+        # A singular covariance (more assets than returns) has zero variance portfolios,
+        # whose variance can round to slightly below zero
+        return np.sqrt(max(np.dot(weights, self.statistics.covariance.matvec(weights)), 0.0))
+
+    def _solve(self, target_return=None, initial_guess=None, lower=None, upper=None):
+        with self.metrics.span('solve'):
+            if self.solver == 'qp':
+                result = self.qp().solve(target_return, initial_guess, lower, upper)
+            else:
+                result = self._solve_slsqp(target_return, initial_guess, lower, upper)
+        self._record_solve(self.solver, result, target_return=target_return)
+        return result
+
+    def _record_solve(self, kind, result, target_return=None, target_risk=None):
+        # Counts, convergence flag and residuals of one solver run
+        weights = result.x
+        residuals = {'budget': np.sum(weights) - 1, 'constraints': max(self.compiled_constraints().violation(weights), 0.0)}
+        if target_return is not None:
+            residuals['target'] = np.dot(weights, self.statistics.mean) - target_return
+        if target_risk is not None:
+            residuals['risk'] = self.portfolio_risk(weights) - target_risk
+        self.metrics.record_solve(kind, result, **residuals)
+
+    def _cached(self, key, compute):
+        # cached_call, counting hits and misses
+        computed = []
+
+        def miss():
+            computed.append(True)
+            return compute()
+
+        result = cached_call(self.result_cache, key, self.statistics.tickers, miss)
+        self.metrics.count('cache_misses' if computed else 'cache_hits')
+        return result
+
+    def _solve_slsqp(self, target_return=None, initial_guess=None, lower=None, upper=None):
+        num_assets = self.statistics.num_assets
+        returns_mean = self.statistics.mean
+        covariance = self.statistics.covariance
+        compiled = self.compiled_constraints()
+        lower = compiled.lower if lower is None else lower
+        upper = compiled.upper if upper is None else upper
+
+        def portfolio_variance(weights):
+            return np.sqrt(np.dot(weights, covariance.matvec(weights)))
+
+        def portfolio_variance_gradient(weights):
+            return covariance.matvec(weights) / portfolio_variance(weights)
+
+        # Budget (and target) equalities with their exact Jacobians, then the compiled constraints
+        constraints = [{'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 'jac': lambda x: np.ones_like(x)}]
+        if target_return is not None:
+            constraints.append({'type': 'eq', 'fun': lambda x: np.dot(x, returns_mean) - target_return, 'jac': lambda x: np.asarray(returns_mean)})
+        constraints.extend(compiled.slsqp())
+        bounds = tuple(zip(lower, upper))
+
+        # Initial guess (equal weighting unless warm started)
+        if initial_guess is None:
+            initial_guess = np.array(num_assets * [1. / num_assets,])
+
+        return minimize(portfolio_variance, initial_guess, method='SLSQP', jac=portfolio_variance_gradient, bounds=bounds, constraints=constraints)
+
+    def _solve_constrained(self, target_return=None, initial_guess=None):
+        result = self._solve(target_return, initial_guess)
+        size = self.compiled_constraints().min_position
+        if size == 0:
+            return result
+        # Minimum position sizes: pin undersized positions at zero and re-solve warm until
+        # every remaining position is large enough (a greedy heuristic, not a mixed-integer solve)
+        lower = self.compiled_constraints().lower.copy()
+        upper = self.compiled_constraints().upper.copy()
+        while result.success:
+            magnitude = np.abs(result.x)
+            undersized = (magnitude > self.zero_weight) & (magnitude < size - self.zero_weight) & (lower <= 0) & (upper >= 0)
+            if not undersized.any():
+                break
+            lower[undersized] = 0.0
+            upper[undersized] = 0.0
+            result = self._solve(target_return, result.x, lower, upper)
+        return result
+
+    def markowitz_optimization(self):
+        with self.metrics.span('min_variance'):
+            return self._cached_markowitz_optimization()
+
+    def _cached_markowitz_optimization(self):
+        key = self._cache_key('min_variance')
+        if key is None:
+            return self._markowitz_optimization()
+        weights, optimal_risk, optimal_return = self._cached(key, self._markowitz_optimization)
+        self.optimal_return = optimal_return
+        self.last_weights = weights
+        return weights, optimal_risk, optimal_return
+
+    def _markowitz_optimization(self):
+        # Equal weighting unless warm started after an update
+        optimal_weights = self._solve_constrained(None, self.warm_weights)
+        self.last_result = optimal_weights
+        self.last_weights = optimal_weights.x
+        optimal_risk = self.portfolio_risk(optimal_weights.x)
+        optimal_return = np.dot(optimal_weights.x, self.statistics.mean)
+        self.optimal_return = optimal_return
+        return optimal_weights.x, optimal_risk, optimal_return
+
+    def markowitz_optimization_for_target_return(self, target_return, initial_guess=None):
+        optimal_weights = self._solve_constrained(target_return, initial_guess)
+        self.last_result = optimal_weights
+        optimal_risk = self.portfolio_risk(optimal_weights.x)
+        return optimal_weights.x, optimal_risk, target_return
+
+    def efficient_frontier(self, targets):
+        targets = np.atleast_1d(np.asarray(targets, dtype=float))
+        key = self._cache_key('frontier', len(targets), targets) if len(targets) else None
+        with self.metrics.span('frontier'):
+            if key is None:
+                return self._efficient_frontier(targets)
+            weights, risks, return_ = self._cached(key, lambda: self._efficient_frontier(targets))
+        return list(weights), list(risks), list(return_)
+
+    def _efficient_frontier(self, targets):
+        return self._sweep(targets)
+
+    def _sweep(self, targets):
+        if self.frontier_workers and self.frontier_workers > 1:
+            frontier = parallel_frontier(self, targets, workers=self.frontier_workers, executor=self.frontier_executor)
+            # The workers solved with their own optimizers; only their counters come back
+            self.metrics.add_counts(self.sweep_stats)
+            return frontier
+        return self.frontier_sweep(targets)
+
+    def frontier_sweep(self, targets):
+        # Solve the targets in order, seeding each solve with the previous solution
+        targets = np.atleast_1d(np.asarray(targets, dtype=float))
+        weights = []
+        risks = []
+        return_ = []
+        stats = {'solves': 0, 'iterations': 0, 'function_evaluations': 0, 'gradient_evaluations': 0, 'failures': 0}
+        initial_guess = None
+
+        for i in range(len(targets)):
+            w, ri, re = self.markowitz_optimization_for_target_return(targets[i], initial_guess)
+            weights.append(w)
+            risks.append(ri)
+            return_.append(re)
+            initial_guess = w
+            result = self.last_result
+            if result is None:
+                # Closed-form point, no solver run
+                continue
+            stats['solves'] += 1
+            stats['iterations'] += result.nit
+            stats['function_evaluations'] += result.nfev
+            stats['gradient_evaluations'] += result.njev
+            stats['failures'] += int(not result.success)
+
+        self.sweep_stats = stats
+        return weights, risks, return_
+
+    def frontier_grid(self, resolution=60):
+        # Efficient frontier from the minimum variance return up to the best asset, or up to
+        # the highest return the constraints allow when that is lower; computed once per
+        # resolution until the moments change
+        if self.optimal_return is None:
+            self.markowitz_optimization()
+        key = ('grid', resolution, self.optimal_return)
+        if key not in self._frontier_memo:
+            return_range = self.compiled_constraints().return_range(self.statistics.mean)
+            if return_range is None:
+                raise ValueError("The constraints leave no fully invested portfolio")
+            lowest, highest = return_range
+            targets = np.linspace(np.clip(self.optimal_return, lowest, highest), min(self.statistics.mean.max(), highest), resolution)
+            self._frontier_memo[key] = (targets,) + tuple(self.efficient_frontier(targets))
+        return self._frontier_memo[key]
+
+    def resampled_frontier(self, num_samples=1000, resolution=60, method='bootstrap', workers=None, seed=None, confidence=0.9):
+        # Michaud resampled frontier over bootstrapped ('bootstrap') or simulated ('parametric')
+        # return histories, see resampled_frontier.py
+        with self.metrics.span('resampled_frontier'):
+            return resampled_frontier(self, num_samples, resolution, method, workers, seed, confidence)
+
+    def _frontier_point(self, target_return, initial_guess=None):
+        return self.markowitz_optimization_for_target_return(target_return, initial_guess)
+
+    def _needs_polish(self, weights):
+        # SLSQP stops at its default tolerance; QP points are exact
+        return self.solver == 'slsqp'
+
+    def markowitz_optimization_for_target_risk(self, target_risk, resolution=60):
+        # last_result stays None when the point needed no solve (closed form or memoized)
+        self.last_result = None
+        with self.metrics.span('target_risk'):
+            return self._target_risk_point(target_risk, resolution)
+
+    def _target_risk_point(self, target_risk, resolution):
+        # Highest return portfolio with volatility target_risk: bracket it on the cached
+        # frontier grid, then root-find the target return whose minimum risk matches
+        key = ('risk', target_risk, resolution)
+        if key in self._frontier_memo:
+            return self._frontier_memo[key]
+        targets, weights, risks, return_ = self.frontier_grid(resolution)
+        # Failed grid solves leave NaN risks, which would hide the bracket; search the rest
+        keep = np.flatnonzero(np.isfinite(np.asarray(risks, dtype=float)))
+        if len(keep) == 0:
+            raise ValueError(f"Risk {target_risk} can't be bracketed: no frontier grid point was solved")
+        targets = np.asarray(targets)[keep]
+        weights = [weights[k] for k in keep]
+        risks = np.asarray(risks, dtype=float)[keep]
+        return_ = [return_[k] for k in keep]
+        if target_risk < risks[0] and keep[0] == 0:
+            raise ValueError(f"Risk {target_risk} is below the minimum variance risk {risks[0]}")
+        # Risk grows along the efficient branch; first grid point at or above the target
+        i = int(np.argmax(risks >= target_risk))
+        if target_risk < risks[0]:
+            # Below the first solved point, with the grid's start missing: solve it directly
+            point = self._direct_risk_point(target_risk, weights[0])
+        elif target_risk > risks[-1]:
+            # Past the best asset the frontier goes on wherever the bounds allow it
+            point = self._direct_risk_point(target_risk, weights[-1])
+        elif i == 0 or risks[i] == target_risk:
+            point = (weights[i], risks[i], return_[i])
+        else:
+            guess = [weights[i - 1]]
+
+            def excess_risk(target_return):
+                w, risk, _ = self._frontier_point(target_return, guess[0])
+                if not np.isfinite(risk):
+                    raise ValueError(f"No frontier point at return {target_return}")
+                guess[0] = w
+                return risk - target_risk
+
+            try:
+                target_return = brentq(excess_risk, targets[i - 1], targets[i], xtol=1e-14)
+                point = self._frontier_point(target_return, guess[0])
+            except ValueError:
+                nearest = i if risks[i] - target_risk < target_risk - risks[i - 1] else i - 1
+                if abs(risks[nearest] - target_risk) <= 1e-6 * target_risk:
+                    # Solver noise hid the sign change: the target sits on a grid point
+                    point = (weights[nearest], risks[nearest], return_[nearest])
+                else:
+                    # A solve inside the bracket failed: solve the target risk directly
+                    point = self._direct_risk_point(target_risk, weights[i - 1])
+            # Polish inexact points on the risk-constrained problem, warm started next to the optimum
+            if self._needs_polish(point[0]):
+                result = self.last_result
+                polished, polished_return = self.markowitz_optimization_max_return(target_risk, point[0], tol=1e-12)
+                if self.last_result.success:
+                    point = (polished, target_risk, polished_return)
+                else:
+                    # The unpolished point stands, and so does the result of its solve
+                    self.last_result = result
+        self._frontier_memo[key] = point
+        return point
+
+    def _direct_risk_point(self, target_risk, initial_guess):
+        # Highest return portfolio at target_risk solved on the risk-constrained problem
+        # (past the grid's last point, or where the grid can't bracket it), warm started
+        # from a nearby grid point, then from equal weights (a warm start in a corner of
+        # the bounds can stall)
+        for start in (initial_guess, None):
+            weights, optimal_return = self.markowitz_optimization_max_return(target_risk, start, tol=1e-12)
+            risk = self.portfolio_risk(weights)
+            if self.last_result.success and abs(risk - target_risk) <= 1e-6 * target_risk:
+                return weights, risk, optimal_return
+        raise ValueError(f"Risk {target_risk} can't be reached under the weight bounds and constraints")
+
+    def _figure(self, weights, risks, return_, highlights=(), compact=True):
+        with self.metrics.span('figure'):
+            return frontier_figure(weights, risks, return_, self.statistics.tickers, highlights, compact=compact)
+
+    # def plot_efficient_frontier_(self):
+    #     returns = self.returns
+    #     min_return = returns.mean().min()
+    #     max_return = returns.mean().max()
+    #     targets = np.linspace(min_return, max_return, 100)
+    #     weights = []
+    #     risks = []
+        # return_ = []
+
+        # for i in range(len(targets)):
+        #     w, ri, re = self.markowitz_optimization_for_target_return( targets[i])
+        #     weights.append(w)
+        #     risks.append(ri)
+        #     return_.append(re)
+        # plt.figure(figsize=(20, 5))
+        # plt.plot(risks, return_)
+        # plt.show()
+
+    def plot_efficient_frontier_parabola(self, compact=True):
+        min_return = self.statistics.mean.min()
+        max_return = self.statistics.mean.max()
+        targets = np.linspace(min_return, max_return, 100)
+        weights, risks, return_ = self.efficient_frontier(targets)
+
+        # Efficient frontier with the weights of every point on hover
+        return self._figure(weights, risks, return_, compact=compact)
+
+    def plot_efficient_frontier(self, compact=True):
+        targets, weights, risks, return_ = self.frontier_grid(75)
+
+        # Efficient frontier with the weights of every point on hover
+        return self._figure(weights, risks, return_, compact=compact)
+        
+    def plot_resampled_frontier(self, num_samples=1000, method='bootstrap', workers=None, seed=None, confidence=0.9, compact=True):
+        resampled = self.resampled_frontier(num_samples, 60, method, workers, seed, confidence)
+        targets, weights, risks, return_ = self.frontier_grid(60)
+
+        # Resampled frontier with its confidence band, next to the frontier of the sample moments
+        with self.metrics.span('figure'):
+            return resampled.figure((risks, return_), compact=compact)
+
+    def plot_efficient_frontier_for_given_risk_tolerance_levels(self,  risk_tolerance1, risk_tolerance2, compact=True):
+        targets, weights, risks, return_ = self.frontier_grid(60)
+        # Exact frontier points for both risk tolerances (ValueError when one is not reachable)
+        _, risk1, return1 = self.markowitz_optimization_for_target_risk(risk_tolerance1)
+        _, risk2, return2 = self.markowitz_optimization_for_target_risk(risk_tolerance2)
+
+        # Efficient frontier with the risk tolerance levels highlighted
+        highlights = [(risk1, return1, f'Risk Tolerance {risk_tolerance1}', 'purple'),
+                      (risk2, return2, f'Risk Tolerance {risk_tolerance2}', 'black')]
+        return self._figure(weights, risks, return_, highlights, compact=compact)
+
+
+    def plot_efficient_frontier_for_given_target_return(self,  target_return, compact=True):
+        targets, weights, risks, return_ = self.frontier_grid(60)
+        if not (targets[0] <= target_return <= targets[-1]):
+            raise ValueError(f"Target return {target_return} is outside the efficient frontier [{targets[0]}, {targets[-1]}]")
+        # Exact frontier point for the target, warm started from the nearest grid point
+        nearest = int(np.argmin(np.abs(targets - target_return)))
+        _, point_risk, point_return = self._frontier_point(target_return, weights[nearest])
+
+        # Efficient frontier with the target return highlighted
+        highlights = [(point_risk, point_return, f'Target Return  {target_return }', 'purple')]
+        return self._figure(weights, risks, return_, highlights, compact=compact)
+    
+    def markowitz_optimization_max_return(self , target_risk, initial_guess=None, tol=None):
+        num_assets = self.statistics.num_assets
+        returns_mean = self.statistics.mean
+        covariance = self.statistics.covariance
+        compiled = self.compiled_constraints()
+    
+        # Define optimization function (negative of portfolio return to convert maximization to minimization)
+        def negative_portfolio_return(weights):
+            return -np.dot(weights, returns_mean)
+
+        def portfolio_risk_gradient(weights):
+            return covariance.matvec(weights) / np.sqrt(np.dot(weights, covariance.matvec(weights)))
+    
+        # Define constraints and bounds for optimization
+        constraints = [{'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 'jac': lambda x: np.ones_like(x)},
+                       {'type': 'eq', 'fun': lambda x: np.sqrt(np.dot(x, covariance.matvec(x))) - target_risk, 'jac': portfolio_risk_gradient}]
+        constraints.extend(compiled.slsqp())
+        bounds = tuple(zip(compiled.lower, compiled.upper))
+    
+        if initial_guess is None:
+            initial_guess = np.array(num_assets * [1. / num_assets,])
+    
+        # Perform optimization
+        with self.metrics.span('max_return'):
+            optimal_weights = minimize(negative_portfolio_return, initial_guess, method='SLSQP', jac=lambda x: -np.asarray(returns_mean), bounds=bounds, constraints=constraints, tol=tol)
+        self._record_solve('max_return', optimal_weights, target_risk=target_risk)
+        self.last_result = optimal_weights
+        # optimal_risk = np.sqrt(np.dot(optimal_weights.x.T, np.dot(cov_matrix, optimal_weights.x)))
+        optimal_return = -negative_portfolio_return(optimal_weights.x)
+        
+        return optimal_weights.x, optimal_return
+    
+            
+    def plot_efficient_frontier_for_given_risk_tolerance(self,  risk_tolerance, compact=True):
+        targets, weights, risks, return_ = self.frontier_grid(60)
+        # Exact frontier point for the risk tolerance (ValueError when it is not reachable)
+        _, point_risk, point_return = self.markowitz_optimization_for_target_risk(risk_tolerance)
+
+        # Efficient frontier with the risk tolerance level highlighted
+        highlights = [(point_risk, point_return, f'Risk Tolerance {risk_tolerance}', 'purple')]
+        return self._figure(weights, risks, return_, highlights, compact=compact)
@@ -0,0 +1,150 @@
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import pandas as pd
+
+import no_short_selling
+import shortselling
+from diagnostics import Metrics
+from price_store import shared_store
+from result_cache import shared_cache
+
+
+# Speculative work for the app pages. As soon as every company of a basket is
+# selected, a background thread downloads its prices and solves the minimum
+# variance portfolio and the frontier grid the page is going to draw, while the
+# user is still filling in the rest of the form. Submit picks up the finished
+# (or still running) job of the same basket instead of starting over. A changed
+# selection cancels the previous job of the session: a queued job never starts
+# and a running one stops at its next stage.
+#
+# Only computation runs in the background; every st.* call stays on the page's
+# script thread, which is the only one allowed to draw.
+
+MAX_WORKERS = 2
+# Finished jobs older than this are recomputed, so today's bar is not served stale
+MAX_AGE = 15 * 60
+SESSION_KEY = 'precompute'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Basket:
+    # Everything a page needs after Submit
+    def __init__(self, prices, missing, optimizer, min_variance):
+        self.prices = prices
+        # Tickers without any price data, left out of the optimizer
+        self.missing = missing
+        self.optimizer = optimizer
+        # (weights, risk, return) of the minimum variance portfolio
+        self.min_variance = min_variance
+
+
+def prepare_basket(tickers, short_selling, resolution, metrics, cancelled=None):
+    # Download, clean and solve one basket; cancelled is an Event checked between the stages
+    def check():
+        if cancelled is not None and cancelled.is_set():
+            raise Cancelled()
+
+    check()
+    start_date = pd.Timestamp.now() - pd.DateOffset(months=3)
+    end_date = pd.Timestamp.now()
+    with metrics.span('download'):
+        prices = shared_store().get(tickers, start_date, end_date)
+    check()
+    # Tickers without any price data are left out instead of failing the whole basket
+    missing = list(prices.columns[prices.isna().all()])
+    prices = prices.drop(columns=missing)
+    prices = prices.fillna(prices.mean())
+    optimizer_class = shortselling.PortfolioOptimizer if short_selling else no_short_selling.PortfolioOptimizer
+    optimizer = optimizer_class(prices, result_cache=shared_cache(), metrics=metrics)
+    min_variance = optimizer.markowitz_optimization()
+    check()
+    optimizer.frontier_grid(resolution)
+    return Basket(prices, missing, optimizer, min_variance)
+
+
+def shared_executor():
+    # One small pool per process, shared by every session
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='precompute')
+        return _executor
+
+
+class BasketJob:
+    def __init__(self, key):
+        self.key = key
+        self.created = time.monotonic()
+        self.metrics = Metrics()
+        self.cancelled = threading.Event()
+        # Set once a Submit has taken the job's timings over
+        self.collected = False
+        tickers, short_selling, resolution, _ = key
+        self.future = shared_executor().submit(prepare_basket, list(tickers), short_selling, resolution, self.metrics, self.cancelled)
+
+    def expired(self):
+        return self.future.done() and time.monotonic() - self.created > MAX_AGE
+
+    def cancel(self):
+        self.cancelled.set()
+        self.future.cancel()
+
+
+def _key(tickers, short_selling, resolution):
+    # The price window ends today, so a job only serves the day it was started on
+    return tuple(tickers), bool(short_selling), resolution, pd.Timestamp.now().normalize()
+
+
+def _current(session, key):
+    job = session.get(SESSION_KEY)
+    if job is not None and job.key == key and not job.expired():
+        return job
+    return None
+
+
+def request(session, tickers, short_selling, resolution):
+    # Start (or keep) the background job for the session's current selection
+    key = _key(tickers, short_selling, resolution)
+    job = _current(session, key)
+    if job is None:
+        discard(session)
+        job = BasketJob(key)
+        session[SESSION_KEY] = job
+    return job
+
+
+def discard(session):
+    # Cancel the session's job, e.g. when its selection is no longer complete
+    job = session.pop(SESSION_KEY, None)
+    if job is not None:
+        job.cancel()
+
+
+def collect(session, tickers, short_selling, resolution, metrics):
+    # The basket for Submit: the background result when there is one for this selection
+    # (waiting for it if it is still running), computed here otherwise
+    job = _current(session, _key(tickers, short_selling, resolution))
+    if job is not None:
+        try:
+            with metrics.span('precompute_wait'):
+                basket = job.future.result()
+        except (Cancelled, CancelledError):
+            basket = None
+        if basket is not None:
+            if not job.collected:
+                metrics.merge(job.metrics)
+                job.collected = True
+            metrics.count('precompute_hits')
+            # Later solves of the page are recorded with the page's own timings
+            basket.optimizer.metrics = metrics
+            return basket
+    metrics.count('precompute_misses')
+    return prepare_basket(list(tickers), short_selling, resolution, metrics)
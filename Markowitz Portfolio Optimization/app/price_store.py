@@ -0,0 +1,212 @@
+import os
+import tempfile
+import threading
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from market_data import ChunkedFetcher
+
+
+# Local store of adjusted close prices in front of the market data source (the
+# concurrent fetcher of market_data.py by default, yf.download through
+# YahooSource, or a fixture). Every ticker gets a directory of plain .npy
+# columns (bar dates and closes) that readers memory-map, plus the list of date
+# ranges already requested from the source, so holidays and weekends are not
+# fetched again. get() downloads only the ranges that are missing and serves
+# everything else from disk.
+#
+# Dates are whole days and ranges are half open, [start, end). Today is never
+# marked as covered because its bar is still changing, and neither is a range
+# whose fetch failed in a way worth retrying (timeouts, throttling).
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.price_store')
+
+DAY = np.timedelta64(1, 'D')
+
+
+def _day(timestamp):
+    return np.datetime64(pd.Timestamp(timestamp).normalize().date(), 'D')
+
+
+def _end_day(timestamp):
+    # Round a (possibly intraday) exclusive end up to the next whole day
+    timestamp = pd.Timestamp(timestamp)
+    day = _day(timestamp)
+    return day if timestamp == timestamp.normalize() else day + DAY
+
+
+def _days(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize().to_numpy().astype('datetime64[D]')
+
+
+class YahooSource:
+    # Adjusted closes from Yahoo Finance, one download for all tickers of a range
+
+    def fetch(self, tickers, start, end):
+        import yfinance as yf
+        data = yf.download(list(tickers), start=pd.Timestamp(start), end=pd.Timestamp(end), auto_adjust=False, progress=False)
+        if data is None or len(data) == 0:
+            return pd.DataFrame(columns=list(tickers), dtype=float)
+        prices = data['Adj Close']
+        if isinstance(prices, pd.Series):
+            prices = prices.to_frame(tickers[0])
+        return prices
+
+
+class FixtureSource:
+    # Serves a fixed price frame (or a CSV of one, dates in the first column),
+    # for running the apps and checking the store offline
+
+    def __init__(self, prices):
+        if isinstance(prices, str):
+            prices = pd.read_csv(prices, index_col=0, parse_dates=True)
+        self.prices = prices.sort_index()
+        # (tickers, start, end) of every fetch, to see what gap-filling asked for
+        self.requests = []
+
+    def fetch(self, tickers, start, end):
+        self.requests.append((list(tickers), start, end))
+        days = _days(self.prices.index)
+        rows = (days >= start) & (days < end)
+        columns = [ticker for ticker in tickers if ticker in self.prices.columns]
+        return self.prices.loc[rows, columns]
+
+
+class PriceStore:
+    def __init__(self, directory=DEFAULT_DIRECTORY, source=None):
+        self.directory = directory
+        self.source = source if source is not None else ChunkedFetcher()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, tickers, start, end):
+        # Drop-in for yf.download(tickers, start, end)['Adj Close']
+        tickers = list(tickers)
+        self.update(tickers, start, end)
+        return self.read(tickers, start, end)
+
+    def read(self, tickers, start, end):
+        # Prices on disk for [start, end), one column per ticker, NaN where a ticker has no bar
+        start, end = _day(start), _end_day(end)
+        columns = {}
+        for ticker in tickers:
+            dates, closes = self._load(ticker, mmap_mode='r')
+            lo, hi = np.searchsorted(dates, [start, end])
+            columns[ticker] = pd.Series(np.array(closes[lo:hi]), index=pd.DatetimeIndex(np.array(dates[lo:hi]).astype('datetime64[ns]')))
+        prices = pd.DataFrame(columns, columns=tickers)
+        prices.index.name = 'Date'
+        return prices
+
+    def missing(self, ticker, start, end):
+        # Sub-ranges of [start, end) that were never requested for this ticker
+        start, end = _day(start), _end_day(end)
+        gaps = []
+        for covered_start, covered_end in self._coverage(ticker):
+            if covered_end <= start:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > start:
+                gaps.append((start, covered_start))
+            start = max(start, covered_end)
+        if start < end:
+            gaps.append((start, end))
+        return gaps
+
+    def update(self, tickers, start, end):
+        # Fetch only the missing ranges; tickers sharing a gap are fetched together
+        by_gap = {}
+        for ticker in tickers:
+            for gap in self.missing(ticker, start, end):
+                by_gap.setdefault(gap, []).append(ticker)
+        today = _day(pd.Timestamp.now())
+        for (gap_start, gap_end), gap_tickers in by_gap.items():
+            if hasattr(self.source, 'fetch_report'):
+                # Sources that report failures: keep the retryable ones uncovered
+                report = self.source.fetch_report(gap_tickers, gap_start, gap_end)
+                fetched, retry = report.prices, report.retryable
+            else:
+                fetched, retry = self.source.fetch(gap_tickers, gap_start, gap_end), ()
+            with self._lock:
+                for ticker in gap_tickers:
+                    if ticker in fetched.columns:
+                        column = fetched[ticker].dropna()
+                        self._merge(ticker, _days(column.index), column.to_numpy(dtype=float))
+                    if ticker not in retry:
+                        self._cover(ticker, gap_start, min(gap_end, today))
+
+    def tickers(self):
+        return sorted(unquote(entry.name) for entry in os.scandir(self.directory) if entry.is_dir())
+
+    def _directory(self, ticker):
+        # One directory per ticker, percent-escaped so tickers like 'BRK/B' stay a single path
+        # component (a leading dot too, so '.' and '..' can't leave the store)
+        name = quote(ticker, safe='')
+        if name.startswith('.'):
+            name = '%2E' + name[1:]
+        return os.path.join(self.directory, name)
+
+    def _path(self, ticker, name):
+        return os.path.join(self._directory(ticker), name + '.npy')
+
+    def _load(self, ticker, mmap_mode=None):
+        try:
+            return (np.load(self._path(ticker, 'dates'), mmap_mode=mmap_mode),
+                    np.load(self._path(ticker, 'close'), mmap_mode=mmap_mode))
+        except FileNotFoundError:
+            return np.empty(0, dtype='datetime64[D]'), np.empty(0)
+
+    def _coverage(self, ticker):
+        try:
+            return np.load(self._path(ticker, 'coverage'))
+        except FileNotFoundError:
+            return np.empty((0, 2), dtype='datetime64[D]')
+
+    def _merge(self, ticker, dates, closes):
+        old_dates, old_closes = self._load(ticker)
+        dates = np.concatenate((dates, old_dates))
+        closes = np.concatenate((closes, old_closes))
+        # Newly fetched bars come first, so they win over stored ones on the same day
+        dates, first = np.unique(dates, return_index=True)
+        self._write(ticker, 'dates', dates)
+        self._write(ticker, 'close', closes[first])
+
+    def _cover(self, ticker, start, end):
+        if start >= end:
+            return
+        ranges = sorted([tuple(pair) for pair in self._coverage(ticker)] + [(start, end)])
+        # Merge overlapping and touching ranges
+        merged = [list(ranges[0])]
+        for range_start, range_end in ranges[1:]:
+            if range_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], range_end)
+            else:
+                merged.append([range_start, range_end])
+        self._write(ticker, 'coverage', np.array(merged, dtype='datetime64[D]'))
+
+    def _write(self, ticker, name, array):
+        # Replace the file atomically so memory-mapped readers never see a partial column
+        directory = self._directory(ticker)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            np.save(file, array)
+        os.replace(temporary, self._path(ticker, name))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_store():
+    # One store per process, shared by every page of the app
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PriceStore()
+        return _shared
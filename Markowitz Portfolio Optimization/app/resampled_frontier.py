@@ -0,0 +1,221 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+from covariance import estimate_covariance
+from diagnostics import Metrics
+from frontier_figure import frontier_figure
+from moments import MomentStatistics
+from parallel_frontier import _attach, _optimizer_options, _share
+
+
+# Resampled efficient frontier (Michaud): the return history is resampled many
+# times, the frontier of every resample is solved on a fixed grid of ranks (from
+# its own minimum variance return up to its best asset), and the weights of each
+# rank are averaged over all resamples. The averaged portfolios, evaluated with
+# the original moments, form the resampled frontier; the spread of the
+# individual resampled portfolios gives its confidence bands.
+#
+# Resamples are drawn and solved in batches: one batch is a (samples, days,
+# assets) array whose means and sample covariances come out of a single batched
+# matrix product, and each frontier is swept by a warm-started optimizer. Batches
+# are spread over a process pool whose workers attach to the returns and the
+# original moments through shared memory once. Every batch draws from its own
+# seed, so the result only depends on the seed, not on the number of workers.
+# Frontier points the closed form cannot reach are solved with the constrained
+# QP, whatever solver the optimizer itself uses, since thousands of SLSQP
+# sweeps would take hours.
+
+METHODS = ('bootstrap', 'parametric')
+
+_worker = {}
+
+
+class ResampledFrontier:
+    def __init__(self, tickers, weights, weight_std, risks, return_, sample_risks, sample_returns, confidence, method, failures):
+        self.tickers = list(tickers)
+        # Averaged weights per rank, rows are ranks
+        self.weights = weights
+        self.weight_std = weight_std
+        # Risk and return of the averaged portfolios under the original moments
+        self.risks = risks
+        self.return_ = return_
+        # Every resampled rank portfolio under the original moments, rows are resamples
+        self.sample_risks = sample_risks
+        self.sample_returns = sample_returns
+        self.confidence = confidence
+        self.method = method
+        self.failures = failures
+
+    @property
+    def num_samples(self):
+        return len(self.sample_risks)
+
+    def bands(self, confidence=None):
+        # (lower, upper) quantiles of the risk and of the return of every rank
+        confidence = self.confidence if confidence is None else confidence
+        quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+        risk_band = np.quantile(self.sample_risks, quantiles, axis=0)
+        return_band = np.quantile(self.sample_returns, quantiles, axis=0)
+        return risk_band, return_band
+
+    def frame(self):
+        # One row per rank: averaged weights, their risk and return, and the bands
+        risk_band, return_band = self.bands()
+        frame = pd.DataFrame(self.weights, columns=self.tickers)
+        frame.insert(0, 'return_upper', return_band[1])
+        frame.insert(0, 'return_lower', return_band[0])
+        frame.insert(0, 'risk_upper', risk_band[1])
+        frame.insert(0, 'risk_lower', risk_band[0])
+        frame.insert(0, 'return', self.return_)
+        frame.insert(0, 'risk', self.risks)
+        frame.index.name = 'rank'
+        return frame
+
+    def figure(self, frontier=None, compact=True):
+        # Resampled frontier with its return band; frontier=(risks, return_) adds the sample frontier
+        fig = frontier_figure(self.weights, self.risks, self.return_, self.tickers, compact=compact,
+                              title='Resampled Efficient Frontier')
+        _, return_band = self.bands()
+        trace = go.Scattergl if compact else go.Scatter
+        label = f'{self.confidence:.0%} band'
+        fig.add_trace(trace(x=self.risks, y=return_band[0], mode='lines', line=dict(width=0), name=label,
+                            legendgroup='band', showlegend=False, hoverinfo='skip'))
+        fig.add_trace(trace(x=self.risks, y=return_band[1], mode='lines', line=dict(width=0), name=label,
+                            legendgroup='band', fill='tonexty', fillcolor='rgba(99, 110, 250, 0.2)', hoverinfo='skip'))
+        if frontier is not None:
+            fig.add_trace(trace(x=frontier[0], y=frontier[1], mode='lines', line=dict(dash='dash'), name='Sample Frontier'))
+        return fig
+
+
+def _simulate(rng, values, mean, cholesky, count, method):
+    # (count, days, assets) resampled return histories
+    days, num_assets = values.shape
+    if method == 'bootstrap':
+        return values[rng.integers(0, days, size=(count, days))]
+    # Multivariate normal histories with the original mean and covariance
+    return rng.standard_normal((count, days, num_assets)) @ cholesky.T + mean
+
+
+def _batch_moments(samples, estimator, num_factors):
+    # Means and covariance operators of every resample in the batch
+    means = samples.mean(axis=1)
+    if estimator != 'sample':
+        return means, [estimate_covariance(sample, estimator, num_factors) for sample in samples]
+    centred = samples - means[:, None, :]
+    covariances = np.matmul(centred.transpose(0, 2, 1), centred) / (samples.shape[1] - 1)
+    return means, list(covariances)
+
+
+def _init_worker(optimizer_class, options, specs, tickers, method, resolution):
+    attached = [_attach(spec) for spec in specs]
+    # Keep the segments open for as long as the worker lives
+    _worker['segments'] = [segment for segment, _ in attached]
+    _setup(optimizer_class, options, *[array for _, array in attached], tickers, method, resolution)
+
+
+def _setup(optimizer_class, options, values, mean, covariance, tickers, method, resolution):
+    cholesky = None
+    if method == 'parametric':
+        # Jitter the diagonal of a singular covariance just enough to factor it
+        cholesky = np.linalg.cholesky(covariance + 1e-12 * np.trace(covariance) * np.eye(len(mean)))
+    _worker.update(optimizer_class=optimizer_class, options=options, values=values, mean=mean, covariance=covariance,
+                   cholesky=cholesky, tickers=tickers, method=method, resolution=resolution)
+
+
+def _solve_batch(task):
+    seed, count = task
+    values, mean, covariance = _worker['values'], _worker['mean'], _worker['covariance']
+    options = dict(_worker['options'], solver='qp')
+    metrics = Metrics()
+    options['metrics'] = metrics
+    rng = np.random.default_rng(seed)
+    samples = _simulate(rng, values, mean, _worker['cholesky'], count, _worker['method'])
+    means, covariances = _batch_moments(samples, options.get('cov_estimator', 'sample'), options.get('num_factors'))
+
+    rank_weights = []
+    failures = 0
+    for sample_mean, sample_covariance in zip(means, covariances):
+        statistics = MomentStatistics.from_arrays(sample_mean, sample_covariance, _worker['tickers'], len(values))
+        optimizer = _worker['optimizer_class'].from_statistics(statistics, **options)
+        failed_solves = metrics.counters['failures']
+        try:
+            _, weights, _, _ = optimizer.frontier_grid(_worker['resolution'])
+        except (ValueError, np.linalg.LinAlgError):
+            failures += 1
+            continue
+        weights = np.asarray(weights, dtype=float)
+        # A frontier with an unconverged point is left out rather than averaged in
+        if metrics.counters['failures'] > failed_solves or not np.all(np.isfinite(weights)):
+            failures += 1
+            continue
+        rank_weights.append(weights)
+
+    num_assets = len(mean)
+    if not rank_weights:
+        empty = np.empty((0, _worker['resolution']))
+        return np.zeros((_worker['resolution'], num_assets)), np.zeros((_worker['resolution'], num_assets)), empty, empty, failures, metrics.counters
+    # (resamples, ranks, assets); evaluate every resampled portfolio with the original moments
+    stacked = np.stack(rank_weights)
+    risks = np.sqrt(np.maximum(np.einsum('srn,srn->sr', stacked @ covariance, stacked), 0))
+    returns = stacked @ mean
+    return stacked.sum(axis=0), (stacked ** 2).sum(axis=0), risks, returns, failures, metrics.counters
+
+
+def resampled_frontier(optimizer, num_samples=1000, resolution=60, method='bootstrap', workers=None, seed=None,
+                       confidence=0.9, batch_size=64):
+    if method not in METHODS:
+        raise ValueError(f"Unknown resampling method {method!r}, expected one of {METHODS}")
+    if optimizer.returns is None:
+        raise ValueError("Resampling needs the return history; build the optimizer from prices")
+    values = np.ascontiguousarray(optimizer.returns.to_numpy(dtype=float))
+    mean = np.ascontiguousarray(optimizer.statistics.mean, dtype=float)
+    covariance = np.ascontiguousarray(optimizer.statistics.cov, dtype=float)
+    tickers = optimizer.statistics.tickers
+    optimizer_class = type(optimizer)
+    options = _optimizer_options(optimizer)
+
+    workers = workers or 1
+    counts = [min(batch_size, num_samples - start) for start in range(0, num_samples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    tasks = list(zip(seeds, counts))
+
+    if workers == 1:
+        _setup(optimizer_class, options, values, mean, covariance, tickers, method, resolution)
+        batches = [_solve_batch(task) for task in tasks]
+    else:
+        segments = []
+        try:
+            specs = []
+            for array in (values, mean, covariance):
+                segment, spec = _share(array)
+                segments.append(segment)
+                specs.append(spec)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(optimizer_class, options, specs, tickers, method, resolution)) as pool:
+                batches = list(pool.map(_solve_batch, tasks))
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+    weight_sum = sum(batch[0] for batch in batches)
+    weight_squares = sum(batch[1] for batch in batches)
+    sample_risks = np.concatenate([batch[2] for batch in batches])
+    sample_returns = np.concatenate([batch[3] for batch in batches])
+    failures = sum(batch[4] for batch in batches)
+    for batch in batches:
+        # The workers solved with their own optimizers; only their counters come back
+        optimizer.metrics.add_counts(batch[5])
+    solved = len(sample_risks)
+    if solved == 0:
+        raise ValueError(f"None of the {num_samples} resampled frontiers could be solved")
+
+    weights = weight_sum / solved
+    weight_std = np.sqrt(np.maximum(weight_squares / solved - weights ** 2, 0))
+    risks = np.sqrt(np.maximum(np.einsum('rn,rn->r', weights @ covariance, weights), 0))
+    return_ = weights @ mean
+    return ResampledFrontier(tickers, weights, weight_std, risks, return_, sample_risks, sample_returns, confidence,
+                             method, failures)
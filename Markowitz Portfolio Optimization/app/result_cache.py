@@ -0,0 +1,171 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Two-tier cache for optimization and frontier results: an in-memory LRU in
+# front of a directory of pickles, each tier bounded by its total size in
+# bytes. Keys describe the basket (sorted tickers, first and last price date
+# and a digest of the prices), the short-selling flag and the solve itself
+# (e.g. the frontier resolution), so a repeated basket skips the optimizer.
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.frontier_cache')
+
+
+class ResultCache:
+    def __init__(self, directory=None, memory_bytes=64 * 2 ** 20, disk_bytes=512 * 2 ** 20):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_size = sum(entry.stat().st_size for entry in self._disk_entries())
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(self._memory[key])
+        payload = self._read_disk(key)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, payload)
+        return pickle.loads(payload)
+
+    def put(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, payload)
+        self._write_disk(key, payload)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            if self.directory is not None:
+                for entry in self._disk_entries():
+                    os.remove(entry.path)
+                self._disk_size = 0
+
+    def _remember(self, key, payload):
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        if len(payload) > self.memory_bytes:
+            return
+        self._memory[key] = payload
+        self._memory_size += len(payload)
+        # Evict least recently used entries until the tier fits again
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def _disk_entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')]
+
+    def _read_disk(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                payload = file.read()
+            # The modification time doubles as the last-use time for eviction
+            os.utime(path)
+        except OSError:
+            return None
+        return payload
+
+    def _write_disk(self, key, payload):
+        if self.directory is None or len(payload) > self.disk_bytes:
+            return
+        path = self._path(key)
+        # Write to a temporary file first so readers never see a partial pickle
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(payload)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temporary, path)
+            self._disk_size += len(payload) - previous
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda entry: entry.stat().st_mtime)
+        self._disk_size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._disk_size <= self.disk_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._disk_size -= size
+
+
+def basket_fingerprint(prices):
+    # Identity of a price panel independent of its column order
+    tickers = sorted(prices.columns)
+    digest = hashlib.sha256()
+    digest.update(repr(tickers).encode())
+    digest.update(repr((str(prices.index[0]), str(prices.index[-1]), len(prices))).encode())
+    digest.update(np.ascontiguousarray(prices[tickers].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+def make_key(fingerprint, kind, short_selling, *parts):
+    digest = hashlib.sha256()
+    digest.update(repr((fingerprint, kind, bool(short_selling))).encode())
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(np.ascontiguousarray(part, dtype=float).tobytes())
+        else:
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def cached_call(cache, key, tickers, compute):
+    # compute() returns (weights, ...) with weights (one row per portfolio) in the
+    # order of tickers; entries store them in sorted ticker order so a basket hits
+    # the cache whatever the column order of its prices
+    order = np.array(sorted(range(len(tickers)), key=lambda i: tickers[i]), dtype=int)
+    cached = cache.get(key)
+    if cached is not None:
+        weights = np.empty_like(cached[0])
+        weights[..., order] = cached[0]
+        return (weights,) + tuple(cached[1:])
+    result = compute()
+    weights = np.asarray(result[0], dtype=float)
+    cache.put(key, (weights[..., order],) + tuple(result[1:]))
+    return result
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    # One cache per process, shared by every page of the app
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResultCache(DEFAULT_DIRECTORY)
+        return _shared
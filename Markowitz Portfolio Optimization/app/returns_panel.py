@@ -0,0 +1,165 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+# Compact returns panel for universe-scale baskets: the daily returns of every
+# ticker as one contiguous (days, tickers) array, float32 unless another dtype
+# is asked for, optionally a memory-mapped .npy on disk, with the dates and the
+# ticker index next to it. The moments are accumulated from blocks of rows
+# converted to float64 one block at a time, so neither a float64 copy of the
+# panel nor a returns DataFrame is ever built.
+#
+# On disk a panel is a directory of returns.npy, dates.npy and tickers.npy;
+# open() memory-maps it read-only.
+
+# Rows per float64 block are chosen so a block stays around this size
+BLOCK_BYTES = 8 << 20
+
+
+class ReturnsPanel:
+    def __init__(self, values, dates, tickers, path=None):
+        # (days, tickers) returns, an ndarray or a read-only np.memmap
+        self.values = values
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.path = path
+        self._positions = None
+
+    @classmethod
+    def from_prices(cls, prices, dtype=np.float32, path=None, block_tickers=256):
+        # Returns of a price frame (fill its gaps first, as the app pages do), a block of
+        # tickers at a time; rows with a missing return are dropped like
+        # prices.pct_change().dropna()
+        blocks = range(0, prices.shape[1], block_tickers)
+        valid = np.ones(max(len(prices) - 1, 0), dtype=bool)
+        for first in blocks:
+            valid &= np.isfinite(_returns(prices.iloc[:, first:first + block_tickers])).all(axis=1)
+        values = _allocate(path, (int(valid.sum()), prices.shape[1]), dtype)
+        for first in blocks:
+            values[:, first:first + block_tickers] = _returns(prices.iloc[:, first:first + block_tickers])[valid]
+        return cls._finish(values, prices.index[1:][valid], prices.columns, path)
+
+    @classmethod
+    def from_store(cls, store, tickers, start, end, dtype=np.float32, path=None, block_tickers=256):
+        # Returns straight from the price store's memory-mapped columns, a block of
+        # tickers at a time, with each ticker's gaps filled by its mean price
+        tickers = list(tickers)
+        dates = np.empty(0, dtype='datetime64[ns]')
+        missing = []
+        for ticker in tickers:
+            column = store.read([ticker], start, end)[ticker].dropna()
+            if len(column) == 0:
+                missing.append(ticker)
+            dates = np.union1d(dates, column.index.to_numpy())
+        if missing:
+            raise ValueError(f"No prices for {', '.join(missing)}")
+        dates = pd.DatetimeIndex(dates)
+        values = _allocate(path, (max(len(dates) - 1, 0), len(tickers)), dtype)
+        for first in range(0, len(tickers), block_tickers):
+            block = store.read(tickers[first:first + block_tickers], start, end).reindex(dates)
+            values[:, first:first + block.shape[1]] = _returns(block.fillna(block.mean()))
+        return cls._finish(values, dates[1:], tickers, path)
+
+    @classmethod
+    def _finish(cls, values, dates, tickers, path):
+        if path is None:
+            return cls(values, dates, tickers)
+        values.flush()
+        del values
+        _save(path, 'dates', np.asarray(pd.DatetimeIndex(dates).to_numpy(), dtype='datetime64[ns]'))
+        _save(path, 'tickers', np.asarray(list(tickers), dtype=str))
+        os.replace(os.path.join(path, 'returns.npy.tmp'), os.path.join(path, 'returns.npy'))
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path):
+        values = np.load(os.path.join(path, 'returns.npy'), mmap_mode='r')
+        dates = np.load(os.path.join(path, 'dates.npy'))
+        tickers = np.load(os.path.join(path, 'tickers.npy')).tolist()
+        return cls(values, dates, tickers, path)
+
+    @property
+    def num_days(self):
+        return self.values.shape[0]
+
+    @property
+    def num_assets(self):
+        return self.values.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def __len__(self):
+        return self.num_days
+
+    def block_rows(self):
+        return max(1, BLOCK_BYTES // (8 * max(self.num_assets, 1)))
+
+    def blocks(self):
+        # Consecutive row blocks as float64 copies
+        rows = self.block_rows()
+        for first in range(0, self.num_days, rows):
+            yield np.array(self.values[first:first + rows], dtype=float)
+
+    def moments(self, fourth=False):
+        # (mean, centred co-moment Σ (r - mean)(r - mean)', Σ |r - mean|⁴ or None) in float64,
+        # in two passes over the blocks; the fourth moment is only needed for Ledoit-Wolf
+        total = np.zeros(self.num_assets)
+        for block in self.blocks():
+            total += block.sum(axis=0)
+        mean = total / self.num_days
+        comoment = None
+        fourth_moment = 0.0 if fourth else None
+        for block in self.blocks():
+            block -= mean
+            if comoment is None:
+                comoment = block.T @ block
+            else:
+                comoment += block.T @ block
+            if fourth:
+                fourth_moment += np.sum(np.einsum('ij,ij->i', block, block) ** 2)
+        return mean, comoment, fourth_moment
+
+    def window(self, start=None, end=None):
+        # Rows with start <= date < end, a view of the same array
+        lo = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start)))
+        hi = self.num_days if end is None else int(self.dates.searchsorted(pd.Timestamp(end)))
+        return ReturnsPanel(self.values[lo:hi], self.dates[lo:hi], self.tickers, self.path)
+
+    def subset(self, tickers):
+        # A sub-basket, copied into memory in the panel's dtype
+        if self._positions is None:
+            self._positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        index = np.array([self._positions[ticker] for ticker in tickers], dtype=int)
+        return ReturnsPanel(np.ascontiguousarray(self.values[:, index]), self.dates, tickers)
+
+    def to_numpy(self, dtype=float):
+        return np.asarray(self.values, dtype=dtype)
+
+    def to_frame(self):
+        # Full float64 DataFrame, for small panels and callers that need one
+        return pd.DataFrame(self.to_numpy(), index=self.dates, columns=self.tickers)
+
+
+def _returns(prices):
+    closes = prices.to_numpy(dtype=float)
+    return closes[1:] / closes[:-1] - 1
+
+
+def _allocate(path, shape, dtype):
+    if path is None:
+        return np.empty(shape, dtype=dtype)
+    os.makedirs(path, exist_ok=True)
+    # Written under a temporary name and renamed once complete, like the price store's columns
+    return np.lib.format.open_memmap(os.path.join(path, 'returns.npy.tmp'), mode='w+', dtype=dtype, shape=shape)
+
+
+def _save(path, name, array):
+    descriptor, temporary = tempfile.mkstemp(dir=path, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as file:
+        np.save(file, array)
+    os.replace(temporary, os.path.join(path, name + '.npy'))
@@ -1,474 +1,128 @@
 
 import numpy as np
-import pandas as pd
-# import matplotlib.pyplot as plt
-import yfinance as yf
-from scipy.optimize import minimize
-import plotly.graph_objs as go
-
-
-class PortfolioOptimizer:
-    def __init__(self , prices ):
-        self.prices = prices 
-        self.returns = prices.pct_change().dropna()
-        self.risks = prices.pct_change().dropna().std()
-        self.optimal_return = None
-        
-    def markowitz_optimization(self):
-        returns = self.returns
-        num_assets = len(returns.columns)
-        returns_mean = returns.mean()
-        cov_matrix = returns.cov()
-        optimal_return = None
-
-        # Define optimization function
-        def portfolio_return(weights):
-            return -np.dot(weights, returns_mean)
-
-        def portfolio_variance(weights):
-            return np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights)))
-
-        # Define constraints and bounds for optimization
-        constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1})
-        bounds = tuple((-1, 1) for asset in range(num_assets))
-
-        # Initial guess (equal weighting)
-        initial_guess = np.array(num_assets * [1. / num_assets,])
-
-        # Perform optimization
-        optimal_weights = minimize(portfolio_variance, initial_guess, method='SLSQP', bounds=bounds, constraints=constraints)
-        optimal_risk = portfolio_variance(optimal_weights.x)
-        optimal_return = -portfolio_return(optimal_weights.x)
-        self.optimal_return = optimal_return
-        return optimal_weights.x, optimal_risk, optimal_return
-
-    def markowitz_optimization_for_target_return(self, target_return):
-        returns = self.returns
-        num_assets = len(returns.columns)
-        returns_mean = returns.mean()
-        cov_matrix = returns.cov()
-
-        # Define optimization function
-        def portfolio_variance(weights):
-            return np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights)))
-
-        # Define constraints and bounds for optimization
-        constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1},
-                       {'type': 'eq', 'fun': lambda x: np.dot(x, returns_mean) - target_return})
-        bounds = tuple((-1, 1) for asset in range(num_assets))
-
-        # Initial guess (equal weighting)
-        initial_guess = np.array(num_assets * [1. / num_assets,])
-
-        # Perform optimization
-        optimal_weights = minimize(portfolio_variance, initial_guess, method='SLSQP', bounds=bounds, constraints=constraints)
-        optimal_risk = portfolio_variance(optimal_weights.x)
-        return optimal_weights.x, optimal_risk, target_return
-
-    # def plot_efficient_frontier_(self):
-    #     returns = self.returns 
-    #     min_return = returns.mean().min()
-    #     max_return = returns.mean().max()
-    #     targets = np.linspace(min_return, max_return, 100)
-    #     weights = []
-    #     risks = []
-        # return_ = []
-
-        # for i in range(len(targets)):
-        #     w, ri, re = self.markowitz_optimization_for_target_return( targets[i])
-        #     weights.append(w)
-        #     risks.append(ri)
-        #     return_.append(re)
-        # plt.figure(figsize=(20, 5))
-        # plt.plot(risks, return_)
-        # plt.show()
-
-    def plot_efficient_frontier_parabola(self):
-        returns = self.returns 
-        min_return = returns.mean().min()
-        max_return = returns.mean().max()
-        targets = np.linspace(min_return, max_return, 100)
-        weights = []
-        risks = []
-        return_ = []
-
-        for i in range(len(targets)):
-            w, ri, re = self.markowitz_optimization_for_target_return( targets[i])
-            weights.append(w)
-            risks.append(ri)
-            return_.append(re)
-
-        # Create trace for the efficient frontier
-        efficient_frontier_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='lines',
-            name='Efficient Frontier'
-        )
-
-        # Create a list of points for hover text
-        hover_text = []
-        for i in range(len(risks)):
-            hover_text.append(
-                f'Risks: {risks[i]:.4f}<br>Weights: {weights[i]}<br>Return: {return_[i]:.4f}')
-
-        # Create trace for individual points with hover text
-        efficient_frontier_points_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='markers',
-            name='Efficient Frontier Points',
-            text=hover_text,
-            hoverinfo='text'
-        )
-
-        # Create layout
-        layout = go.Layout(
-            title='Efficient Frontier',
-            xaxis=dict(title='Volatility'),
-            yaxis=dict(title='Return')
-        )
-
-        # Create figure
-        fig = go.Figure(data=[efficient_frontier_trace,
-                              efficient_frontier_points_trace], layout=layout)
-
-        # Show plot
-        # fig.show()
-        return fig
-
-    def plot_efficient_frontier(self):
-        returns = self.returns
-        # min_return = returns.mean().min()
-        min_return = self.optimal_return
-        max_return = returns.mean().max()
-        targets = np.linspace(min_return, max_return, 75)
-        weights = []
-        risks = []
-        return_ = []
-
-        for i in range(len(targets)):
-            w, ri, re = self.markowitz_optimization_for_target_return( targets[i])
-            weights.append(w)
-            risks.append(ri)
-            return_.append(re)
-
-        # Create trace for the efficient frontier
-        efficient_frontier_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='lines',
-            name='Efficient Frontier'
-        )
-
-        # Create a list of points for hover text
-        hover_text = []
-        for i in range(len(risks)):
-            hover_text.append(
-                f'Risks: {risks[i]:.4f}<br>Weights: {weights[i]}<br>Return: {return_[i]:.4f}')
-
-        # Create trace for individual points with hover text
-        efficient_frontier_points_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='markers',
-            name='Efficient Frontier Points',
-            text=hover_text,
-            hoverinfo='text'
-        )
-
-        # Create layout
-        layout = go.Layout(
-            title='Efficient Frontier',
-            xaxis=dict(title='Volatility'),
-            yaxis=dict(title='Return')
-        )
-
-        # Create figure
-        fig = go.Figure(data=[efficient_frontier_trace,
-                              efficient_frontier_points_trace], layout=layout)
-
-        # Show plot
-        # fig.show()
-        return fig
-        
-    def plot_efficient_frontier_for_given_risk_tolerance_levels(self,  risk_tolerance1, risk_tolerance2):
-        returns = self.returns
-        min_return = self.optimal_return
-        max_return = returns.mean().max()
-        targets = np.linspace(min_return, max_return, 60 )
-        weights = []
-        risks = []
-        return_ = []
-        
-        for i in range(len(targets)):
-            w, ri, re = self.markowitz_optimization_for_target_return( targets[i])
-            weights.append(w)
-            risks.append(ri)
-            return_.append(re)
-        # print(risks)
-        closest_risk1 = risk_tolerance1
-        closest_risk2 = risk_tolerance2
-
-        for i in range(len(risks) - 1):
-            if(risks[i] <= risk_tolerance1 <= risks[i+1]):
-                closest_risk1 = risks[i] if risk_tolerance1 - risks[i] < risks[i+1] - risk_tolerance1 else risks[i+1]
-            if(risks[i] <= risk_tolerance2 <= risks[i+1]):
-                closest_risk2 = risks[i] if risk_tolerance2 - risks[i] < risks[i+1] - risk_tolerance2 else risks[i+1]
-        # print(closest_risk1 , closest_risk2)
-        # Create trace for the efficient frontier
-        efficient_frontier_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='lines',
-            name='Efficient Frontier'
-        )
-
-        # Create a list of points for hover text
-        hover_text = []
-        for i in range(len(risks)):
-            hover_text.append(
-                f'Risks: {risks[i]:.4f}<br>Weights: {weights[i]}<br>Return: {return_[i]:.4f}')
-
-        # Create trace for individual points with hover text
-        efficient_frontier_points_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='markers',
-            name='Efficient Frontier Points',
-            text=hover_text,
-            hoverinfo='text'
-        )
-
-        # Highlight closest risk tolerance levels
-        closest_risk1_index = risks.index(closest_risk1)
-        closest_risk2_index = risks.index(closest_risk2)
-
-        # Create trace for closest risk tolerance levels
-        closest_risk1_trace = go.Scatter(
-            x=[risks[closest_risk1_index]],
-            y=[return_[closest_risk1_index]],
-            mode='markers',
-            marker=dict(symbol='star', color='purple', size=15),
-            name=f'Risk Tolerance {risk_tolerance1}'
-        )
-
-        closest_risk2_trace = go.Scatter(
-            x=[risks[closest_risk2_index]],
-            y=[return_[closest_risk2_index]],
-            mode='markers',
-            marker=dict(symbol='star', color='black', size=15),
-            name=f'Risk Tolerance {risk_tolerance2}'
-        )
-
-        # Create layout
-        layout = go.Layout(
-            title='Efficient Frontier',
-            xaxis=dict(title='Volatility'),
-            yaxis=dict(title='Return')
-        )
-
-        # Create figure
-        fig = go.Figure(data=[efficient_frontier_trace, efficient_frontier_points_trace, closest_risk1_trace, closest_risk2_trace], layout=layout)
-
-        # Show plot
-        # fig.show() 
-        return fig
-
-
-    def plot_efficient_frontier_for_given_target_return(self,  target_return ):
-        returns = self.returns
-        min_return = self.optimal_return
-        max_return = returns.mean().max()
-        targets = np.linspace(min_return, max_return, 60 )
-        weights = []
-        risks = []
-        return_ = []
-        print(min_return , max_return )
-        for i in range(len(targets)):
-            w, ri, re = self.markowitz_optimization_for_target_return( targets[i])
-            weights.append(w)
-            risks.append(ri)
-            return_.append(re)
-        # print(risks)
-        closest_target = target_return
-
-        for i in range(len(return_) - 1):
-            if(return_[i] <= target_return <= return_[i+1]):
-                if target_return - return_[i] < return_[i+1] - target_return :
-                    closest_target = return_[i]
-                else:
-                    closest_target = return_[i+1]
-        print(closest_target)
-        # print(closest_risk1 , closest_risk2)
-        # Create trace for the efficient frontier
-        efficient_frontier_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='lines',
-            name='Efficient Frontier'
-        )
-
-        # Create a list of points for hover text
-        hover_text = []
-        for i in range(len(risks)):
-            hover_text.append(
-                f'Risks: {risks[i]:.4f}<br>Weights: {weights[i]}<br>Return: {return_[i]:.4f}')
-
-        # Create trace for individual points with hover text
-        efficient_frontier_points_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='markers',
-            name='Efficient Frontier Points',
-            text=hover_text,
-            hoverinfo='text'
-        )
-
-
-        closest_target_index = return_.index(closest_target) 
-        closest_target_trace = go.Scatter(
-            x = [risks[closest_target_index]] , 
-            y = [return_[closest_target_index]] , 
-            mode = 'markers' , 
-            marker=dict(symbol='star', color='purple', size=15),
-            name=f'Target Return  {target_return }'
-            
-        )
-        # Highlight closest risk tolerance levels
-        # closest_risk1_index = risks.index(closest_risk1)
-        # closest_risk2_index = risks.index(closest_risk2)
-
-        # # Create trace for closest risk tolerance levels
-        # closest_risk1_trace = go.Scatter(
-        #     x=[risks[closest_risk1_index]],
-        #     y=[return_[closest_risk1_index]],
-        #     mode='markers',
-        #     marker=dict(symbol='star', color='purple', size=15),
-        #     name=f'Risk Tolerance {risk_tolerance1}'
-        # )
-
-        # closest_risk2_trace = go.Scatter(
-        #     x=[risks[closest_risk2_index]],
-        #     y=[return_[closest_risk2_index]],
-        #     mode='markers',
-        #     marker=dict(symbol='star', color='black', size=15),
-        #     name=f'Risk Tolerance {risk_tolerance2}'
-        # )
-
-        # Create layout
-        layout = go.Layout(
-            title='Efficient Frontier',
-            xaxis=dict(title='Volatility'),
-            yaxis=dict(title='Return')
-        )
-
-        # Create figure
-        fig = go.Figure(data=[efficient_frontier_trace, efficient_frontier_points_trace , closest_target_trace ], layout=layout)
-
-        # Show plot
-        # fig.show() 
-        return fig
-    
-    def markowitz_optimization_max_return(self , target_risk):
-        returns = self.returns
-        num_assets = len(returns.columns)
-        returns_mean = returns.mean()
-        cov_matrix = returns.cov()
-    
-        # Define optimization function (negative of portfolio return to convert maximization to minimization)
-        def negative_portfolio_return(weights):
-            return -np.dot(weights, returns_mean)
-    
-        # Define constraints and bounds for optimization
-        constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1},
-                       {'type': 'eq', 'fun': lambda x: np.sqrt(np.dot(x.T, np.dot(cov_matrix, x))) - target_risk})
-        bounds = tuple((-1, 1) for asset in range(num_assets))
-    
-        initial_guess = np.array(num_assets * [1. / num_assets,])
-    
-        # Perform optimization
-        optimal_weights = minimize(negative_portfolio_return, initial_guess, method='SLSQP', bounds=bounds, constraints=constraints)
-        # optimal_risk = np.sqrt(np.dot(optimal_weights.x.T, np.dot(cov_matrix, optimal_weights.x)))
-        optimal_return = -negative_portfolio_return(optimal_weights.x)
-        
-        return optimal_weights.x, optimal_return
-    
-            
-    def plot_efficient_frontier_for_given_risk_tolerance(self,  risk_tolerance ):
-        returns = self.returns
-        min_return = self.optimal_return
-        max_return = returns.mean().max()
-        targets = np.linspace(min_return, max_return, 60 )
-        weights = []
-        risks = []
-        return_ = []
-        
-        for i in range(len(targets)):
-            w, ri, re = self.markowitz_optimization_for_target_return( targets[i])
-            weights.append(w)
-            risks.append(ri)
-            return_.append(re)
-        # print(risks)
-        closest_risk = risk_tolerance
-
-        for i in range(len(risks) - 1):
-            if(risks[i] <= risk_tolerance <= risks[i+1]):
-                closest_risk = risks[i] if risk_tolerance - risks[i] < risks[i+1] - risk_tolerance else risks[i+1]
-            
-        efficient_frontier_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='lines',
-            name='Efficient Frontier'
-        )
-
-        # Create a list of points for hover text
-        hover_text = []
-        for i in range(len(risks)):
-            hover_text.append(
-                f'Risks: {risks[i]:.4f}<br>Weights: {weights[i]}<br>Return: {return_[i]:.4f}')
-
-        # Create trace for individual points with hover text
-        efficient_frontier_points_trace = go.Scatter(
-            x=risks,
-            y=return_,
-            mode='markers',
-            name='Efficient Frontier Points',
-            text=hover_text,
-            hoverinfo='text'
-        )
-
-        # Highlight closest risk tolerance levels
-        closest_risk1_index = risks.index(closest_risk)
-
-        # Create trace for closest risk tolerance levels
-        closest_risk1_trace = go.Scatter(
-            x=[risks[closest_risk1_index]],
-            y=[return_[closest_risk1_index]],
-            mode='markers',
-            marker=dict(symbol='star', color='purple', size=15),
-            name=f'Risk Tolerance {risk_tolerance}'
-        )
-
-        # closest_risk2_trace = go.Scatter(
-        #     x=[risks[closest_risk2_index]],
-        #     y=[return_[closest_risk2_index]],
-        #     mode='markers',
-        #     marker=dict(symbol='star', color='black', size=15),
-        #     name=f'Risk Tolerance {risk_tolerance2}'
-        # )
-
-        # Create layout
-        layout = go.Layout(
-            title='Efficient Frontier',
-            xaxis=dict(title='Volatility'),
-            yaxis=dict(title='Return')
-        )
-
-        # Create figure
-        fig = go.Figure(data=[efficient_frontier_trace, efficient_frontier_points_trace, closest_risk1_trace ], layout=layout)
-
-        # # Show plot
-        # fig.show() 
-        return fig
\ No newline at end of file
+import portfolio
+
+
+class PortfolioOptimizer(portfolio.PortfolioOptimizer):
+    lower_bound = -1.0
+    upper_bound = 1.0
+    short_selling = True
+    # Slack allowed on the bounds before a closed-form solution is rejected
+    bound_tolerance = 1e-9
+
+    def __init__(self , prices , frontier_mode='analytic', frontier_workers=None, frontier_executor='process', cov_estimator='sample', num_factors=None, result_cache=None, solver='qp', constraints=(), metrics=None):
+        # 'analytic' uses the closed-form two-fund frontier wherever the bounds allow it,
+        # 'numeric' solves every point with the solver (the constrained 'qp' or 'slsqp')
+        self.frontier_mode = frontier_mode
+        super().__init__(prices, solver, constraints, frontier_workers, frontier_executor, cov_estimator, num_factors, result_cache, metrics)
+
+    def _cache_settings(self):
+        return (self.frontier_mode, self.solver)
+
+    def _closed_form(self):
+        # The two-fund solution only holds when nothing but per-asset bounds constrains the weights
+        return self.frontier_mode == 'analytic' and self.compiled_constraints().box_only
+
+    def _within_bounds(self, weights, tolerance):
+        compiled = self.compiled_constraints()
+        return np.all((weights >= compiled.lower - tolerance) & (weights <= compiled.upper + tolerance), axis=-1)
+
+    def _markowitz_optimization(self):
+        # Closed-form minimum variance portfolio when the bounds are not binding
+        if self._closed_form():
+            moments = self._frontier_moments()
+            if moments is not None:
+                inv_ones, inv_mean, a, b, c, d = moments
+                weights = inv_ones / a
+                if self._within_bounds(weights, self.bound_tolerance):
+                    optimal_risk = np.sqrt(1 / a)
+                    optimal_return = b / a
+                    self.optimal_return = optimal_return
+                    self.last_weights = weights
+                    self.metrics.count('closed_form_points')
+                    return weights, optimal_risk, optimal_return
+        return super()._markowitz_optimization()
+
+    def _frontier_moments(self):
+        # Solve the covariance system once for both the budget and the return vector
+        returns_mean = self.statistics.mean
+        ones = np.ones(len(returns_mean))
+        try:
+            # Cholesky solve for a dense covariance, Woodbury identity for a factor model
+            with self.metrics.span('covariance_solve'):
+                solved = self.statistics.covariance.solve(np.column_stack((ones, returns_mean)))
+        except np.linalg.LinAlgError:
+            return None
+        inv_ones, inv_mean = solved[:, 0], solved[:, 1]
+        a = ones @ inv_ones
+        b = ones @ inv_mean
+        c = returns_mean @ inv_mean
+        d = a * c - b * b
+        if not np.isfinite(d) or a <= 0 or d <= 1e-12 * a * c:
+            # All assets share the same mean (or the covariance is degenerate)
+            return None
+        return inv_ones, inv_mean, a, b, c, d
+
+    def analytic_frontier(self, targets):
+        # Two-fund solution of min w'Σw subject to 1'w = 1 and μ'w = target:
+        # w(t) = g + h t,  σ²(t) = (a t² - 2 b t + c) / d
+        targets = np.atleast_1d(np.asarray(targets, dtype=float))
+        moments = self._frontier_moments()
+        if moments is None:
+            return None
+        inv_ones, inv_mean, a, b, c, d = moments
+        g = (c * inv_ones - b * inv_mean) / d
+        h = (a * inv_mean - b * inv_ones) / d
+        weights = g[None, :] + targets[:, None] * h[None, :]
+        variances = (a * targets ** 2 - 2 * b * targets + c) / d
+        risks = np.sqrt(np.maximum(variances, 0))
+        return weights, risks, targets
+
+    def _efficient_frontier(self, targets):
+        targets = np.atleast_1d(np.asarray(targets, dtype=float))
+        frontier = None
+        if self._closed_form():
+            frontier = self.analytic_frontier(targets)
+
+        if frontier is None:
+            return self._sweep(targets)
+
+        # Targets whose closed-form weights break the bounds need the numeric solver
+        weights, risks, return_ = frontier
+        binding = ~self._within_bounds(weights, self.bound_tolerance)
+        self.metrics.count('closed_form_points', int(np.sum(~binding)))
+        if np.any(binding):
+            indices = np.flatnonzero(binding)
+            swept = self._sweep(targets[indices])
+            for j, i in enumerate(indices):
+                weights[i], risks[i], return_[i] = swept[0][j], swept[1][j], swept[2][j]
+
+        return list(weights), list(risks), list(return_)
+
+    def markowitz_optimization_for_target_return(self, target_return, initial_guess=None):
+        # Closed-form point when the bounds are not binding (last_result is None then), the
+        # solver otherwise, so single targets agree with the closed-form frontier
+        if self._closed_form():
+            frontier = self.analytic_frontier([target_return])
+            if frontier is not None and self._within_bounds(frontier[0][0], self.bound_tolerance):
+                self.last_result = None
+                self.metrics.count('closed_form_points')
+                return frontier[0][0], frontier[1][0], target_return
+        return super().markowitz_optimization_for_target_return(target_return, initial_guess)
+
+    def _needs_polish(self, weights):
+        # Closed-form points are exact; points touching the bounds came from the solver
+        return self.solver == 'slsqp' and not (self._closed_form() and self._within_bounds(weights, -self.bound_tolerance))
+
+    def _direct_risk_point(self, target_risk, initial_guess):
+        # Upper branch of the two-fund frontier: a t² - 2 b t + c - d σ² = 0
+        if self._closed_form():
+            moments = self._frontier_moments()
+            if moments is not None:
+                _, _, a, b, c, d = moments
+                target_return = (b + np.sqrt(max(b * b - a * (c - d * target_risk ** 2), 0))) / a
+                frontier = self.analytic_frontier([target_return])
+                if self._within_bounds(frontier[0][0], self.bound_tolerance):
+                    self.metrics.count('closed_form_points')
+                    return frontier[0][0], frontier[1][0], target_return
+        return super()._direct_risk_point(target_risk, initial_guess)
@@ -1,11 +1,32 @@
 import streamlit as st
 import app1 , app2 , app3
+
+
+def show_diagnostics(metrics):
+    # Stage timings, solver counters, residuals and errors of the last Submit
+    st.sidebar.markdown("---")
+    st.sidebar.header("Diagnostics")
+    if metrics is None:
+        st.sidebar.write("Submit an optimization to collect diagnostics.")
+        return
+    report = metrics.as_dict()
+    st.sidebar.subheader("Stages (seconds)")
+    st.sidebar.dataframe(metrics.span_frame().round(4))
+    st.sidebar.subheader("Solver")
+    st.sidebar.json({'counters': report['counters'], 'statuses': report['statuses'], 'last_solve': report['last_solve']})
+    st.sidebar.subheader("Largest residuals")
+    st.sidebar.json(report['residuals'])
+    for error in report['errors']:
+        st.sidebar.error(error)
+
+
 def main():
     st.title("Portfolio Optimizer")
 
     # Sidebar
     st.sidebar.title("Navigation")
     option = st.sidebar.selectbox("Go to", ["Home", "Portfolio Optimization", "Portfolio Optimization with Target Return", "Portfolio Optimization for Risk Tolerance"])
+    diagnostics = st.sidebar.checkbox("Show diagnostics", value=False)
 
     if option == "Home":
         st.write("Welcome to the Portfolio Optimization App!")
@@ -48,5 +69,8 @@ def main():
         app3.main()
         # Add your risk tolerance optimization content here
 
+    if diagnostics:
+        show_diagnostics(st.session_state.get('diagnostics'))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,101 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+
+# Local stand-in for Yahoo's chart endpoint: serves the adjusted closes of a
+# price frame as chart JSON over keep-alive HTTP/1.1, with scripted failures
+# per ticker, and records every request and connection it sees.
+#
+#   with ChartStub(prices, failures={'AAA': [503, 200]}) as stub:
+#       ChunkedFetcher(base_url=stub.base_url).fetch(['AAA'], start, end)
+
+
+def chart_body(prices, start, end):
+    # Chart JSON of one price Series for [start, end) given as epoch seconds
+    prices = prices.dropna()
+    # Bars stamped at the US market open, as Yahoo does
+    stamps = ((prices.index + pd.Timedelta(hours=14, minutes=30) - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy()
+    keep = (stamps >= start) & (stamps < end)
+    closes = prices.to_numpy()[keep].tolist()
+    result = {'meta': {'gmtoffset': 0}, 'timestamp': stamps[keep].tolist(),
+              'indicators': {'quote': [{'close': closes}], 'adjclose': [{'adjclose': closes}]}}
+    return {'chart': {'result': [result], 'error': None}}
+
+
+class ChartStub:
+    def __init__(self, prices, failures=None, retry_after=None):
+        self.prices = prices
+        # ticker -> statuses answered before (or instead of, when the list ends with an error) the prices;
+        # a status of 200 ends the scripted part
+        self.failures = {ticker: list(statuses) for ticker, statuses in (failures or {}).items()}
+        # Retry-After header sent with 429 and 503 answers
+        self.retry_after = retry_after
+        # (ticker, status) of every request, and the client port of every connection
+        self.requests = []
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v8/finance/chart/'
+
+    def _answer(self, ticker):
+        with self._lock:
+            statuses = self.failures.get(ticker)
+            status = statuses.pop(0) if statuses else 200
+            if statuses == [] and status != 200:
+                # The last scripted status keeps being answered
+                statuses.append(status)
+            self.requests.append((ticker, status))
+        return status
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; don't let them wait on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.connections.add(self.client_address[1])
+                parts = urlsplit(self.path)
+                ticker = unquote(parts.path.rsplit('/', 1)[-1])
+                status = stub._answer(ticker)
+                if status == 200 and ticker not in stub.prices.columns:
+                    status = 404
+                if status == 200:
+                    query = parse_qs(parts.query)
+                    payload = chart_body(stub.prices[ticker], int(query['period1'][0]), int(query['period2'][0]))
+                else:
+                    payload = {'chart': {'result': None, 'error': {'code': str(status), 'description': 'stub failure'}}}
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status in (429, 503) and stub.retry_after is not None:
+                    self.send_header('Retry-After', str(stub.retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
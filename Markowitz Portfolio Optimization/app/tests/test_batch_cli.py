@@ -0,0 +1,33 @@
+import pandas as pd
+
+from batch_cli import CsvSink, run_batch
+from benchmark import synthetic_prices
+
+
+def _baskets(tickers):
+    return [{'id': 'ok', 'tickers': tickers[:3], 'short_selling': True, 'mode': 'min_variance', 'target': None, 'start': None, 'end': None},
+            {'id': 'missing', 'tickers': tickers[3:5] + ['ZZZ'], 'short_selling': False, 'mode': 'min_variance', 'target': None,
+             'start': None, 'end': None}]
+
+
+def test_resume_retries_failed_baskets(tmp_path):
+    panel = synthetic_prices(6, 120, seed=5)
+    tickers = list(panel.columns)
+    baskets = _baskets(tickers)
+    path = str(tmp_path / 'results.csv')
+    window = (panel.index[0], panel.index[-1] + pd.Timedelta(days=1))
+
+    sink = CsvSink(path)
+    assert run_batch(baskets, sink, panel.iloc[:, :5], start=window[0], end=window[1], workers=1) == (2, 0, 1)
+    sink.close()
+
+    # The basket without prices for ZZZ failed and does not count as completed
+    panel = panel.rename(columns={tickers[5]: 'ZZZ'})
+    sink = CsvSink(path)
+    assert sink.completed() == {'ok'}
+    assert run_batch(baskets, sink, panel, start=window[0], end=window[1], workers=1) == (1, 1, 0)
+    assert sink.completed() == {'ok', 'missing'}
+    sink.close()
+    rows = pd.read_csv(path, dtype=str)
+    assert list(rows['id']) == ['ok', 'missing', 'missing']
+    assert list(rows['success']) == ['True', 'False', 'True']
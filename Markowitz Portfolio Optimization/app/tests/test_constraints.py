@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from constraints import (GrossLeverage, LinearLimit, MinimumPosition, PositionLimits, SectorLimits, Turnover,
+                         compile_constraints, project_l1_ball)
+
+TICKERS = ['AAA', 'BBB', 'CCC', 'DDD', 'EEE']
+MEAN = np.array([0.01, 0.03, -0.02, 0.05, 0.0])
+
+
+def test_specs_compile_to_bounds_rows_and_balls():
+    sectors = {'AAA': 'Tech', 'BBB': 'Tech', 'CCC': 'Energy', 'DDD': 'Energy'}
+    compiled = compile_constraints(TICKERS, [PositionLimits(upper=0.4), PositionLimits(lower={'BBB': 0.1}, upper={'DDD': 0.2}),
+                                             SectorLimits(sectors, upper={'Tech': 0.6}), LinearLimit({'AAA': 1, 'EEE': -1, 'ZZZ': 5}, lower=0),
+                                             Turnover({'AAA': 0.5, 'BBB': 0.5}, 1.0), MinimumPosition(0.02)], 0.0, 1.0)
+
+    np.testing.assert_array_equal(compiled.lower, [0, 0.1, 0, 0, 0])
+    np.testing.assert_array_equal(compiled.upper, [0.4, 0.4, 0.4, 0.2, 0.4])
+    # Sectors in sorted order, then the linear limit; tickers outside the basket are ignored
+    np.testing.assert_array_equal(compiled.rows, [[0, 0, 1, 1, 0], [1, 1, 0, 0, 0], [1, 0, 0, 0, -1]])
+    np.testing.assert_array_equal(compiled.row_upper, [np.inf, 0.6, np.inf])
+    np.testing.assert_array_equal(compiled.row_lower, [-np.inf, -np.inf, 0])
+    assert len(compiled.balls) == 1
+    np.testing.assert_array_equal(compiled.balls[0][0], [0.5, 0.5, 0, 0, 0])
+    assert compiled.min_position == 0.02
+    assert not compiled.box_only
+
+    # Tech at 0.7 breaks its 0.6 cap
+    assert compiled.violation(np.array([0.4, 0.3, 0.1, 0.2, 0.0])) == pytest.approx(0.1)
+    assert compiled.violation(np.array([0.3, 0.3, 0.2, 0.2, 0.0])) <= 0
+
+
+def test_conflicting_or_unknown_specs_are_rejected():
+    with pytest.raises(ValueError):
+        compile_constraints(TICKERS, [PositionLimits(lower=0.3, upper=0.2)], 0.0, 1.0)
+    with pytest.raises(TypeError):
+        compile_constraints(TICKERS, [object()], 0.0, 1.0)
+
+
+def test_l1_ball_projection():
+    rng = np.random.default_rng(0)
+    center = rng.normal(size=8)
+    for _ in range(20):
+        point = center + rng.normal(scale=2.0, size=8)
+        projected = project_l1_ball(point, center, 1.5)
+        assert np.abs(projected - center).sum() == pytest.approx(1.5)
+        # The projection is no farther than any other point of the ball tried
+        for _ in range(20):
+            other = center + rng.normal(size=8)
+            other = center + (other - center) * min(1.0, 1.5 / np.abs(other - center).sum())
+            assert np.linalg.norm(point - projected) <= np.linalg.norm(point - other) + 1e-12
+    inside = center + 0.1
+    np.testing.assert_array_equal(project_l1_ball(inside, center, 1.5), inside)
+
+
+def test_return_range_and_extreme_portfolios():
+    # Box only: the greedy fill, 0.4 in each of the best two assets and the rest in the third
+    compiled = compile_constraints(TICKERS, [PositionLimits(upper=0.4)], 0.0, 1.0)
+    lowest, highest = compiled.extreme_portfolios(MEAN)
+    np.testing.assert_allclose(highest, [0.2, 0.4, 0, 0.4, 0])
+    np.testing.assert_allclose(lowest, [0.2, 0, 0.4, 0, 0.4])
+    assert compiled.return_range(MEAN) == pytest.approx((lowest @ MEAN, highest @ MEAN))
+
+    # A slack linear row goes through the linear program, which agrees with the greedy fill
+    with_row = compile_constraints(TICKERS, [PositionLimits(upper=0.4), LinearLimit({'AAA': 1}, upper=1)], 0.0, 1.0)
+    assert with_row.return_range(MEAN) == pytest.approx(compiled.return_range(MEAN))
+
+    # Balls and rows limit the range; the extreme portfolios satisfy every constraint
+    sectors = {'BBB': 'Growth', 'DDD': 'Growth'}
+    limited = compile_constraints(TICKERS, [SectorLimits(sectors, upper=0.5), Turnover({t: 0.2 for t in TICKERS}, 0.8)], 0.0, 1.0)
+    lowest, highest = limited.extreme_portfolios(MEAN)
+    for weights in (lowest, highest):
+        assert weights.sum() == pytest.approx(1)
+        assert limited.violation(weights) <= 1e-9
+    assert highest[1] + highest[3] <= 0.5 + 1e-9
+    assert limited.return_range(MEAN)[1] < compiled.return_range(MEAN)[1]
+
+    # No fully invested portfolio fits under these caps
+    assert compile_constraints(TICKERS, [PositionLimits(upper=0.1)], 0.0, 1.0).return_range(MEAN) is None
+    assert compile_constraints(TICKERS, [GrossLeverage(0.5)], -1.0, 1.0).return_range(MEAN) is None
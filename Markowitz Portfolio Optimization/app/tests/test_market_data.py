@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chart_stub import ChartStub
+from market_data import ChunkedFetcher
+from price_store import PriceStore
+
+START = pd.Timestamp('2024-01-01')
+END = pd.Timestamp('2024-03-01')
+
+
+def _prices(tickers):
+    dates = pd.bdate_range('2023-12-01', '2024-03-29')
+    values = 100 + np.arange(len(dates))[:, None] + 1000 * np.arange(len(tickers))[None, :]
+    return pd.DataFrame(values, index=dates, columns=list(tickers), dtype=float)
+
+
+@pytest.fixture
+def fetcher_for():
+    fetchers = []
+
+    def make(stub, **options):
+        options.setdefault('sleep', sleeps.append)
+        fetcher = ChunkedFetcher(base_url=stub.base_url, **options)
+        fetchers.append(fetcher)
+        return fetcher
+
+    sleeps = []
+    make.sleeps = sleeps
+    yield make
+    for fetcher in fetchers:
+        fetcher.close()
+
+
+def test_fetch_returns_every_ticker_over_pooled_connections(fetcher_for):
+    tickers = [f'T{i:02d}' for i in range(30)]
+    prices = _prices(tickers)
+    with ChartStub(prices) as stub:
+        fetcher = fetcher_for(stub, chunk_size=4, max_workers=3)
+        report = fetcher.fetch_report(tickers, START, END)
+        # A second refresh goes over the same keep-alive connections
+        fetcher.fetch(tickers, START, END)
+
+    expected = prices.loc[START:END - pd.Timedelta(days=1)]
+    assert report.failed == {}
+    assert list(report.prices.columns) == tickers
+    assert list(report.prices.index) == list(expected.index)
+    np.testing.assert_array_equal(report.prices.to_numpy(), expected.to_numpy())
+    assert len(stub.requests) == 60
+    assert len(stub.connections) <= 3
+
+
+def test_retryable_failures_are_retried(fetcher_for):
+    prices = _prices(['AAA', 'BBB', 'CCC'])
+    with ChartStub(prices, failures={'AAA': [503, 200], 'BBB': [429, 429, 200]}, retry_after=2) as stub:
+        report = fetcher_for(stub, retries=3).fetch_report(['AAA', 'BBB', 'CCC'], START, END)
+
+    assert report.failed == {}
+    assert report.attempts == {'AAA': 2, 'BBB': 3, 'CCC': 1}
+    # Retry-After is honoured
+    assert len(fetcher_for.sleeps) == 3
+    assert min(fetcher_for.sleeps) >= 2
+
+
+def test_failures_are_reported_without_failing_the_fetch(fetcher_for):
+    prices = _prices(['AAA', 'GONE', 'BUSY'])
+    with ChartStub(prices, failures={'GONE': [404], 'BUSY': [503]}) as stub:
+        report = fetcher_for(stub, retries=2).fetch_report(['AAA', 'GONE', 'BUSY'], START, END)
+
+    assert list(report.prices.columns) == ['AAA']
+    assert set(report.failed) == {'GONE', 'BUSY'}
+    # A missing ticker is not asked for again, a throttled one is, up to the retries
+    assert report.retryable == {'BUSY'}
+    assert report.attempts['GONE'] == 1
+    assert report.attempts['BUSY'] == 3
+
+
+def test_tickers_are_quoted_into_one_path_segment(fetcher_for):
+    prices = _prices(['BRK/B'])
+    with ChartStub(prices) as stub:
+        fetcher = fetcher_for(stub)
+        assert '/chart/BRK%2FB?' in fetcher.url('BRK/B', START, END)
+        report = fetcher.fetch_report(['BRK/B'], START, END)
+
+    assert stub.requests == [('BRK/B', 200)]
+    assert report.failed == {}
+    assert len(report.prices['BRK/B']) == len(prices.loc[START:END - pd.Timedelta(days=1)])
+
+
+def test_store_leaves_retryable_failures_uncovered(tmp_path, fetcher_for):
+    prices = _prices(['AAA', 'GONE', 'BUSY'])
+    with ChartStub(prices, failures={'GONE': [404], 'BUSY': [503]}) as stub:
+        store = PriceStore(str(tmp_path), fetcher_for(stub, retries=1))
+        served = store.get(['AAA', 'GONE', 'BUSY'], START, END)
+
+    assert served['AAA'].notna().all()
+    assert served[['GONE', 'BUSY']].isna().all().all()
+    # The missing ticker counts as requested, the throttled one is fetched again next time
+    assert store.missing('AAA', START, END) == []
+    assert store.missing('GONE', START, END) == []
+    assert store.missing('BUSY', START, END) == [(np.datetime64('2024-01-01'), np.datetime64('2024-03-01'))]
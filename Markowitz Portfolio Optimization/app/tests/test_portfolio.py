@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+import no_short_selling
+import shortselling
+from benchmark import synthetic_prices
+from constraints import PositionLimits, SectorLimits, Turnover
+from returns_panel import ReturnsPanel
+
+
+def _optimizer(constraints, num_assets=12, seed=4):
+    prices = synthetic_prices(num_assets, 400, seed=seed)
+    return no_short_selling.PortfolioOptimizer(prices, constraints=constraints)
+
+
+def test_frontier_grid_stays_inside_the_reachable_range():
+    tickers = ['SYN%04d' % i for i in range(12)]
+    sectors = {ticker: 'S%d' % (i % 4) for i, ticker in enumerate(tickers)}
+    for constraints in ([PositionLimits(upper=0.15)], [SectorLimits(sectors, upper=0.3)],
+                        [Turnover({ticker: 1 / 12 for ticker in tickers}, 0.4)]):
+        optimizer = _optimizer(constraints)
+        compiled = optimizer.compiled_constraints()
+        lowest, highest = compiled.return_range(optimizer.statistics.mean)
+        assert highest < optimizer.statistics.mean.max()
+
+        targets, weights, risks, return_ = optimizer.frontier_grid(20)
+        assert targets[0] >= lowest and targets[-1] == pytest.approx(highest)
+        assert np.all(np.isfinite(risks))
+        assert optimizer.sweep_stats['failures'] == 0
+        for w, target_return in zip(weights, targets):
+            assert w.sum() == pytest.approx(1)
+            assert compiled.violation(w) <= 1e-7
+            assert w @ optimizer.statistics.mean == pytest.approx(target_return)
+
+
+def test_frontier_grid_rejects_infeasible_constraints():
+    optimizer = _optimizer([PositionLimits(upper=0.05)])
+    with pytest.raises(ValueError, match='no fully invested portfolio'):
+        optimizer.frontier_grid(10)
+
+
+def test_target_risk_skips_failed_grid_points():
+    reference = _optimizer([PositionLimits(upper=0.3)])
+    targets, weights, risks, return_ = reference.frontier_grid(20)
+    target_risk = 0.5 * (risks[0] + risks[-1])
+    expected = reference.markowitz_optimization_for_target_risk(target_risk, 20)
+
+    # Failed solves leave NaN weights and risks in the grid, here around the bracket and at its start
+    optimizer = _optimizer([PositionLimits(upper=0.3)])
+    optimizer.markowitz_optimization()
+    i = int(np.argmax(np.asarray(risks) >= target_risk))
+    failed = {0, i - 1, i}
+    nan = np.full(len(weights[0]), np.nan)
+    optimizer._frontier_memo[('grid', 20, optimizer.optimal_return)] = (
+        targets, [nan if k in failed else w for k, w in enumerate(weights)],
+        [np.nan if k in failed else r for k, r in enumerate(risks)], [np.nan if k in failed else r for k, r in enumerate(return_)])
+    weights_, risk, return_risk = optimizer.markowitz_optimization_for_target_risk(target_risk, 20)
+    assert risk == pytest.approx(target_risk)
+    assert return_risk == pytest.approx(expected[2])
+    np.testing.assert_allclose(weights_, expected[0], atol=1e-6)
+
+    # Below the first solved point, with the start of the grid missing, the target is solved directly
+    low_risk = 0.5 * (risks[0] + risks[1])
+    weights_, risk, _ = optimizer.markowitz_optimization_for_target_risk(low_risk, 20)
+    assert risk == pytest.approx(low_risk)
+
+    optimizer._frontier_memo[('grid', 20, optimizer.optimal_return)] = (targets, [nan] * 20, [np.nan] * 20, [np.nan] * 20)
+    with pytest.raises(ValueError, match='no frontier grid point'):
+        optimizer.markowitz_optimization_for_target_risk(0.9 * target_risk, 20)
+
+
+def test_short_selling_target_return_uses_the_closed_form():
+    prices = synthetic_prices(8, 400, seed=6)
+    optimizer = shortselling.PortfolioOptimizer(prices, solver='slsqp')
+    _, _, optimal_return = optimizer.markowitz_optimization()
+    target_return = optimal_return + 0.5 * (optimizer.statistics.mean.max() - optimal_return)
+    weights, risk, return_ = optimizer.markowitz_optimization_for_target_return(target_return)
+    analytic_weights, analytic_risks, _ = optimizer.analytic_frontier([target_return])
+    assert optimizer.last_result is None
+    np.testing.assert_array_equal(weights, analytic_weights[0])
+    assert risk == analytic_risks[0] and return_ == target_return
+
+    # The frontier and a sweep over the same target give the same point
+    _, frontier_risks, _ = optimizer.efficient_frontier([target_return])
+    _, sweep_risks, _ = optimizer.frontier_sweep([target_return])
+    assert frontier_risks[0] == sweep_risks[0] == risk
+    assert optimizer.sweep_stats['solves'] == 0
+
+    # Where the closed form breaks the bounds the solver takes over
+    assert analytic_weights[0].min() < -0.02 or analytic_weights[0].max() > 0.3
+    bounded = shortselling.PortfolioOptimizer(prices, constraints=[PositionLimits(lower=-0.02, upper=0.3)])
+    weights, risk, _ = bounded.markowitz_optimization_for_target_return(target_return)
+    assert bounded.last_result is not None and bounded.last_result.success
+    assert weights.min() >= -0.02 - 1e-9 and weights.max() <= 0.3 + 1e-9
+    assert risk >= analytic_risks[0]
+
+
+def test_read_only_optimizers_refuse_updates():
+    prices = synthetic_prices(5, 200, seed=7)
+    from_panel = no_short_selling.PortfolioOptimizer.from_panel(ReturnsPanel.from_prices(prices.iloc[:150]))
+    from_statistics = no_short_selling.PortfolioOptimizer.from_statistics(from_panel.statistics)
+    for optimizer, source in ((from_panel, 'ReturnsPanel'), (from_statistics, 'precomputed moments')):
+        with pytest.raises(RuntimeError, match=f'built from (a )?{source} are read-only'):
+            optimizer.append(prices.iloc[150:])
+        with pytest.raises(RuntimeError, match="can't roll"):
+            optimizer.roll(100)
+
+    # An optimizer over the price history updates in place
+    optimizer = no_short_selling.PortfolioOptimizer(prices.iloc[:150])
+    optimizer.append(prices.iloc[150:])
+    assert len(optimizer.returns) == 199
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from price_store import FixtureSource, PriceStore
+
+
+def _prices(start, end, tickers=('AAA', 'BBB')):
+    dates = pd.bdate_range(start, end)
+    values = 100 + np.arange(len(dates))[:, None] + 1000 * np.arange(len(tickers))[None, :]
+    return pd.DataFrame(values, index=dates, columns=list(tickers), dtype=float)
+
+
+def _day(timestamp):
+    return np.datetime64(pd.Timestamp(timestamp).date(), 'D')
+
+
+def test_gap_fill_fetches_only_the_missing_range(tmp_path):
+    prices = _prices('2024-01-01', '2024-03-29')
+    source = FixtureSource(prices)
+    store = PriceStore(str(tmp_path), source)
+
+    store.get(['AAA', 'BBB'], '2024-01-01', '2024-02-01')
+    extended = store.get(['AAA', 'BBB'], '2024-01-01', '2024-03-01')
+    assert source.requests == [(['AAA', 'BBB'], _day('2024-01-01'), _day('2024-02-01')),
+                               (['AAA', 'BBB'], _day('2024-02-01'), _day('2024-03-01'))]
+    expected = prices.loc['2024-01-01':'2024-02-29']
+    assert list(extended.index) == list(expected.index)
+    np.testing.assert_array_equal(extended.to_numpy(), expected.to_numpy())
+
+    # Inside the covered range nothing is fetched; a new ticker gets the whole window,
+    # the others only their own gap
+    store.get(['BBB'], '2024-01-15', '2024-02-15')
+    assert len(source.requests) == 2
+    store.get(['AAA', 'CCC'], '2024-02-15', '2024-03-15')
+    assert source.requests[2:] == [(['AAA'], _day('2024-03-01'), _day('2024-03-15')),
+                                   (['CCC'], _day('2024-02-15'), _day('2024-03-15'))]
+
+
+def test_coverage_is_persisted(tmp_path):
+    prices = _prices('2024-01-01', '2024-03-29')
+    PriceStore(str(tmp_path), FixtureSource(prices)).get(['AAA'], '2024-01-01', '2024-02-01')
+    assert (tmp_path / 'AAA' / 'coverage.npy').exists()
+
+    # A new store on the same directory knows the range was requested, weekends included
+    source = FixtureSource(prices)
+    reopened = PriceStore(str(tmp_path), source)
+    assert reopened.missing('AAA', '2024-01-01', '2024-02-01') == []
+    assert reopened.missing('AAA', '2024-01-01', '2024-02-10') == [(_day('2024-02-01'), _day('2024-02-10'))]
+    served = reopened.get(['AAA'], '2024-01-06', '2024-01-21')
+    assert source.requests == []
+    np.testing.assert_array_equal(served['AAA'].to_numpy(), prices.loc['2024-01-06':'2024-01-20', 'AAA'].to_numpy())
+
+
+def test_window_ending_today_is_not_fully_covered(tmp_path):
+    now = pd.Timestamp.now()
+    today = _day(now)
+    start = now.normalize() - pd.Timedelta(days=20)
+    source = FixtureSource(_prices(start, now.normalize()))
+    store = PriceStore(str(tmp_path), source)
+
+    # The app's window ends now, so its last day is today
+    store.get(['AAA'], start, now)
+    assert store.missing('AAA', start, now) == [(today, today + 1)]
+
+    # Every later read asks for today's bar again, and only for it
+    store.get(['AAA'], start, now)
+    assert len(source.requests) == 2
+    assert source.requests[1] == (['AAA'], today, today + 1)
+
+
+def test_tickers_are_escaped_on_disk(tmp_path):
+    tickers = ('BRK/B', '^GSPC', '..', 'AAA')
+    prices = _prices('2024-01-01', '2024-02-29', tickers)
+    store = PriceStore(str(tmp_path / 'store'), FixtureSource(prices))
+    served = store.get(list(tickers), '2024-01-01', '2024-02-01')
+    np.testing.assert_array_equal(served.to_numpy(), prices.loc['2024-01-01':'2024-01-31', list(tickers)].to_numpy())
+
+    # One directory per ticker inside the store, listed back under the original names
+    assert sorted(entry.name for entry in (tmp_path / 'store').iterdir()) == ['%2E.', '%5EGSPC', 'AAA', 'BRK%2FB']
+    assert list(tmp_path.iterdir()) == [tmp_path / 'store']
+    assert store.tickers() == sorted(tickers)
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+from constraints import PositionLimits, SectorLimits, Turnover, compile_constraints
+from qp_solver import INFEASIBLE, ConstrainedQP, LongOnlyQP
+
+
+def _moments(num_assets, num_days, seed):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0005, 0.01, (num_days, num_assets)) + rng.normal(0, 0.005, (num_days, 1))
+    return np.cov(returns, rowvar=False), returns.mean(axis=0)
+
+
+def _feasible(compiled, weights, target_return=None, returns_mean=None, tol=1e-7):
+    assert weights.sum() == pytest.approx(1, abs=tol)
+    assert compiled.violation(weights) <= tol
+    if target_return is not None:
+        assert weights @ returns_mean == pytest.approx(target_return, abs=tol)
+
+
+def _reference(covariance, returns_mean, compiled, target_return=None):
+    # SLSQP from several starts, kept only when it satisfies the constraints
+    constraints = [{'type': 'eq', 'fun': lambda x: x.sum() - 1}] + compiled.slsqp()
+    if target_return is not None:
+        constraints.append({'type': 'eq', 'fun': lambda x: x @ returns_mean - target_return})
+    best = np.inf
+    rng = np.random.default_rng(0)
+    for start in [np.full(len(returns_mean), 1 / len(returns_mean))] + [rng.dirichlet(np.ones(len(returns_mean))) for _ in range(3)]:
+        result = minimize(lambda x: 0.5 * x @ covariance @ x, start, jac=lambda x: covariance @ x, method='SLSQP',
+                          bounds=list(zip(compiled.lower, compiled.upper)), constraints=constraints, options={'ftol': 1e-12, 'maxiter': 500})
+        if result.success and compiled.violation(result.x) <= 1e-7:
+            best = min(best, result.fun)
+    return best
+
+
+def test_long_only_minimum_variance_satisfies_kkt():
+    covariance, returns_mean = _moments(30, 40, seed=1)
+    solver = LongOnlyQP(covariance, returns_mean, upper=0.2)
+    result = solver.solve()
+    weights = result.x
+    assert result.success
+    _feasible(solver.constraints, weights)
+
+    # Σw + λ1 vanishes on the free assets, is >= 0 at the lower bound and <= 0 at the upper
+    gradient = covariance @ weights
+    free = (weights > 1e-9) & (weights < 0.2 - 1e-9)
+    assert free.any()
+    multiplier = -gradient[free].mean()
+    scale = np.abs(gradient).max()
+    np.testing.assert_allclose(gradient[free] + multiplier, 0, atol=1e-8 * scale)
+    assert np.all(gradient[weights <= 1e-9] + multiplier >= -1e-8 * scale)
+    assert np.all(gradient[weights >= 0.2 - 1e-9] + multiplier <= 1e-8 * scale)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_constrained_solves_match_slsqp(seed):
+    covariance, returns_mean = _moments(8, 60, seed)
+    tickers = ['T%d' % i for i in range(8)]
+    sectors = {ticker: 'S%d' % (i % 3) for i, ticker in enumerate(tickers)}
+    holdings = {ticker: 1 / 8 for ticker in tickers}
+    compiled = compile_constraints(tickers, [PositionLimits(upper=0.35), SectorLimits(sectors, lower=0.2, upper=0.45),
+                                             Turnover(holdings, 0.6)], 0.0, 1.0)
+    solver = ConstrainedQP(covariance, returns_mean, compiled)
+    lowest, highest = solver.return_range
+    assert (lowest, highest) == pytest.approx(compiled.return_range(returns_mean))
+
+    result = solver.solve()
+    assert result.success
+    _feasible(compiled, result.x)
+    assert result.fun <= _reference(covariance, returns_mean, compiled) + 1e-10
+
+    # Targets across the whole reachable range, both ends included
+    for target_return in np.linspace(lowest, highest, 7):
+        result = solver.solve(target_return)
+        assert result.success
+        _feasible(compiled, result.x, target_return, returns_mean)
+        assert result.fun <= _reference(covariance, returns_mean, compiled, target_return) + 1e-10
+
+
+def test_targets_outside_the_range_are_infeasible():
+    covariance, returns_mean = _moments(6, 50, seed=2)
+    solver = LongOnlyQP(covariance, returns_mean, upper=0.5)
+    lowest, highest = solver.return_range
+    for target_return in (lowest - 1e-4, highest + 1e-4):
+        result = solver.solve(target_return)
+        assert not result.success and result.status == INFEASIBLE
+        assert np.isnan(result.x).all()
+
+    # Caps that cannot add up to a fully invested portfolio
+    infeasible = LongOnlyQP(covariance, returns_mean, upper=0.1)
+    assert infeasible.return_range is None
+    assert infeasible.solve().status == INFEASIBLE
+
+
+def test_singular_covariance_with_turnover():
+    # More assets than observations: the covariance is singular
+    covariance, returns_mean = _moments(60, 20, seed=3)
+    tickers = ['T%d' % i for i in range(60)]
+    compiled = compile_constraints(tickers, [Turnover({ticker: 1 / 60 for ticker in tickers}, 0.5)], 0.0, 0.1)
+    solver = ConstrainedQP(covariance, returns_mean, compiled)
+    lowest, highest = solver.return_range
+    for target_return in [None] + list(np.linspace(lowest, highest, 9)):
+        result = solver.solve(target_return)
+        assert result.success
+        _feasible(compiled, result.x, target_return, returns_mean)
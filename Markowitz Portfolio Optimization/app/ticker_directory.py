@@ -0,0 +1,136 @@
+import bisect
+import difflib
+import hashlib
+import os
+import pickle
+import sys
+import threading
+
+import pandas as pd
+
+
+# Company names and tickers from yahootickers2.csv, loaded once per process
+# into sorted arrays with a dict for name -> ticker lookups and a case-folded
+# index for prefix search. The parsed directory is also written next to the
+# CSV as a pickle snapshot, tagged with the CSV's digest, so a cold start
+# skips pandas entirely while the CSV is unchanged.
+
+DEFAULT_CSV = 'yahootickers2.csv'
+# Bumped whenever the parsed directory would differ for the same CSV, so older snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+
+def _digest(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def snapshot_path(csv_path):
+    return csv_path + '.snapshot'
+
+
+class TickerDirectory:
+    def __init__(self, names, tickers):
+        # names are sorted; duplicates resolve to their first ticker in that order, as df.loc[...].iloc[0] did
+        self.names = list(names)
+        self.tickers = list(tickers)
+        self._lookup = {}
+        for name, ticker in zip(self.names, self.tickers):
+            self._lookup.setdefault(name, ticker)
+        self._folded = sorted((name.casefold(), i) for i, name in enumerate(self.names))
+        self._folded_keys = [key for key, _ in self._folded]
+
+    @classmethod
+    def from_csv(cls, path=DEFAULT_CSV):
+        # Same cleaning as the pages used to do on every rerun
+        df = pd.read_csv(path)
+        df.dropna(inplace=True)
+        df['Name'] = df['Name'].astype(str)
+        df = df[df['Name'].str[0].str.isalpha()]
+        # pandas' default (unstable) sort, as the pages used: it decides which ticker of a
+        # duplicated name comes first, e.g. BRK/B for Berkshire Hathaway
+        df = df.sort_values(by='Name')
+        return cls(df['Name'], df['Ticker'].astype(str))
+
+    @classmethod
+    def load(cls, path=DEFAULT_CSV):
+        # Snapshot when it matches the CSV, otherwise parse the CSV and refresh the snapshot
+        digest = _digest(path)
+        try:
+            with open(snapshot_path(path), 'rb') as file:
+                snapshot = pickle.load(file)
+            if snapshot['digest'] == digest and snapshot.get('version') == SNAPSHOT_VERSION:
+                return cls(snapshot['names'], snapshot['tickers'])
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+            pass
+        directory = cls.from_csv(path)
+        try:
+            directory.save_snapshot(snapshot_path(path), digest)
+        except OSError:
+            # Read-only checkout: keep working from the CSV
+            pass
+        return directory
+
+    def save_snapshot(self, path, digest):
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump({'digest': digest, 'version': SNAPSHOT_VERSION, 'names': self.names, 'tickers': self.tickers}, file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._lookup
+
+    def ticker(self, name):
+        return self._lookup[name]
+
+    def search(self, prefix, limit=20):
+        # Case-insensitive prefix search by bisection over the folded names
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self._folded_keys, prefix)
+        matches = []
+        for key, i in self._folded[start:]:
+            if not key.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(self.names[i])
+        return matches
+
+    def fuzzy(self, query, limit=20, cutoff=0.6):
+        # Substring matches first, then names whose start is a close spelling of the query
+        folded = query.casefold()
+        matches = [self.names[i] for key, i in self._folded if folded in key][:limit]
+        if len(matches) < limit and folded:
+            matcher = difflib.SequenceMatcher()
+            matcher.set_seq2(folded)
+            scored = []
+            for key, i in self._folded:
+                matcher.set_seq1(key[:len(folded)])
+                if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff and matcher.ratio() >= cutoff:
+                    scored.append((-matcher.ratio(), i))
+            for _, i in sorted(scored):
+                if len(matches) >= limit:
+                    break
+                if self.names[i] not in matches:
+                    matches.append(self.names[i])
+        return matches
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_directory(path=DEFAULT_CSV):
+    # One directory per CSV and process, shared by every page of the app
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = TickerDirectory.load(path)
+        return _shared[path]
+
+
+if __name__ == '__main__':
+    # Prebuild the snapshot: python ticker_directory.py [path/to/yahootickers2.csv]
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CSV
+    TickerDirectory.from_csv(csv_path).save_snapshot(snapshot_path(csv_path), _digest(csv_path))